@@ -0,0 +1,111 @@
+"""Throughput of the prediction paths at different batch sizes.
+
+Compares the original per-request path (one-row DataFrame, scaler.transform,
+model.predict) against the vectorized path used by /predict-*/batch, and
+also drives /api/predict-health/batch end to end through an ASGI client
+with history saving disabled.
+
+Run from the backend directory:
+
+    python -m benchmarks.batch_predict --sizes 1 100 10000
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from controllers.predict import health_features, moisture_features
+from ml.registry import registry
+from models import HealthPredictionInput, MoisturePredictionInput
+
+HEALTH_COLUMNS = ["ambient_temperature", "soil_moisture", "humidity", "light_intensity"]
+MOISTURE_COLUMNS = ["ambient_temperature", "humidity", "light_intensity"]
+
+
+def health_inputs(n, rng):
+    return [
+        HealthPredictionInput(
+            sensor_id=i, temperature=rng.uniform(18, 38), soil_moisture=rng.uniform(5, 80),
+            humidity=rng.uniform(30, 90), light_intensity=rng.uniform(0, 1200), save_to_history=False,
+        )
+        for i in range(n)
+    ]
+
+
+def moisture_inputs(n, rng):
+    return [
+        MoisturePredictionInput(
+            temperature=rng.uniform(18, 38), humidity=rng.uniform(30, 90), light_intensity=rng.uniform(0, 1200),
+        )
+        for i in range(n)
+    ]
+
+
+def per_row(bundle, items, row):
+    for d in items:
+        frame = pd.DataFrame([row(d)])
+        bundle.model.predict(bundle.scaler.transform(frame))
+
+
+def timed(fn, min_seconds=0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+async def endpoint_seconds(items, min_seconds=0.5):
+    from main import app
+    body = [d.model_dump() for d in items]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        runs, start = 0, time.perf_counter()
+        while True:
+            response = await client.post("/api/predict-health/batch", json=body)
+            response.raise_for_status()
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                return elapsed / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--skip-per-row-above", type=int, default=1000,
+                        help="per-row path is extrapolated from this many rows for larger batches")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    rng = np.random.default_rng(42)
+    registry.load()
+    health, moisture = registry.get("health"), registry.get("moisture")
+
+    health_row = lambda d: dict(zip(HEALTH_COLUMNS, (d.temperature, d.soil_moisture, d.humidity, d.light_intensity)))
+    moisture_row = lambda d: dict(zip(MOISTURE_COLUMNS, (d.temperature, d.humidity, d.light_intensity)))
+
+    print(f"{'model':<9} {'batch':>6} {'per-row rows/s':>15} {'vectorized rows/s':>18} {'endpoint rows/s':>16}")
+    for name, bundle, make, features, row in (
+        ("health", health, health_inputs, health_features, health_row),
+        ("moisture", moisture, moisture_inputs, moisture_features, moisture_row),
+    ):
+        for size in args.sizes:
+            items = make(size, rng)
+            sample = items[:min(size, args.skip_per_row_above)]
+            legacy = timed(lambda: per_row(bundle, sample, row)) / len(sample)
+            vectorized = timed(lambda: bundle.predict(features(items))) / size
+            endpoint = ""
+            if name == "health":
+                endpoint = f"{size / asyncio.run(endpoint_seconds(items)):16,.0f}"
+            print(f"{name:<9} {size:>6} {1 / legacy:15,.0f} {1 / vectorized:18,.0f} {endpoint:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Latency and throughput of the compiled health forest against sklearn.
+
+``sklearn`` is ``model.predict(scaler.transform(X))`` on a plain array;
+``compiled`` is CompiledForest.predict on the same rows. Both are checked
+to agree on the test split and on every benchmarked batch before timing.
+
+Run from the backend directory:
+
+    python -m benchmarks.compiled_forest --sizes 1 10 100 10000
+"""
+import argparse
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from ml.compiled_forest import ML_DIR, CompiledForest, health_test_split
+
+
+def timed(fn, min_seconds=0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+def readings(n, rng):
+    return np.column_stack([
+        rng.uniform(18, 38, n), rng.uniform(5, 80, n), rng.uniform(30, 90, n), rng.uniform(0, 1200, n),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 10000])
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = joblib.load(ML_DIR / "plant_health_score_model.pkl")
+    scaler = joblib.load(ML_DIR / "scaler.pkl")
+    start = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(model, scaler)
+    print(f"compiled {len(compiled.roots)} trees / {len(compiled.feature)} nodes "
+          f"({compiled.nbytes / 1024:.0f} KB) in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    X_test, _ = health_test_split()
+    same = np.array_equal(compiled.predict(X_test), model.predict(scaler.transform(X_test)))
+    print(f"test split ({len(X_test)} rows) identical to sklearn: {same}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} {'compiled rows/s':>16}")
+    for size in args.sizes:
+        X = readings(size, rng)
+        assert np.array_equal(compiled.predict(X), model.predict(scaler.transform(X)))
+        reference = timed(lambda: model.predict(scaler.transform(X)))
+        fast = timed(lambda: compiled.predict(X))
+        print(f"{size:>6} {reference * 1000:11.3f} {fast * 1000:12.3f} {reference / fast:7.1f}x {size / fast:16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
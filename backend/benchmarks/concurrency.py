@@ -0,0 +1,130 @@
+"""Concurrency benchmark for /api/sensor-data/recent.
+
+Fires N simultaneous clients at the route through an in-process ASGI client.
+The MySQL server is replaced by a stand-in connection that sleeps for a fixed
+latency per query, so the numbers isolate how well requests overlap rather
+than how fast the real database is. For comparison the same query is also
+served by a route that calls the blocking Database API on the event loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.concurrency --clients 100 --latency-ms 20
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+from database import ConnectionPool, Database
+
+
+class SleepyCursor:
+    def __init__(self, rows, latency):
+        self._rows = rows
+        self._latency = latency
+
+    def execute(self, query, params=None):
+        time.sleep(self._latency)
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def nextset(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class SleepyConnection:
+    """Stand-in for a MySQL connection whose every query takes ``latency`` seconds."""
+
+    _next_id = 0
+
+    def __init__(self, rows, latency):
+        SleepyConnection._next_id += 1
+        self.connection_id = SleepyConnection._next_id
+        self._rows = rows
+        self._latency = latency
+
+    def cursor(self, **kwargs):
+        return SleepyCursor(self._rows, self._latency)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def sensor_rows(n):
+    now = datetime.now()
+    return [
+        {"id": i, "timestamp": now - timedelta(minutes=30 * i), "lux": 120.0, "temperature": 30.5, "soil_moisture": 55.2}
+        for i in range(n)
+    ]
+
+
+async def run_clients(app, path, clients):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Every client arrives at the same instant, so latency is measured from
+        # the common start; a blocked event loop shows up as queueing delay
+        async def one():
+            response = await client.get(path)
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(clients)))
+        wall = time.perf_counter() - start
+    return np.array(latencies) * 1000, wall
+
+
+def report(label, latencies_ms, wall):
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    print(f"{label:<10} p50={p50:8.1f}ms  p95={p95:8.1f}ms  p99={p99:8.1f}ms  "
+          f"wall={wall * 1000:8.1f}ms  throughput={len(latencies_ms) / wall:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated query latency")
+    parser.add_argument("--rows", type=int, default=48, help="rows returned per query")
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = sensor_rows(args.rows)
+    latency = args.latency_ms / 1000
+    Database.use_pool(ConnectionPool(lambda: SleepyConnection(rows, latency),
+                                     min_size=args.pool_size, max_size=args.pool_size, timeout=60))
+    Database.pool().fill()
+
+    from main import app
+
+    @app.get("/bench/sensor-data/recent-blocking")
+    async def blocking_recent():
+        return Database.execute_query("SELECT 1")
+
+    print(f"{args.clients} concurrent clients, {args.latency_ms:.0f}ms per query, pool size {args.pool_size}")
+    latencies, wall = asyncio.run(run_clients(app, "/api/sensor-data/recent", args.clients))
+    report("async", latencies, wall)
+    latencies, wall = asyncio.run(run_clients(app, "/bench/sensor-data/recent-blocking", args.clients))
+    report("blocking", latencies, wall)
+
+
+if __name__ == "__main__":
+    main()
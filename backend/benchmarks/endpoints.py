@@ -0,0 +1,290 @@
+"""Benchmark every API route against a seeded SQLite stand-in database.
+
+For each data size the stand-in (see ``benchmarks.standin``) is seeded once
+and cached in ``--data-dir``, the app's connection pool is pointed at it and
+every route is driven through an in-process ASGI client by ``--concurrency``
+workers. Reported per route: throughput, p50/p95/p99 latency and the peak
+Python heap (tracemalloc) of one extra request. The forecast routes talk to
+``benchmarks.fake_forecast`` instead of OpenWeather.
+
+Routes that return a whole table are skipped above ``--full-table-limit``
+rows (100k by default), since a single request would take minutes and
+time out against the database query timeout rather than measure anything. Left out are
+``/api/stream`` and ``/api/alerts/stream``, which never finish (see
+``benchmarks.stream``), and ``/api/system/profiles/{id}``, which needs a
+profiled request.
+
+Results can be written as JSON (``--output``) and compared against an
+earlier file (``--compare``); the run exits non-zero when a route's p95
+grows or its throughput drops by more than ``--tolerance``.
+
+Run from the backend directory:
+
+    python -m benchmarks.endpoints --output benchmarks/baseline.json
+    python -m benchmarks.endpoints --rows 10000 1000000 --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from benchmarks import standin
+from benchmarks.fake_forecast import create_app
+from database import Database
+from ml.registry import registry
+from services import forecast, recent
+from services.cache import response_cache
+from services.correlation import correlation_stats
+from services.http_client import create_client, use_client
+from services.inference import inference
+from services.startup import warmup
+from services.watering import watering_engine
+
+# (method, path, query params or JSON body, returns a whole table)
+ENDPOINTS = [
+    ("GET", "/api/sensor-data", None, True),
+    ("GET", "/api/sensor-data", {"limit": 100}, False),
+    ("GET", "/api/sensor-data/recent", None, False),
+    ("GET", "/api/sensor-data/export", {"format": "ndjson", "from": "-7d"}, False),
+    ("GET", "/api/sensor-data/series", {"metric": "moisture"}, False),
+    ("GET", "/api/sensor-data/series", {"metric": "moisture", "from": "-365d"}, False),
+    ("GET", "/api/correlation-matrix", None, False),
+    ("GET", "/api/correlation-matrix", {"from": "-7d"}, False),
+    ("GET", "/api/weather-data", None, True),
+    ("GET", "/api/weather-data/latest", None, False),
+    ("GET", "/api/weather-data/recent", None, False),
+    ("GET", "/api/sun-data", None, False),
+    ("GET", "/api/sun-data/latest", None, False),
+    ("GET", "/api/export/sensor", {"format": "parquet", "from": "-7d"}, False),
+    ("GET", "/api/export/joined", {"format": "arrow", "from": "-7d"}, False),
+    ("GET", "/api/export/sun", {"format": "parquet", "from": "-365d"}, False),
+    ("GET", "/api/health-history", None, False),
+    ("GET", "/api/when-will-it-rain", None, False),
+    ("GET", "/api/moisture-forecast", None, False),
+    ("POST", "/api/predict-health",
+     {"temperature": 30.0, "sensor_id": 7, "soil_moisture": 42.0, "light_intensity": 500.0, "humidity": 70.0}, False),
+    ("POST", "/api/predict-health/batch",
+     [{"temperature": 30.0, "sensor_id": i, "soil_moisture": 42.0, "light_intensity": 500.0, "humidity": 70.0,
+       "save_to_history": False} for i in range(100)], False),
+    ("POST", "/api/predict-moisture", {"temperature": 30.0, "humidity": 70.0, "light_intensity": 500.0}, False),
+    ("POST", "/api/predict-moisture/batch",
+     [{"temperature": 30.0, "humidity": 70.0, "light_intensity": 500.0}] * 100, False),
+    ("POST", "/api/watering-recommendation",
+     {"moisture": 25.0, "temperature": 31.0, "lux": 800.0, "datetime_local": None}, False),
+    ("GET", "/api/watering-recommendations", None, False),
+    ("GET", "/api/alerts", None, False),
+    ("GET", "/api/alerts/active", None, False),
+    ("GET", "/metrics", None, False),
+] + [("GET", f"/api/system/{name}", None, False) for name in (
+    "ready", "db-pool", "models", "inference", "ingestion", "alerts", "stream", "cache", "forecast-cache",
+    "health-history", "recent-buffer", "watering", "profiles",
+)]
+
+
+def endpoint_name(method, path, payload):
+    if method == "GET" and payload:
+        return f"{method} {path}?" + "&".join(f"{k}={v}" for k, v in payload.items())
+    return f"{method} {path}"
+
+
+def resolve_params(params):
+    """Turn relative times like ``-7d`` into timestamps."""
+    if not params:
+        return params
+    resolved = {}
+    for key, value in params.items():
+        if isinstance(value, str) and value.startswith("-") and value.endswith("d"):
+            value = (datetime.now() - timedelta(days=int(value[1:-1]))).isoformat(timespec="seconds")
+        resolved[key] = value
+    return resolved
+
+
+async def call(client, method, path, payload):
+    if method == "GET":
+        response = await client.get(path, params=resolve_params(payload))
+    else:
+        response = await client.post(path, json=payload)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+async def measure(client, method, path, payload, requests, concurrency, max_seconds):
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < requests and (not latencies or time.perf_counter() < deadline):
+            issued += 1
+            t0 = time.perf_counter()
+            await call(client, method, path, payload)
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return np.array(latencies) * 1000, wall
+
+
+async def peak_memory(client, method, path, payload):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await call(client, method, path, payload)
+        return (tracemalloc.get_traced_memory()[1] - base) / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+async def prepare(path):
+    """Point the app at the stand-in and reset every in-process cache."""
+    Database.close_pool()
+    Database.use_pool(standin.stand_in_pool(path))
+    response_cache.invalidate()
+    correlation_stats.path = Path(path + ".correlation.json")
+    correlation_stats._acc = None
+    correlation_stats.path.unlink(missing_ok=True)
+    # Its id watermark belongs to the previous database
+    watering_engine.__init__()
+    await recent.prime()
+
+
+async def run_size(app, rows, args):
+    path = os.path.join(args.data_dir, f"smartfarm-{rows}.sqlite")
+    info = standin.seed_info(path)
+    if args.reseed or info is None or info[0] != rows or datetime.now() - info[1] > timedelta(hours=12):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"seeding {rows:,} rows into {path} ...", flush=True)
+        print(f"seeded in {standin.seed(path, rows):.1f}s", flush=True)
+    await prepare(path)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for method, route, payload, full_table in ENDPOINTS:
+            name = endpoint_name(method, route, payload)
+            if full_table and rows > args.full_table_limit:
+                results[name] = {"skipped": f"whole table above {args.full_table_limit:,} rows"}
+                print(f"  {name:<62} skipped (whole table)")
+                continue
+            try:
+                # Keep the routes' debug prints out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    # Warm-up request; also fills the caches the route relies on
+                    await call(client, method, route, payload)
+                    latencies, wall = await measure(client, method, route, payload, args.requests,
+                                                    args.concurrency, args.max_seconds)
+                    peak = await peak_memory(client, method, route, payload)
+            except RuntimeError as e:
+                results[name] = {"error": str(e)}
+                print(f"  {name:<62} error: {e}")
+                continue
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            results[name] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / wall, 1),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "peak_mb": round(peak, 3),
+            }
+            print(f"  {name:<62} {results[name]['rps']:9.1f} req/s  p50={p50:8.2f}ms  p95={p95:8.2f}ms  "
+                  f"p99={p99:8.2f}ms  peak={peak:8.2f}MB", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against ``baseline`` as printable lines."""
+    regressions = []
+    for rows, routes in results.items():
+        for name, current in routes.items():
+            before = baseline.get(rows, {}).get(name)
+            if not before or "p95_ms" not in before or "p95_ms" not in current:
+                continue
+            if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{rows} rows {name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+            if current["rps"] < before["rps"] * (1 - tolerance):
+                regressions.append(f"{rows} rows {name}: {before['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+async def run(args):
+    fake = create_app()
+    use_client(create_client(transport=httpx.ASGITransport(app=fake), base_url="http://fake"))
+    forecast.OPENWEATHER_BASE_URL = "http://fake"
+    # The lifespan's model warmup, so /system/ready answers and the first predictions don't pay for it
+    await warmup.run([("models", registry.load), ("inference_pool", inference.start)])
+
+    from main import app
+
+    results = {}
+    for rows in args.rows:
+        print(f"{rows:,} rows, {args.concurrency} concurrent clients")
+        results[str(rows)] = await run_size(app, rows, args)
+    inference.close()
+    Database.close_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time budget per route")
+    parser.add_argument("--full-table-limit", type=int, default=100000)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "smartfarm-bench"))
+    parser.add_argument("--reseed", action="store_true", help="seed again even if a cached file matches")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    if args.no_cache:
+        response_cache.max_entries = 0
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+                "concurrency": args.concurrency,
+                "cache": not args.no_cache,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
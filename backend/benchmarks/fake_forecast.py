@@ -0,0 +1,68 @@
+"""Local stand-in for the OpenWeather 5-day/3-hour forecast API.
+
+Serves ``GET /data/2.5/forecast`` with 40 synthetic slots starting at the
+next 3-hour boundary, rain from ``--rain-slot`` onward, after an optional
+artificial delay. It can be mounted in-process through ``httpx.ASGITransport``
+or run as a real server for the backend to point OPENWEATHER_BASE_URL at:
+
+    python -m benchmarks.fake_forecast --port 8081 --latency-ms 150
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+SLOTS = 40
+SLOT_SECONDS = 3 * 3600
+
+
+def forecast_payload(lat: float, lon: float, rain_slot: int = 5, timezone: int = 7 * 3600):
+    first = (int(time.time()) // SLOT_SECONDS + 1) * SLOT_SECONDS
+    slots = []
+    for i in range(SLOTS):
+        slot = {
+            "dt": first + i * SLOT_SECONDS,
+            "main": {"temp": 29.0 + 4 * ((i % 8) / 8), "humidity": 60 + (i % 8) * 3, "pressure": 1008},
+            "weather": [{"main": "Clouds", "description": "broken clouds"}],
+            "clouds": {"all": 60},
+        }
+        if i >= rain_slot:
+            slot["rain"] = {"3h": 1.2}
+            slot["weather"] = [{"main": "Rain", "description": "light rain"}]
+        slots.append(slot)
+    return {
+        "cod": "200",
+        "cnt": SLOTS,
+        "list": slots,
+        "city": {"name": "Fake Farm", "coord": {"lat": lat, "lon": lon}, "timezone": timezone},
+    }
+
+
+def create_app(latency: float = 0.0, rain_slot: int = 5) -> FastAPI:
+    app = FastAPI(title="Fake OpenWeather")
+    app.state.requests = 0
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float, appid: str = "", units: str = "metric"):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return forecast_payload(lat, lon, rain_slot)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rain-slot", type=int, default=5)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency_ms / 1000, args.rain_slot), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
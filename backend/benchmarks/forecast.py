@@ -0,0 +1,69 @@
+"""/when-will-it-rain under concurrent load against the fake forecast server.
+
+Shows how many upstream forecast requests a burst of dashboard loads costs:
+a cold burst is coalesced into one fetch, warm bursts are served from the
+cache, and an expired entry is served stale while one background refresh
+runs.
+
+Run from the backend directory:
+
+    python -m benchmarks.forecast --clients 100 --latency-ms 150
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_forecast import create_app
+from services import forecast
+from services.http_client import create_client, use_client
+
+
+async def burst(client, clients):
+    start = time.perf_counter()
+
+    async def one():
+        response = await client.get("/api/when-will-it-rain")
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    return np.array(await asyncio.gather(*(one() for _ in range(clients)))) * 1000
+
+
+async def run(clients, latency):
+    fake = create_app(latency)
+    use_client(create_client(transport=httpx.ASGITransport(app=fake), base_url="http://fake"))
+    forecast.OPENWEATHER_BASE_URL = "http://fake"
+
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label in ("cold", "warm"):
+            before = fake.state.requests
+            latencies = await burst(client, clients)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{label:<6} p50={p50:7.1f}ms p99={p99:7.1f}ms upstream_requests={fake.state.requests - before}")
+
+        # Age the entry past its TTL: served stale, refreshed once in the background
+        for key, (data, _) in list(forecast.forecast_cache._entries.items()):
+            forecast.forecast_cache._entries[key] = (data, time.monotonic() - forecast.forecast_cache.ttl - 1)
+        before = fake.state.requests
+        latencies = await burst(client, clients)
+        await asyncio.sleep(latency * 2)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{'stale':<6} p50={p50:7.1f}ms p99={p99:7.1f}ms upstream_requests={fake.state.requests - before}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="fake upstream latency")
+    args = parser.parse_args()
+    print(f"{args.clients} concurrent /when-will-it-rain requests, upstream latency {args.latency_ms:.0f}ms")
+    asyncio.run(run(args.clients, args.latency_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
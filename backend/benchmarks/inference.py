@@ -0,0 +1,109 @@
+"""Throughput of single-row predictions under concurrent load.
+
+N clients each send one-row predictions back to back for a fixed time.
+Three setups are compared:
+
+- ``inline``: ``bundle.predict`` called on the event loop, the old path
+- ``thread`` and ``process``: ``InferenceExecutor`` with that pool
+
+For each setup it reports predictions per second, request latency
+percentiles, the mean batch size and the event loop lag, which is the
+worst delay seen by a coroutine that wakes up every millisecond. Loop lag
+is what every other route waits for while predictions run.
+
+Run from the backend directory:
+
+    python -m benchmarks.inference --clients 1 16 64 --seconds 3
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import numpy as np
+
+from ml.registry import registry
+from services.inference import INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS, InferenceExecutor
+
+FEATURES = {"health": 4, "moisture": 3}
+
+
+async def loop_lag(stop: asyncio.Event, interval=0.001):
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def drive(predict, model, clients, seconds, rng):
+    rows = rng.uniform(0, 100, size=(4096, FEATURES[model]))
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await predict(model, rows[i % len(rows)][None, :])
+            latencies.append(time.perf_counter() - start)
+            i += clients
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 99]) * 1000, await lag
+
+
+async def run_setup(kind, args, clients, rng):
+    if kind == "inline":
+        async def predict(model, X):
+            result = registry.get(model).predict(X)
+            # A real request returns to the loop between predictions
+            await asyncio.sleep(0)
+            return result
+        result = await drive(predict, args.model, clients, args.seconds, rng)
+        return result + (1.0,)
+
+    executor = InferenceExecutor(kind, args.workers, args.max_batch, args.max_wait_ms)
+    await executor.start()
+    # One untimed round so lazy loads and first calls are out of the way
+    await executor.predict(args.model, rng.uniform(0, 100, size=(1, FEATURES[args.model])))
+    before = executor.stats()
+    try:
+        result = await drive(executor.predict, args.model, clients, args.seconds, rng)
+    finally:
+        executor.close()
+    after = executor.stats()
+    mean_batch = (after["rows"] - before["rows"]) / max(1, after["batches"] - before["batches"])
+    return result + (mean_batch,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=sorted(FEATURES), default="health")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--setups", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=INFERENCE_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=INFERENCE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    rng = np.random.default_rng(42)
+    registry.load()
+
+    print(f"{'setup':<8} {'clients':>7} {'pred/s':>9} {'p50 ms':>7} {'p99 ms':>7} {'batch':>6} {'loop lag ms':>11}")
+    for clients in args.clients:
+        for kind in args.setups:
+            rate, (p50, p99), lag, batch = asyncio.run(run_setup(kind, args, clients, rng))
+            print(f"{kind:<8} {clients:>7} {rate:9,.0f} {p50:7.2f} {p99:7.2f} {batch:6.1f} {lag * 1000:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Ingest rate of the MQTT ingestion worker against local stand-ins.
+
+A LocalBroker fans messages out to subscribers in-process, the same way the
+paho network thread calls ``on_message``, and the database is replaced by a
+writer that sleeps for a fixed round trip plus a per-row cost. Batch size 1
+approximates the old Node-RED flow (one INSERT per message).
+
+With ``--samples-per-message N`` the publishers send binary batches of N
+readings (``services.sensor_batch``) instead of one JSON reading per
+message, as boards buffering N samples would.
+
+Run from the backend directory:
+
+    python -m benchmarks.ingest --messages 20000 --publishers 4
+"""
+import argparse
+import json
+import threading
+import time
+
+from services.ingestion import IngestionWorker
+from services.sensor_batch import encode_batch
+
+TOPIC = "b6610545901/smartfarm"
+
+
+class LocalBroker:
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, topic, payload: bytes):
+        for callback in self._subscribers:
+            callback(topic, payload)
+
+
+class SlowDatabase:
+    def __init__(self, round_trip: float, per_row: float):
+        self.round_trip = round_trip
+        self.per_row = per_row
+        self.rows = 0
+
+    def write(self, rows):
+        time.sleep(self.round_trip + self.per_row * len(rows))
+        self.rows += len(rows)
+
+
+def make_payload(samples_per_message):
+    if samples_per_message == 1:
+        return json.dumps({"lux": 120.5, "soil_moisture": 55.2, "temperature": 30.1,
+                           "latitude": 13.8657, "longitude": 100.462}).encode()
+    now = time.time()
+    samples = [(now - 300 * i, 120.5, 55.2, 30.1) for i in range(samples_per_message)]
+    return encode_batch(samples, now, 13.8657, 100.462)
+
+
+def run(messages, publishers, batch_size, flush_interval, round_trip, per_row, max_buffer, samples_per_message=1):
+    db = SlowDatabase(round_trip, per_row)
+    worker = IngestionWorker(write_batch=db.write, batch_size=batch_size, flush_interval=flush_interval,
+                             max_buffer=max_buffer, block_timeout=60)
+    broker = LocalBroker()
+    broker.subscribe(worker.handle_message)
+    payload = make_payload(samples_per_message)
+
+    worker.start()
+    start = time.perf_counter()
+
+    def publish(n):
+        for _ in range(n):
+            broker.publish(TOPIC, payload)
+
+    per_publisher = messages // samples_per_message // publishers
+    threads = [threading.Thread(target=publish, args=(per_publisher,)) for _ in range(publishers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    worker.stop(timeout=600)
+    elapsed = time.perf_counter() - start
+    stats = worker.stats()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="readings to publish")
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--round-trip-ms", type=float, default=2.0, help="simulated INSERT round trip + commit")
+    parser.add_argument("--per-row-us", type=float, default=5.0, help="simulated server cost per row")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 500])
+    parser.add_argument("--max-buffer", type=int, default=50000)
+    parser.add_argument("--samples-per-message", type=int, default=1, help="readings per binary batch message")
+    args = parser.parse_args()
+
+    payload = make_payload(args.samples_per_message)
+    print(f"{args.samples_per_message} reading(s) per message, {len(payload)} bytes "
+          f"({len(payload) / args.samples_per_message:.1f} bytes/reading)")
+
+    print(f"{args.messages} readings from {args.publishers} publishers, "
+          f"{args.round_trip_ms}ms round trip + {args.per_row_us}us/row")
+    for batch_size in args.batch_sizes:
+        messages = args.messages if batch_size > 1 else min(args.messages, 2000)
+        elapsed, stats = run(messages, args.publishers, batch_size, 0.05,
+                             args.round_trip_ms / 1000, args.per_row_us / 1e6, args.max_buffer,
+                             args.samples_per_message)
+        avg_batch = stats["inserted"] / stats["batches"] if stats["batches"] else 0
+        print(f"batch={batch_size:<5} {stats['inserted'] / elapsed:10,.0f} rows/s  "
+              f"batches={stats['batches']:<6} avg_batch={avg_batch:7.1f}  dropped={stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
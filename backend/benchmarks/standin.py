@@ -0,0 +1,317 @@
+"""SQLite stand-in for the MySQL database, for benchmarks and offline runs.
+
+``StandInConnection`` wraps a ``sqlite3`` connection behind the small part of
+the mysql-connector API that ``database.py`` uses (dictionary/buffered
+cursors, ``nextset``, ``ping``, ``connection_id``) and rewrites the MySQL
+idioms the routes and the rollup job use (``%s`` placeholders, ``NOW()``,
+``DATE_SUB``, ``FOR UPDATE``, ``ON DUPLICATE KEY UPDATE``, the bucket
+arithmetic, the ``information_schema`` column check) into SQLite. ``DATETIME`` columns come back as ``datetime`` and ``TIME`` columns
+as ``timedelta``, as they do from MySQL.
+
+``seed`` fills a file with synthetic data spread over one year ending now:
+``rows`` smartfarm readings, a tenth as many weather and plant health rows
+and one sunrise/sunset row per day, plus the 5m/1h/1d ``sensor_rollup``
+buckets that the rollup job would have written. Density grows with the row
+count, so the 24-hour windows grow with it too.
+"""
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from database import ConnectionPool
+from services.rollups import METRICS, RESOLUTIONS
+
+SPAN = timedelta(days=365)
+SEED_CHUNK_ROWS = 200000
+
+SCHEMA = [
+    """
+    CREATE TABLE smartfarm (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts DATETIME NOT NULL,
+        lux DOUBLE, temperature DOUBLE, moisture DOUBLE, lat DOUBLE, lon DOUBLE
+    )
+    """,
+    "CREATE INDEX smartfarm_ts ON smartfarm (ts)",
+    """
+    CREATE TABLE weather_api (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts DATETIME NOT NULL,
+        humidity DOUBLE, pressure DOUBLE, rain_1h DOUBLE, clouds INTEGER
+    )
+    """,
+    "CREATE INDEX weather_api_ts ON weather_api (ts)",
+    """
+    CREATE TABLE sunrise_sunset (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts DATETIME NOT NULL,
+        sunrise TIME, sunset TIME, solar_noon TIME, day_length TIME
+    )
+    """,
+    "CREATE INDEX sunrise_sunset_ts ON sunrise_sunset (ts)",
+    """
+    CREATE TABLE plant_health (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts DATETIME NOT NULL,
+        sensor_id INTEGER, health_status VARCHAR(32)
+    )
+    """,
+    "CREATE INDEX plant_health_ts ON plant_health (ts)",
+    "CREATE INDEX plant_health_sensor ON plant_health (sensor_id, ts)",
+    """
+    CREATE TABLE sensor_rollup (
+        metric VARCHAR(32) NOT NULL,
+        resolution INT NOT NULL,
+        bucket_ts DATETIME NOT NULL,
+        min_value DOUBLE NOT NULL, max_value DOUBLE NOT NULL, sum_value DOUBLE NOT NULL, count INT NOT NULL,
+        PRIMARY KEY (metric, resolution, bucket_ts)
+    )
+    """,
+    "CREATE TABLE seed_info (rows INTEGER NOT NULL, seeded_at DATETIME NOT NULL)",
+]
+
+def _upsert(match):
+    assignments = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", match.group(1))
+    assignments = re.sub(r"\bLEAST\(", "MIN(", assignments)
+    assignments = re.sub(r"\bGREATEST\(", "MAX(", assignments)
+    return f"ON CONFLICT DO UPDATE SET{assignments}"
+
+
+_TRANSLATIONS = [
+    (re.compile(r"\s+FOR UPDATE\b", re.I), lambda m: ""),
+    (re.compile(r"ON DUPLICATE KEY UPDATE(.*)$", re.I | re.S), _upsert),
+    (re.compile(r"TIMESTAMPADD\(SECOND,\s*FLOOR\(TIMESTAMPDIFF\(SECOND,\s*'2000-01-01',\s*(\w+)\)\s*/\s*(\d+)\)"
+                r"\s*\*\s*\d+,\s*'2000-01-01'\)", re.I),
+     lambda m: f"datetime((unixepoch({m.group(1)}) / {m.group(2)}) * {m.group(2)}, 'unixepoch')"),
+    (re.compile(r"information_schema\.COLUMNS\s+WHERE\s+TABLE_SCHEMA\s*=\s*DATABASE\(\)\s+"
+                r"AND\s+TABLE_NAME\s*=\s*'(\w+)'\s+AND\s+COLUMN_NAME\s*=\s*'(\w+)'", re.I),
+     lambda m: f"pragma_table_info('{m.group(1)}') WHERE name = '{m.group(2)}'"),
+    # A computed column has no declared type; name it so it still comes back as a datetime
+    (re.compile(r"(SELECT\s+)NOW\(\)\s*-\s*INTERVAL\s+%s\s+SECOND\b", re.I),
+     lambda m: f"{m.group(1)}datetime('now', 'localtime', '-' || %s || ' seconds') AS \"now [DATETIME]\""),
+    (re.compile(r"DATE_SUB\(\s*NOW\(\)\s*,\s*INTERVAL\s+(\d+)\s+(\w+)\s*\)", re.I),
+     lambda m: f"datetime('now', 'localtime', '-{m.group(1)} {m.group(2).lower()}s')"),
+    (re.compile(r"NOW\(\)", re.I), lambda m: "datetime('now', 'localtime')"),
+    (re.compile(r"%s"), lambda m: "?"),
+]
+
+
+def translate(query: str) -> str:
+    for pattern, replacement in _TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.isoformat(" ")
+
+
+def _format_time(value: timedelta) -> str:
+    seconds = int(value.total_seconds())
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _parse_datetime(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+def _parse_time(value: bytes) -> timedelta:
+    hours, minutes, seconds = value.decode().split(":")
+    return timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+
+sqlite3.register_adapter(datetime, _format_datetime)
+sqlite3.register_adapter(np.float64, float)
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_converter("DATETIME", _parse_datetime)
+sqlite3.register_converter("TIME", _parse_time)
+
+
+class StandInCursor:
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((d[0] for d in self._cursor.description), row))
+
+    def _rows(self, rows):
+        if not self._dictionary or not rows:
+            return rows
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate(query), tuple(params or ()))
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(translate(query), rows)
+        self.rowcount = self._cursor.rowcount
+        # MySQL reports the first id of a multi-row insert; SQLite only knows the last
+        last = self._cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self.lastrowid = last - self.rowcount + 1 if self.rowcount > 0 else last
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def nextset(self):
+        return None
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    _next_id = 0
+
+    def __init__(self, path):
+        StandInConnection._next_id += 1
+        self.connection_id = StandInConnection._next_id
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def cursor(self, dictionary=False, buffered=None):
+        return StandInCursor(self._conn.cursor(), dictionary)
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def stand_in_pool(path, size: int = 10) -> ConnectionPool:
+    return ConnectionPool(lambda: StandInConnection(path), min_size=1, max_size=size, timeout=60)
+
+
+def seed_info(path):
+    """(rows, seeded_at) the file was seeded with, or None if it wasn't."""
+    try:
+        conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            return conn.execute("SELECT rows, seeded_at FROM seed_info").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def _timestamps(n, end):
+    start = np.datetime64(end - SPAN, "s")
+    offsets = np.linspace(0, SPAN.total_seconds(), n, endpoint=False).astype("timedelta64[s]")
+    return start + offsets
+
+
+def _insert_chunks(conn, query, n, make_rows):
+    for lo in range(0, n, SEED_CHUNK_ROWS):
+        hi = min(lo + SEED_CHUNK_ROWS, n)
+        conn.executemany(query, make_rows(lo, hi))
+
+
+def _ts_strings(ts):
+    return np.char.replace(ts.astype(str), "T", " ").tolist()
+
+
+def seed(path, rows: int, seed: int = 0):
+    """Create and fill the stand-in database at ``path``; returns seconds taken."""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    end = datetime.now().replace(microsecond=0)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("BEGIN")
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+        sensor_ts = _timestamps(rows, end)
+
+        def sensor_rows(lo, hi):
+            ts = sensor_ts[lo:hi]
+            hour = (ts.astype("datetime64[h]").astype(np.int64) + 7) % 24
+            daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+            lux = daylight * 800 + rng.normal(0, 20, hi - lo).clip(0)
+            temperature = 26 + 6 * daylight + rng.normal(0, 0.5, hi - lo)
+            moisture = 40 + 15 * np.sin(np.arange(lo, hi) / max(rows / 365, 1)) + rng.normal(0, 2, hi - lo)
+            return zip(_ts_strings(ts), lux.tolist(), temperature.tolist(), moisture.tolist(),
+                       [13.8657] * (hi - lo), [100.462] * (hi - lo))
+
+        _insert_chunks(conn, "INSERT INTO smartfarm (ts, lux, temperature, moisture, lat, lon) VALUES (?, ?, ?, ?, ?, ?)",
+                       rows, sensor_rows)
+
+        side = max(rows // 10, 1)
+        side_ts = _timestamps(side, end)
+
+        def weather_rows(lo, hi):
+            n = hi - lo
+            rain = np.where(rng.random(n) < 0.15, rng.gamma(1.5, 1.0, n), 0.0)
+            return zip(_ts_strings(side_ts[lo:hi]), rng.uniform(50, 95, n).tolist(), rng.normal(1009, 3, n).tolist(),
+                       rain.tolist(), rng.integers(0, 101, n).tolist())
+
+        _insert_chunks(conn, "INSERT INTO weather_api (ts, humidity, pressure, rain_1h, clouds) VALUES (?, ?, ?, ?, ?)",
+                       side, weather_rows)
+
+        statuses = np.array(["Healthy", "Moderate Stress", "High Stress"])
+
+        def health_rows(lo, hi):
+            n = hi - lo
+            return zip(_ts_strings(side_ts[lo:hi]), rng.integers(0, 50, n).tolist(), statuses[rng.integers(0, 3, n)].tolist())
+
+        _insert_chunks(conn, "INSERT INTO plant_health (ts, sensor_id, health_status) VALUES (?, ?, ?)",
+                       side, health_rows)
+
+        days = [end.replace(hour=1, minute=0, second=0) - timedelta(days=d) for d in range(SPAN.days, -1, -1)]
+        sun_rows = []
+        for day in days:
+            swing = np.sin((day.timetuple().tm_yday - 80) / 365 * 2 * np.pi) * 25 * 60
+            sunrise = timedelta(hours=6, minutes=15) - timedelta(seconds=int(swing) // 2)
+            sunset = timedelta(hours=18, minutes=25) + timedelta(seconds=int(swing) // 2)
+            sun_rows.append((_format_datetime(day), _format_time(sunrise), _format_time(sunset),
+                             _format_time((sunrise + sunset) / 2), _format_time(sunset - sunrise)))
+        conn.executemany("INSERT INTO sunrise_sunset (ts, sunrise, sunset, solar_noon, day_length) VALUES (?, ?, ?, ?, ?)",
+                         sun_rows)
+
+        for metric, (table, column) in METRICS.items():
+            for res in RESOLUTIONS.values():
+                conn.execute(f"""
+                    INSERT INTO sensor_rollup (metric, resolution, bucket_ts, min_value, max_value, sum_value, count)
+                    SELECT ?, ?, datetime((CAST(strftime('%s', ts) AS INTEGER) / ?) * ?, 'unixepoch') AS bucket,
+                           MIN({column}), MAX({column}), SUM({column}), COUNT({column})
+                    FROM {table} WHERE {column} IS NOT NULL
+                    GROUP BY bucket
+                """, (metric, res, res, res))
+
+        conn.execute("INSERT INTO seed_info (rows, seeded_at) VALUES (?, ?)", (rows, _format_datetime(end)))
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return time.perf_counter() - started
@@ -0,0 +1,128 @@
+"""Import time of ``main`` and time-to-first-request of a fresh server.
+
+``import`` is the median time to ``import main`` in a new interpreter,
+where nothing has been imported yet. For the request timings a server
+process (uvicorn on the app, pool pointed at a seeded SQLite stand-in, see
+``benchmarks.standin``) is spawned per run and polled; times are counted
+from the spawn:
+
+- ``first read``: first 200 from ``GET /api/sensor-data/recent``
+- ``first predict``: a ``POST /api/predict-moisture`` sent right after it
+- ``ready``: first 200 from ``GET /api/system/ready``
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import standin
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def import_seconds():
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(client, method, path, deadline, **kwargs):
+    """Seconds until ``path`` answers 200, or None if it never does or does not exist."""
+    while time.perf_counter() < deadline:
+        try:
+            response = client.request(method, path, **kwargs)
+        except httpx.TransportError:
+            time.sleep(0.005)
+            continue
+        if response.status_code == 200:
+            return time.perf_counter()
+        if response.status_code == 404:
+            return None
+        time.sleep(0.005)
+    return None
+
+
+def serve_once(db_path, timeout):
+    port = free_port()
+    spawned = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.startup", "--serve", db_path, str(port)],
+                            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = spawned + timeout
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            first_read = wait_for(client, "GET", "/api/sensor-data/recent", deadline)
+            first_predict = wait_for(client, "POST", "/api/predict-moisture", deadline,
+                                     json={"temperature": 30.0, "humidity": 70.0, "light_intensity": 500.0})
+            ready = wait_for(client, "GET", "/api/system/ready", deadline)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {name: None if t is None else t - spawned
+            for name, t in (("first read", first_read), ("first predict", first_predict), ("ready", ready))}
+
+
+def serve(db_path, port):
+    """Child process: the app on a stand-in pool, as ``uvicorn main:app`` would run it."""
+    import uvicorn
+
+    from database import Database
+
+    Database.use_pool(standin.stand_in_pool(db_path))
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def seconds(values):
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values) * 1000:8.0f}ms" if values else "       n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=10000, help="rows in the stand-in database")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "smartfarm-bench"))
+    parser.add_argument("--serve", nargs=2, metavar=("DB", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve[0], int(args.serve[1]))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f"smartfarm-{args.rows}.sqlite")
+    info = standin.seed_info(path)
+    if info is None or info[0] != args.rows:
+        print(f"seeding {args.rows:,} rows into {path} ...", flush=True)
+        standin.seed(path, args.rows)
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    runs = [serve_once(path, args.timeout) for _ in range(args.runs)]
+    print(f"median of {args.runs} runs")
+    print(f"  import main    {seconds(imports)}")
+    for name in ("first read", "first predict", "ready"):
+        print(f"  {name:<14} {seconds([run[name] for run in runs])}")
+
+
+if __name__ == "__main__":
+    main()
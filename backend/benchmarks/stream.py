@@ -0,0 +1,54 @@
+"""Cost of publishing live events to many stream clients.
+
+Publishes sensor events in ingestion-sized batches to an ``EventHub`` with N
+subscribed clients on the same event loop and drains their queues as the
+SSE responses would. It reports events and deliveries per second and the
+time one event costs across all clients.
+
+Run from the backend directory:
+
+    python -m benchmarks.stream --clients 500 --events 20000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from services.stream import EventHub
+
+
+async def run(args):
+    start_ts = datetime(2025, 1, 1)
+    records = [
+        {"id": i, "timestamp": start_ts + timedelta(minutes=i), "lux": 812.5, "temperature": 31.2,
+         "soil_moisture": 42.7}
+        for i in range(args.events)
+    ]
+    hub = EventHub(history=args.events, max_queue=args.batch * 2)
+    subscribers = [hub.subscribe(["sensor"]) for _ in range(args.clients)]
+
+    start = time.perf_counter()
+    for i in range(0, len(records), args.batch):
+        hub.publish("sensor", records[i:i + args.batch])
+        # Let the fan-out run, then drain every client as its response would
+        await asyncio.sleep(0)
+        for subscriber in subscribers:
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+    elapsed = time.perf_counter() - start
+    stats = hub.stats()
+    print(f"{args.events:,} events to {args.clients} clients in batches of {args.batch}")
+    print(f"{args.events / elapsed:,.0f} events/s, {stats['delivered'] / elapsed:,.0f} deliveries/s, "
+          f"{elapsed / args.events * 1e6:,.1f} us per event, {stats['disconnected_slow']} clients disconnected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
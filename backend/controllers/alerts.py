@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Header, Request
+from typing import Optional
+from controllers.stream import event_stream
+from services.alerts import alert_engine
+
+router = APIRouter()
+
+
+@router.get("/alerts")
+async def get_alerts(after: Optional[int] = None):
+    """Recent alert events, oldest first; ``after`` skips those up to that id."""
+    return alert_engine.recent(after)
+
+
+@router.get("/alerts/active")
+async def get_active_alerts():
+    return alert_engine.active()
+
+
+@router.get("/alerts/stream")
+async def stream_alerts(request: Request, last_event_id: Optional[int] = Header(None)):
+    """Server-Sent Events: one ``alert`` event per fired or resolved alert; the same as ``/stream?topics=alert``."""
+    return event_stream(request, ["alert"], last_event_id)
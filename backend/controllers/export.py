@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from services import export
+from datetime import datetime
+
+router = APIRouter()
+
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: Literal["sensor", "weather", "sun", "joined"],
+    format: Literal["parquet", "arrow"] = "parquet",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    """Stream a table, or the sensor readings joined with weather and daylight, as Parquet or Arrow IPC."""
+    media_type, extension = export.FORMATS[format]
+    return StreamingResponse(
+        export.stream(dataset, format, from_, to),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={dataset}.{extension}"},
+    )
@@ -1,34 +1,47 @@
-import pandas as pd
+import numpy as np
 from fastapi import APIRouter, HTTPException, Body
 from typing import List
-from models import HealthPredictionInput, HealthScore, WateringRequest, MoisturePredictionInput
-from pathlib import Path
-import joblib
-from database import Database
+from models import HealthPredictionInput, HealthScore, WateringRequest, MoisturePredictionInput, MoistureForecast
+from services.health_history import health_history
+from services.inference import inference
+from services.moisture_forecast import moisture_forecast
+from services import watering
+from services.watering import watering_engine
+from services.forecast import FARM_LAT, FARM_LON, forecast_cache
 from datetime import datetime, timezone, timedelta
-from config import OPENWEATHER_API_KEY
+import config
 import httpx
 
 
 router = APIRouter()
 
-@router.post("/predict-health")
-async def predict_health(data: HealthPredictionInput):
+PREDICT_MAX_BATCH: int = getattr(config, "PREDICT_MAX_BATCH", 10000)
+
+
+def health_features(items: List[HealthPredictionInput]) -> np.ndarray:
+    # Column order must match train_health_model.py
+    return np.array(
+        [(d.temperature, d.soil_moisture, d.humidity, d.light_intensity) for d in items],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+
+
+def moisture_features(items: List[MoisturePredictionInput]) -> np.ndarray:
+    # Column order must match train_moisture_model.py
+    return np.array(
+        [(d.temperature, d.humidity, d.light_intensity) for d in items],
+        dtype=np.float64,
+    ).reshape(-1, 3)
 
-    model_path = Path(__file__).resolve().parent.parent / "ml" / "plant_health_score_model.pkl"
-    scaler_path = Path(__file__).resolve().parent.parent / "ml" / "scaler.pkl"
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
 
+def check_batch_size(items: list):
+    if len(items) > PREDICT_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {PREDICT_MAX_BATCH} items)")
+
+@router.post("/predict-health")
+async def predict_health(data: HealthPredictionInput):
     try:
-        check_query = """
-        SELECT health_status, ts 
-        FROM plant_health 
-        WHERE sensor_id = %s 
-        ORDER BY ts DESC 
-        LIMIT 1
-        """
-        existing = Database.fetch_one(check_query, (data.sensor_id,))
+        existing = await health_history.latest(data.sensor_id)
 
         if existing:
             return {
@@ -37,22 +50,11 @@ async def predict_health(data: HealthPredictionInput):
                 "timestamp": existing["ts"]
             }
 
-        input_data = pd.DataFrame([{
-            "ambient_temperature": data.temperature,
-            "soil_moisture": data.soil_moisture,
-            "humidity": data.humidity,
-            "light_intensity": data.light_intensity
-        }])
-
-        input_scaled = scaler.transform(input_data)
-        status = model.predict(input_scaled)[0]
+        status = (await inference.predict("health", health_features([data])))[0]
 
         if data.save_to_history:
-            save_query = """
-            INSERT INTO plant_health (ts, sensor_id, health_status)
-            VALUES (%s, %s, %s)
-            """
-            Database.execute_insert(save_query, (datetime.now(), data.sensor_id, status))
+            # Written by the health_history flush task after the response
+            await health_history.record([(datetime.now(), data.sensor_id, status)])
 
         return {
             "health_status": status,
@@ -62,15 +64,35 @@ async def predict_health(data: HealthPredictionInput):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
 
+@router.post("/predict-health/batch")
+async def predict_health_batch(data: List[HealthPredictionInput]):
+    """Score many readings with one model call; history is not consulted."""
+    check_batch_size(data)
+    if not data:
+        return {"predictions": [], "saved": 0}
+
+    try:
+        statuses = await inference.predict("health", health_features(data))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+
+    now = datetime.now()
+    history = [(now, d.sensor_id, str(status)) for d, status in zip(data, statuses) if d.save_to_history]
+    if history:
+        await health_history.record(history)
+
+    return {
+        "predictions": [
+            {"sensor_id": d.sensor_id, "health_status": str(status)}
+            for d, status in zip(data, statuses)
+        ],
+        "saved": len(history)
+    }
+
 @router.get("/health-history", response_model=List[HealthScore])
 async def get_health_history():
-    query = """
-        SELECT ts as timestamp, health_status
-        FROM plant_health
-        WHERE ts > DATE_SUB(NOW(), INTERVAL 24 HOUR)
-        ORDER BY ts ASC
-    """
-    data = Database.execute_query(query)
+    # Includes predictions still waiting in the write-behind queue
+    data = await health_history.since(datetime.now() - timedelta(hours=24))
     
     if not data:
         raise HTTPException(status_code=404, detail="No health history found")
@@ -84,15 +106,8 @@ def convert_to_thai_time(utc_timestamp, timezone_offset):
 # Example code to return the JSON response with Thai time
 @router.get("/when-will-it-rain")
 async def when_will_it_rain():
-    url = (
-        f"https://api.openweathermap.org/data/2.5/forecast?lat=13.8657&lon=100.462&appid={OPENWEATHER_API_KEY}&units=metric"
-    )
-
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
+        data = await forecast_cache.get(FARM_LAT, FARM_LON)
 
         now = datetime.now().timestamp()
         timezone_offset = data["city"]["timezone"]
@@ -132,13 +147,21 @@ async def when_will_it_rain():
         raise HTTPException(status_code=500, detail=f"Failed to fetch weather: {str(e)}")
     
 
+@router.get("/moisture-forecast", response_model=MoistureForecast)
+async def get_moisture_forecast():
+    """Projected soil moisture and rain for every 3-hour slot of the 5-day forecast."""
+    try:
+        return await moisture_forecast(FARM_LAT, FARM_LON)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch weather: {str(e)}")
+
+
 @router.post("/watering-recommendation")
 async def watering_recommendation(request: WateringRequest = Body(...)):
     moisture = request.moisture
     temperature = request.temperature
     lux = request.lux
     datetime_local = request.datetime_local
-    print(datetime_local)
 
     hours_until_rain = None
 
@@ -151,23 +174,8 @@ async def watering_recommendation(request: WateringRequest = Body(...)):
         except ValueError:
             return {"status": "error", "message": "Invalid datetime format"}
 
-    if hours_until_rain is not None and hours_until_rain <= 24:
-        if moisture >= 50:
-            advice = "No need to water. Rain is coming and soil is moist."
-        else:
-            advice = "Hold off watering. Rain is expected soon."
-    else:
-        if moisture < 30:
-            if hours_until_rain is not None:
-                advice = f"The soil is very dry, and rain isn't expected for another {hours_until_rain:.0f} hours. Better to water your plants now to keep them healthy."
-            else:
-                advice = "The soil is very dry, and there's no rain forecasted. It's a good time to water your plants."
-        elif temperature > 35 or lux > 10000:
-            advice = "Water lightly. Conditions are hot or very sunny."
-        elif moisture < 50:
-            advice = "Optional watering. Soil is moderately moist."
-        else:
-            advice = "No watering needed. Soil is healthy."
+    code = watering.rules(np.array([moisture]), np.array([temperature]), np.array([lux]), hours_until_rain)[0]
+    advice = watering.advice(int(code), hours_until_rain)
 
     return {
         "status": "ok",
@@ -180,23 +188,19 @@ async def watering_recommendation(request: WateringRequest = Body(...)):
     }
 
 
-@router.post("/predict-moisture")
-async def predict_health(data: MoisturePredictionInput):
+@router.get("/watering-recommendations")
+async def get_watering_recommendations():
+    """``/watering-recommendation`` for the latest reading of every sensor, with the rain time looked up here."""
+    try:
+        return await watering_engine.evaluate(FARM_LAT, FARM_LON)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch weather: {str(e)}")
 
-    model_path = Path(__file__).resolve().parent.parent / "ml" / "plant_moisture_model.pkl"
-    scaler_path = Path(__file__).resolve().parent.parent / "ml" / "scaler_moisture.pkl"
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
 
+@router.post("/predict-moisture")
+async def predict_health(data: MoisturePredictionInput):
     try:
-        input_data = pd.DataFrame([{
-            "ambient_temperature": data.temperature,
-            "humidity": data.humidity,
-            "light_intensity": data.light_intensity
-        }])
-
-        input_scaled = scaler.transform(input_data)
-        moisture = model.predict(input_scaled)[0]
+        moisture = (await inference.predict("moisture", moisture_features([data])))[0]
 
         return {
             "soil_moisture": moisture,
@@ -205,3 +209,17 @@ async def predict_health(data: MoisturePredictionInput):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+
+
+@router.post("/predict-moisture/batch")
+async def predict_moisture_batch(data: List[MoisturePredictionInput]):
+    check_batch_size(data)
+    if not data:
+        return {"predictions": []}
+
+    try:
+        moisture = await inference.predict("moisture", moisture_features(data))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+
+    return {"predictions": moisture.tolist()}
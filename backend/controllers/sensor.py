@@ -1,126 +1,244 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import base64
+import csv
+import io
+import json
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from models import SensorData
-from database import Database
-from datetime import datetime
+from database import AsyncDatabase, Database
+from services.asof_join import COLUMNS, fetch_environment, range_clause
+from services.correlation import correlation_stats
+from services.downsample import lttb
+from services import rollups
+from services.recent import RECENT_WINDOW, sensor_buffer, to_records
+from datetime import datetime, timedelta
 import numpy as np
 
 router = APIRouter()
 
+SENSOR_COLUMNS = ["id", "timestamp", "lux", "temperature", "soil_moisture"]
+EXPORT_CHUNK_ROWS = 1000
+SENSOR_BUFFER_FIELDS = {"id": "id", "lux": "lux", "temperature": "temperature", "soil_moisture": "soil_moisture"}
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/sensor-data", response_model=List[SensorData])
-async def get_all_sensor_data():
-    query = """
+async def get_all_sensor_data(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+):
+    """All readings oldest first.
+
+    With ``limit`` the result is one page; the ``X-Next-Cursor`` response
+    header carries the cursor for the following page and is absent on the
+    last one. Pages are keyed on (ts, id), so rows inserted meanwhile are
+    neither skipped nor repeated.
+    """
+    if limit is None and cursor is None:
+        query = """
+            /* name: sensor_all */
+            SELECT id, ts as timestamp, lux, temperature, moisture as soil_moisture
+            FROM smartfarm 
+            ORDER BY ts ASC
+        """
+        return await AsyncDatabase.execute_query(query)
+
+    limit = limit or 1000
+    where, params = "", ()
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        where = "WHERE ts > %s OR (ts = %s AND id > %s)"
+        params = (ts, ts, row_id)
+
+    query = f"""
+        /* name: sensor_page */
         SELECT id, ts as timestamp, lux, temperature, moisture as soil_moisture
-        FROM smartfarm 
-        ORDER BY ts ASC
+        FROM smartfarm
+        {where}
+        ORDER BY ts ASC, id ASC
+        LIMIT %s
     """
-    return Database.execute_query(query)
+    # One extra row tells us whether another page exists
+    rows = await AsyncDatabase.execute_query(query, params=params + (limit + 1,))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["timestamp"], last["id"])
+    return rows
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_chunks(chunks):
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(SENSOR_COLUMNS, row)), default=_json_default) + "\n" for row in rows
+        )
+
+
+def _csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SENSOR_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/sensor-data/export")
+def export_sensor_data(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    """Stream readings oldest first as NDJSON or CSV with bounded memory."""
+    where, params = range_clause(from_, to)
+    query = f"""
+        /* name: sensor_export */
+        SELECT id, ts, lux, temperature, moisture
+        FROM smartfarm
+        {where}
+        ORDER BY ts ASC, id ASC
+    """
+    chunks = Database.stream_rows(query, params, chunk_size=EXPORT_CHUNK_ROWS)
+    if format == "csv":
+        return StreamingResponse(_csv_chunks(chunks), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=sensor-data.csv"})
+    return StreamingResponse(_ndjson_chunks(chunks), media_type="application/x-ndjson")
 
 
 @router.get("/sensor-data/recent", response_model=List[SensorData])
 async def get_sensor_data():
+    window = sensor_buffer.window(datetime.now() - RECENT_WINDOW)
+    if window is not None:
+        return to_records(window, SENSOR_BUFFER_FIELDS, descending=True)
     query = """
+        /* name: sensor_recent */
         SELECT id, ts as timestamp, lux, temperature, moisture as soil_moisture
         FROM smartfarm 
         WHERE ts > DATE_SUB(NOW(), INTERVAL 24 HOUR)
         ORDER BY ts DESC
     """
-    return Database.execute_query(query)
+    return await AsyncDatabase.execute_query(query)
 
-@router.get("/correlation-matrix")
-async def get_correlation_matrix():
-    query = """
-        SELECT
-            s.moisture AS soil_moisture,
-            s.temperature,
-            s.lux,
-            w.rain_1h,
-            w.humidity,
-            sun.sunrise,
-            sun.sunset,
-            s.ts AS sensor_ts
-        FROM smartfarm s
-        JOIN weather_api w ON ABS(TIMESTAMPDIFF(MINUTE, s.ts, w.ts)) <= 10
-        JOIN sunrise_sunset sun ON DATE(s.ts) = DATE(sun.ts)
-    """
+# Raw rows are downsampled directly up to this multiple of the requested points;
+# beyond it the pre-aggregated rollups are read instead
+SERIES_RAW_FACTOR = 4
 
-    rows = Database.execute_query(query)
 
-    if not rows:
+@router.get("/sensor-data/series")
+async def get_sensor_series(
+    metric: Literal["lux", "temperature", "moisture", "humidity", "rain"] = "moisture",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    points: int = Query(500, ge=3, le=5000),
+):
+    """Chart-ready series of at most ``points`` points for any time range.
+
+    Short ranges come from the raw table, longer ones from the finest rollup
+    that covers the range; either way LTTB downsampling keeps the visual
+    shape (peaks and dips) of the series.
+    """
+    end = to or datetime.now()
+    start = from_ or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+
+    table, column = rollups.METRICS[metric]
+    count = await AsyncDatabase.fetch_rows(
+        f"/* name: series_count */ SELECT COUNT(*) FROM {table} WHERE ts >= %s AND ts <= %s AND {column} IS NOT NULL",
+        (start, end),
+    )
+    if count[0][0] <= points * SERIES_RAW_FACTOR:
+        resolution = "raw"
+        rows = await AsyncDatabase.fetch_rows(
+            f"""
+            /* name: series_raw */
+            SELECT ts, {column}, {column}, {column}, 1
+            FROM {table}
+            WHERE ts >= %s AND ts <= %s AND {column} IS NOT NULL
+            ORDER BY ts ASC
+            """,
+            (start, end),
+        )
+    else:
+        resolution = rollups.pick_resolution(start, end, points * SERIES_RAW_FACTOR)
+        rows = await rollups.fetch_buckets(metric, resolution, start, end)
+
+    if rows:
+        ts = np.array([r[0] for r in rows], dtype="datetime64[s]").astype(np.int64)
+        avg = np.array([r[3] for r in rows], dtype=np.float64)
+        rows = [rows[i] for i in lttb(ts, avg, points)]
+
+    return {
+        "metric": metric,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "points": [
+            {"timestamp": r[0], "min": r[1], "max": r[2], "value": r[3], "count": r[4]}
+            for r in rows
+        ],
+    }
+
+
+def correlation_response(keys, corr_matrix):
+    return {k1: {k2: round(corr_matrix[i][j], 2) for j, k2 in enumerate(keys)} for i, k1 in enumerate(keys)}
+
+@router.get("/correlation-matrix")
+async def get_correlation_matrix(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    if from_ is None and to is None:
+        # Whole history: served from the running statistics, only new rows are read
+        acc = await correlation_stats.refresh()
+        if acc.count == 0:
+            raise HTTPException(status_code=404, detail="No data found")
+        if acc.count < 2:
+            raise HTTPException(status_code=400, detail="Not enough data for correlation")
+        return correlation_response(acc.keys, acc.correlation())
+
+    data = await fetch_environment(from_, to)
+
+    if len(data["ts"]) == 0:
         raise HTTPException(status_code=404, detail="No data found")
 
-    keys = ["soil_moisture", "temperature", "rain_1h", "humidity", "lux", "daylight_minutes"]
-    data_matrix = []
-
-    for row in rows:
-        try:
-            # Ensure correct column names
-            soil_moisture = row.get("soil_moisture")
-            temperature = row.get("temperature")
-            lux = row.get("lux")
-            rain_1h = row.get("rain_1h")
-            humidity = row.get("humidity")
-            sunrise_str = row.get("sunrise")
-            sunset_str = row.get("sunset")
-            sensor_ts = row.get("sensor_ts")  # Sensor timestamp for the date
-
-            # Check if sunrise and sunset are present
-            if sunrise_str and sunset_str:
-                # Get the date from sensor_ts
-                if isinstance(sensor_ts, str):
-                    sensor_date = datetime.strptime(sensor_ts, "%Y-%m-%d %H:%M:%S").date()
-                else:  # Assume it's already a datetime
-                    sensor_date = sensor_ts.date()
-
-                # Process sunrise
-                if isinstance(sunrise_str, str):
-                    try:
-                        # Try parsing as time only
-                        sunrise_time = datetime.strptime(sunrise_str, "%H:%M:%S").time()
-                        sunrise = datetime.combine(sensor_date, sunrise_time)
-                    except ValueError:
-                        # Try parsing as full datetime
-                        sunrise = datetime.strptime(sunrise_str, "%Y-%m-%d %H:%M:%S")
-                else:  # Already a datetime
-                    sunrise = sunrise_str
-
-                # Process sunset
-                if isinstance(sunset_str, str):
-                    try:
-                        # Try parsing as time only
-                        sunset_time = datetime.strptime(sunset_str, "%H:%M:%S").time()
-                        sunset = datetime.combine(sensor_date, sunset_time)
-                    except ValueError:
-                        # Try parsing as full datetime
-                        sunset = datetime.strptime(sunset_str, "%Y-%m-%d %H:%M:%S")
-                else:  # Already a datetime
-                    sunset = sunset_str
-                    
-                # Calculate daylight minutes
-                daylight_minutes = (sunset - sunrise).total_seconds() / 60.0
-
-            # Skip row if any required value is missing
-            if None in (soil_moisture, temperature, lux, rain_1h, humidity, daylight_minutes):
-                continue
-
-            data_matrix.append([
-                soil_moisture,
-                temperature,
-                rain_1h,
-                humidity,
-                lux,
-                daylight_minutes
-            ])
-        except Exception as e:
-            print(f"Error processing row: {e}")
-            continue
-
-    if len(data_matrix) < 2:
+    if len(data["ts"]) < 2:
         raise HTTPException(status_code=400, detail="Not enough data for correlation")
 
-    np_data = np.array(data_matrix)
+    keys = COLUMNS
+    np_data = np.column_stack([data[k] for k in keys])
     corr_matrix = np.corrcoef(np_data, rowvar=False)
 
-    result = {k1: {k2: round(corr_matrix[i][j], 2) for j, k2 in enumerate(keys)} for i, k1 in enumerate(keys)}
+    return correlation_response(keys, corr_matrix)
 
-    return result
\ No newline at end of file
+@router.post("/correlation-matrix/rebuild")
+async def rebuild_correlation_matrix():
+    # A rebuild rescans the whole history, so concurrent ones are refused rather than queued
+    if correlation_stats.rebuilding:
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    acc = await correlation_stats.rebuild()
+    return {"rows": acc.count, "watermark": acc.watermark}
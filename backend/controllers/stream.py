@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from services.stream import TOPICS, hub
+
+router = APIRouter()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def event_stream(request: Request, topics, last_id: Optional[int]) -> StreamingResponse:
+    subscriber = hub.subscribe(topics, last_id)
+    return StreamingResponse(hub.frames(subscriber, request.is_disconnected), media_type="text/event-stream",
+                             headers=SSE_HEADERS)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    topics: str = Query(",".join(TOPICS), description="Comma-separated: " + ", ".join(TOPICS)),
+    last_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+):
+    """Server-Sent Events with new rows as they are written, one event type per topic.
+
+    A reconnecting EventSource sends ``Last-Event-ID`` and gets the events it
+    missed first, or a ``reset`` event when they are no longer kept.
+    """
+    wanted = [topic.strip() for topic in topics.split(",") if topic.strip()]
+    unknown = sorted(set(wanted) - set(TOPICS))
+    if unknown or not wanted:
+        raise HTTPException(status_code=400, detail=f"Unknown topics {unknown}; choose from {list(TOPICS)}")
+    return event_stream(request, wanted, last_event_id if last_event_id is not None else last_id)
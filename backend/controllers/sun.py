@@ -1,63 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
 from models import SunData
-from database import Database
+from services.solar import sun_records
+from datetime import date, datetime
 
 router = APIRouter()
 
-def format_timedelta(td):
-    """Convert timedelta to HH:MM:SS format"""
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+# Longest range /sun-data/latest computes in one request
+SUN_MAX_DAYS = 3660
 
 @router.get("/sun-data", response_model=SunData)
 async def get_sun_data():
-    query = """
-        SELECT ts as timestamp, sunrise, sunset, solar_noon, day_length 
-        FROM sunrise_sunset 
-        ORDER BY ts DESC 
-    """
-    data = Database.execute_query(query, fetch_all=False)
-    
-    if not data:
-        raise HTTPException(status_code=404, detail="No sun data found")
-    
-    # Format timedelta objects to strings
-    formatted_data = {
-        "timestamp": data["timestamp"],
-        "sunrise": format_timedelta(data["sunrise"]),
-        "sunset": format_timedelta(data["sunset"]),
-        "solar_noon": format_timedelta(data["solar_noon"]),
-        "day_length": format_timedelta(data["day_length"])
-    }
-    
-    return formatted_data
+    """Today's sunrise, sunset, solar noon and day length at the farm."""
+    now = datetime.now()
+    return sun_records(now.date(), now.date(), timestamp=now)[0]
 
 @router.get("/sun-data/latest", response_model=List[SunData])
-async def get_sun_history():
-    query = """
-        SELECT ts as timestamp, sunrise, sunset, solar_noon, day_length 
-        FROM sunrise_sunset 
-        ORDER BY ts DESC
-        LIMIT 1
-    """
-    data = Database.execute_query(query)
-    
-    if not data:
-        raise HTTPException(status_code=404, detail="No sun history found")
-    
-    # Format timedelta objects to strings for each record
-    formatted_data = []
-    for item in data:
-        formatted_data.append({
-            "timestamp": item["timestamp"],
-            "sunrise": format_timedelta(item["sunrise"]),
-            "sunset": format_timedelta(item["sunset"]),
-            "solar_noon": format_timedelta(item["solar_noon"]),
-            "day_length": format_timedelta(item["day_length"])
-        })
-    
-    return formatted_data
\ No newline at end of file
+async def get_sun_history(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+):
+    """One entry per day in ``[from, to]``, newest first; just today by default."""
+    to = to or date.today()
+    from_ = from_ or to
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (to - from_).days >= SUN_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range too long (max {SUN_MAX_DAYS} days)")
+    return sun_records(from_, to)
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
+from database import Database
+from ml.registry import registry
+from services.ingestion import ingestion_worker
+from services.alerts import alert_engine
+from services.cache import response_cache
+from services.forecast import forecast_cache
+from services.health_history import health_history
+from services.inference import inference
+from services.recent import sensor_buffer, weather_buffer
+from services import metrics
+from services.startup import warmup
+from services.stream import hub
+from services.watering import watering_engine
+
+router = APIRouter()
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/system/ready")
+async def get_readiness():
+    """503 until the startup warmup has finished; failed steps are listed but don't block."""
+    status = warmup.status()
+    return JSONResponse(jsonable_encoder(status), status_code=200 if status["ready"] else 503)
+
+@router.get("/system/db-pool")
+async def get_db_pool_stats():
+    return Database.pool_stats()
+
+@router.get("/system/models")
+async def get_loaded_models():
+    return registry.info()
+
+@router.get("/system/inference")
+async def get_inference_stats():
+    return inference.stats()
+
+@router.get("/system/ingestion")
+async def get_ingestion_stats():
+    return ingestion_worker.stats()
+
+@router.get("/system/alerts")
+async def get_alert_stats():
+    return alert_engine.stats()
+
+@router.get("/system/stream")
+async def get_stream_stats():
+    return hub.stats()
+
+@router.get("/system/cache")
+async def get_cache_stats():
+    return response_cache.stats()
+
+@router.get("/system/forecast-cache")
+async def get_forecast_cache_stats():
+    return forecast_cache.stats()
+
+@router.get("/system/health-history")
+async def get_health_history_stats():
+    return health_history.stats()
+
+@router.get("/system/recent-buffer")
+async def get_recent_buffer_stats():
+    return {
+        name: {"rows": len(buffer), "capacity": buffer.capacity, "bytes": buffer.nbytes}
+        for name, buffer in (("sensor", sensor_buffer), ("weather", weather_buffer))
+    }
+
+@router.get("/system/watering")
+async def get_watering_stats():
+    return watering_engine.stats()
+
+@router.get("/system/profiles")
+async def get_profiles():
+    return metrics.profiles.list()
+
+@router.get("/system/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int):
+    """Collapsed stacks of one profiled request, for flamegraph.pl or speedscope."""
+    profile = metrics.profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile["collapsed"]
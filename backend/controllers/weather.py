@@ -1,18 +1,23 @@
 from fastapi import APIRouter, HTTPException
 from models import WeatherData
 from typing import List
-from database import Database
+from database import AsyncDatabase
+from datetime import datetime
+from services.recent import RECENT_WINDOW, to_records, weather_buffer
 
 router = APIRouter()
 
+WEATHER_BUFFER_FIELDS = {"humidity": "humidity", "pressure": "pressure", "rain_1h": "rain_1h", "cloudiness": "cloudiness"}
+
 @router.get("/weather-data", response_model=List[WeatherData])
 async def get_weather_data():
     query = """
+        /* name: weather_all */
         SELECT ts as timestamp, humidity, pressure, rain_1h, clouds as cloudiness
         FROM weather_api 
         ORDER BY ts DESC
     """
-    data = Database.execute_query(query)
+    data = await AsyncDatabase.execute_query(query)
     
     if not data:
         raise HTTPException(status_code=404, detail="No weather data found")
@@ -22,12 +27,13 @@ async def get_weather_data():
 @router.get("/weather-data/latest", response_model=WeatherData)
 async def get_weather_data():
     query = """
+        /* name: weather_latest */
         SELECT ts as timestamp, humidity, pressure, rain_1h, clouds as cloudiness
         FROM weather_api 
         ORDER BY ts DESC 
         LIMIT 1
     """
-    data = Database.execute_query(query, fetch_all=False)
+    data = await AsyncDatabase.execute_query(query, fetch_all=False)
     
     if not data:
         raise HTTPException(status_code=404, detail="No weather data found")
@@ -36,13 +42,17 @@ async def get_weather_data():
 
 @router.get("/weather-data/recent", response_model=List[WeatherData])
 async def get_weather_history():
+    window = weather_buffer.window(datetime.now() - RECENT_WINDOW)
+    if window is not None and len(window["ts"]):
+        return to_records(window, WEATHER_BUFFER_FIELDS)
     query = """
+        /* name: weather_recent */
         SELECT ts as timestamp, humidity, pressure, rain_1h, clouds as cloudiness
         FROM weather_api 
         WHERE ts > DATE_SUB(NOW(), INTERVAL 24 HOUR)
         ORDER BY ts ASC
     """
-    data = Database.execute_query(query)
+    data = await AsyncDatabase.execute_query(query)
     
     if not data:
         raise HTTPException(status_code=404, detail="No weather history found")
@@ -1,7 +1,312 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import mysql.connector
 from fastapi import HTTPException
+import config
 from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
-from typing import Any, Tuple
+from typing import Any, Callable, List, Optional, Tuple
+from services.metrics import Gauge, db_acquire_seconds, db_query_seconds, query_name
+
+DB_POOL_MIN_SIZE: int = getattr(config, "DB_POOL_MIN_SIZE", 1)
+DB_POOL_MAX_SIZE: int = getattr(config, "DB_POOL_MAX_SIZE", 10)
+DB_POOL_TIMEOUT: float = getattr(config, "DB_POOL_TIMEOUT", 10.0)
+DB_POOL_RECYCLE_SECONDS: float = getattr(config, "DB_POOL_RECYCLE_SECONDS", 3600.0)
+DB_POOL_PING_INTERVAL: float = getattr(config, "DB_POOL_PING_INTERVAL", 30.0)
+DB_QUERY_TIMEOUT: float = getattr(config, "DB_QUERY_TIMEOUT", 30.0)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable MySQL connections.
+
+    Idle connections are checked out LIFO so the warmest connection is reused
+    first. A connection is pinged on checkout if it has been idle for longer
+    than ``ping_interval`` and is replaced once it is older than ``recycle``
+    seconds, which keeps us clear of the server's ``wait_timeout``.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0,
+                 recycle=3600.0, ping_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_pings = 0
+
+    def fill(self):
+        """Open connections until the pool holds ``min_size`` of them."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {self.timeout:.1f}s waiting for a database connection"
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                entry = self._idle.pop()
+            else:
+                # Reserve the slot before connecting outside the lock
+                self._size += 1
+            self._in_use += 1
+
+        try:
+            entry = self._validate(entry) if entry is not None else self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        db_acquire_seconds.observe(waited)
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return entry
+
+    def release(self, entry, discard=False):
+        now = time.monotonic()
+        if not discard and now - entry.created_at >= self.recycle:
+            discard = True
+            with self._cond:
+                self._recycled += 1
+        if discard:
+            self._close(entry)
+        else:
+            entry.last_used = now
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        entry = self.acquire()
+        try:
+            yield entry.conn
+        except Exception:
+            self.release(entry, discard=True)
+            raise
+        else:
+            self.release(entry)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                "wait_seconds_max": round(self._wait_max, 6),
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+                "failed_health_checks": self._failed_pings,
+            }
+
+    def _open(self):
+        entry = _PooledConnection(self._connect())
+        with self._cond:
+            self._created += 1
+        return entry
+
+    def _validate(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at >= self.recycle:
+            with self._cond:
+                self._recycled += 1
+            self._close(entry)
+            return self._open()
+        if now - entry.last_used >= self.ping_interval:
+            try:
+                entry.conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._failed_pings += 1
+                self._close(entry)
+                return self._open()
+        return entry
+
+    @staticmethod
+    def _close(entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+
+def _connect():
+    # autocommit keeps a reused connection from pinning an old REPEATABLE READ snapshot
+    return mysql.connector.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        autocommit=True,
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _timed(fn):
+    """Record the call in ``db_query_duration_seconds`` under the query's name."""
+    @functools.wraps(fn)
+    def wrapper(conn, query, *args, **kwargs):
+        with db_query_seconds.time(query_name(query)):
+            return fn(conn, query, *args, **kwargs)
+    return wrapper
+
+
+@_timed
+def _fetch(conn, query: str, params: Tuple[Any, ...] = None, fetch_all: bool = True):
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        cursor.execute(query, params)
+
+        if fetch_all:
+            result = cursor.fetchall()
+        else:
+            result = cursor.fetchone()
+
+        while cursor.nextset():
+            pass
+
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
+
+@_timed
+def _fetch_rows(conn, query: str, params: Tuple[Any, ...] = None):
+    # Plain tuples skip the per-row dict building of a dictionary cursor
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
+
+@_timed
+def _insert(conn, query: str, params: Tuple[Any, ...] = None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        conn.commit()
+        return cursor.lastrowid
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
+
+@_timed
+def _insert_many(conn, query: str, rows: List[Tuple[Any, ...]], chunk_size: int = 1000,
+                 return_ids: bool = False):
+    # executemany() rewrites a plain INSERT ... VALUES into one multi-row
+    # statement; chunking keeps each statement under max_allowed_packet.
+    # The pool runs in autocommit, so the chunks are wrapped in one
+    # transaction: a failed chunk rolls back the ones before it and a
+    # retried batch is neither duplicated nor half written.
+    conn.start_transaction()
+    cursor = conn.cursor()
+    try:
+        count = 0
+        ids = []
+        for start in range(0, len(rows), chunk_size):
+            cursor.executemany(query, rows[start:start + chunk_size])
+            count += cursor.rowcount
+            if return_ids:
+                # InnoDB hands a multi-row simple INSERT consecutive ids
+                # starting at LAST_INSERT_ID()
+                ids.extend(range(cursor.lastrowid, cursor.lastrowid + cursor.rowcount))
+        conn.commit()
+        return ids if return_ids else count
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
 
 class Database:
     @staticmethod
@@ -18,52 +323,233 @@ class Database:
             raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
 
     @staticmethod
-    def execute_query(query: str, fetch_all: bool = True):
-        conn = Database.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        try:
-            cursor.execute(query)
-            
-            if fetch_all:
-                result = cursor.fetchall()
-            else:
-                result = cursor.fetchone()
+    def pool() -> ConnectionPool:
+        global _pool
+        if _pool is None:
+            with _pool_lock:
+                if _pool is None:
+                    _pool = ConnectionPool(
+                        _connect,
+                        min_size=DB_POOL_MIN_SIZE,
+                        max_size=DB_POOL_MAX_SIZE,
+                        timeout=DB_POOL_TIMEOUT,
+                        recycle=DB_POOL_RECYCLE_SECONDS,
+                        ping_interval=DB_POOL_PING_INTERVAL,
+                    )
+        return _pool
 
-            while cursor.nextset():
-                pass
+    @staticmethod
+    def use_pool(pool: ConnectionPool):
+        """Replace the process-wide pool, e.g. with one backed by a local stand-in database."""
+        global _pool
+        with _pool_lock:
+            old, _pool = _pool, pool
+        if old is not None and old is not pool:
+            old.close()
 
-            return result
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            cursor.close()
-            conn.close()
+    @staticmethod
+    def pool_stats():
+        return Database.pool().stats()
 
     @staticmethod
-    def execute_insert(query: str, params: Tuple[Any, ...] = None):
-        conn = Database.get_connection()
+    @contextmanager
+    def connection():
+        """Check a connection out of the pool for the duration of the block."""
+        pool = Database.pool()
         try:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.lastrowid
+            entry = pool.acquire()
+        except PoolTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
         except Exception as e:
-            conn.rollback()
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            cursor.close()
-            conn.close()
+            raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
+        try:
+            yield entry.conn
+        except BaseException:
+            pool.release(entry, discard=True)
+            raise
+        else:
+            pool.release(entry)
+
+    @staticmethod
+    def execute_query(query: str, fetch_all: bool = True, params: Tuple[Any, ...] = None):
+        with Database.connection() as conn:
+            return _fetch(conn, query, params, fetch_all=fetch_all)
+
+    @staticmethod
+    def stream_rows(query: str, params: Tuple[Any, ...] = None, chunk_size: int = 1000):
+        """Yield result rows in chunks from an unbuffered (server-side) cursor.
+
+        Only one chunk is held in memory at a time. The connection stays
+        checked out until the generator is exhausted or closed; a generator
+        abandoned part-way discards its connection, since unread rows are
+        still pending on it.
+        """
+        with Database.connection() as conn:
+            cursor = conn.cursor(buffered=False)
+            try:
+                with db_query_seconds.time(query_name(query)):
+                    cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def fetch_rows(query: str, params: Tuple[Any, ...] = None):
+        with Database.connection() as conn:
+            return _fetch_rows(conn, query, params)
+
+    @staticmethod
+    def execute_insert(query: str, params: Tuple[Any, ...] = None):
+        with Database.connection() as conn:
+            return _insert(conn, query, params)
+
+    @staticmethod
+    def execute_many(query: str, rows: List[Tuple[Any, ...]]):
+        with Database.connection() as conn:
+            return _insert_many(conn, query, rows)
+
+    @staticmethod
+    def insert_rows(query: str, rows: List[Tuple[Any, ...]]) -> List[int]:
+        """Multi-row insert that returns the auto-increment id of every row."""
+        with Database.connection() as conn:
+            return _insert_many(conn, query, rows, return_ids=True)
 
     @staticmethod
     def fetch_one(query: str, params: Tuple[Any, ...]):
+        with Database.connection() as conn:
+            return _fetch(conn, query, params, fetch_all=False)
+
+    @staticmethod
+    def close_pool():
+        global _pool
+        with _pool_lock:
+            if _pool is not None:
+                _pool.close()
+                _pool = None
+
+
+def _pool_gauges():
+    stats = Database.pool_stats()
+    return {("idle",): stats["idle"], ("in_use",): stats["in_use"]}
+
+
+Gauge("db_pool_connections", "Pooled database connections by state.", ["state"], _pool_gauges)
+
+
+class _QueryTask:
+    __slots__ = ("connection_id", "cancelled")
+
+    def __init__(self):
+        self.connection_id = None
+        self.cancelled = False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _kill_query(connection_id):
+    try:
         conn = Database.get_connection()
+    except Exception:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"KILL QUERY {int(connection_id)}")
+        cursor.close()
+    except Exception:
+        pass
+    finally:
+        conn.close()
+
+
+class AsyncDatabase:
+    """Awaitable counterpart of Database for use inside ``async def`` routes.
+
+    Queries run on a dedicated executor with one worker per pooled connection,
+    so the event loop keeps serving other requests while MySQL works. A query
+    that exceeds its timeout, or whose request is cancelled, is killed on the
+    server with ``KILL QUERY`` so it does not keep holding a worker.
+    """
+
+    @staticmethod
+    def executor() -> ThreadPoolExecutor:
+        global _executor
+        if _executor is None:
+            with _executor_lock:
+                if _executor is None:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=Database.pool().max_size,
+                        thread_name_prefix="db",
+                    )
+        return _executor
+
+    @staticmethod
+    def shutdown():
+        global _executor
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+                _executor = None
+
+    @staticmethod
+    async def run(fn: Callable, *args, timeout: Optional[float] = None):
+        """Run ``fn(conn, *args)`` on a pooled connection off the event loop."""
+        task = _QueryTask()
+
+        def work():
+            if task.cancelled:
+                return None
+            with Database.connection() as conn:
+                task.connection_id = getattr(conn, "connection_id", None)
+                try:
+                    return fn(conn, *args)
+                finally:
+                    task.connection_id = None
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(AsyncDatabase.executor(), work)
         try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, params)
-            return cursor.fetchone()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            cursor.close()
-            conn.close()
-            
\ No newline at end of file
+            return await asyncio.wait_for(future, timeout or DB_QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            AsyncDatabase._cancel(task)
+            raise HTTPException(status_code=504, detail="Database query timed out")
+        except asyncio.CancelledError:
+            AsyncDatabase._cancel(task)
+            raise
+
+    @staticmethod
+    def _cancel(task: _QueryTask):
+        task.cancelled = True
+        connection_id = task.connection_id
+        if connection_id is not None:
+            # The executor may be saturated, so don't queue the kill behind the query
+            threading.Thread(target=_kill_query, args=(connection_id,), daemon=True).start()
+
+    @staticmethod
+    async def execute_query(query: str, fetch_all: bool = True, params: Tuple[Any, ...] = None,
+                            timeout: Optional[float] = None):
+        return await AsyncDatabase.run(_fetch, query, params, fetch_all, timeout=timeout)
+
+    @staticmethod
+    async def fetch_rows(query: str, params: Tuple[Any, ...] = None, timeout: Optional[float] = None):
+        return await AsyncDatabase.run(_fetch_rows, query, params, timeout=timeout)
+
+    @staticmethod
+    async def execute_insert(query: str, params: Tuple[Any, ...] = None, timeout: Optional[float] = None):
+        return await AsyncDatabase.run(_insert, query, params, timeout=timeout)
+
+    @staticmethod
+    async def execute_many(query: str, rows: List[Tuple[Any, ...]], timeout: Optional[float] = None):
+        return await AsyncDatabase.run(_insert_many, query, rows, timeout=timeout)
+
+    @staticmethod
+    async def fetch_one(query: str, params: Tuple[Any, ...], timeout: Optional[float] = None):
+        return await AsyncDatabase.run(_fetch, query, params, False, timeout=timeout)
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -12,16 +14,83 @@ if not os.path.exists(os.path.join(os.path.dirname(__file__), "config.py")):
     sys.exit(1)
 
 from config import CORS_ORIGINS
-from controllers import sensor, weather, sun, predict
+from controllers import sensor, weather, sun, predict, export, alerts, stream, system
+from database import Database, AsyncDatabase
+from ml.registry import registry
+from services import recent, rollups
+from services.alerts import alert_engine
+from services.ingestion import MQTT_INGEST_ENABLED, MqttIngestion, ingestion_worker
+from services.cache import ResponseCacheMiddleware, response_cache
+from services.health_history import health_history
+from services.inference import inference
+from services.metrics import MetricsMiddleware
+from services.startup import warmup
+from services.http_client import close_client, get_client
 
-app = FastAPI(title="Soil Monitoring API")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.start_watching()
+    get_client()
+    background = []
+
+    async def warm_up():
+        await warmup.run(
+            [("models", registry.load), ("inference_pool", inference.start)],
+            [
+                ("db_pool", Database.pool().fill),
+                ("rollup_schema", rollups.ensure_schema),
+                # The recent endpoints read from MySQL until this or a poll succeeds
+                ("recent_buffers", recent.prime),
+                # /predict-health reads MySQL for the last status until this succeeds
+                ("health_index", health_history.load),
+            ],
+        )
+        # The periodic jobs start once the tables and buffers they update exist
+        background.append(asyncio.create_task(rollups.run_periodically()))
+        background.append(asyncio.create_task(recent.run_periodically()))
+
+    # Requests are served while this runs; /api/system/ready reports when it is done
+    warmup_task = asyncio.create_task(warm_up())
+    health_task = asyncio.create_task(health_history.run_periodically())
+    mqtt = None
+    if MQTT_INGEST_ENABLED:
+        # Fold freshly written rows, backdated board batches included, into the chart rollups right away
+        ingestion_worker.add_listener(lambda rows, ids: rollups.request_refresh())
+        ingestion_worker.add_listener(recent.on_ingested)
+        ingestion_worker.add_listener(alert_engine.on_ingested)
+        ingestion_worker.add_listener(lambda rows, ids: response_cache.invalidate("sensor"))
+        mqtt = MqttIngestion(ingestion_worker)
+        mqtt.start()
+    yield
+    if mqtt is not None:
+        mqtt.stop()
+    warmup_task.cancel()
+    for task in background:
+        task.cancel()
+    # Not cancelled: a batch being inserted must finish or go back on the queue
+    await health_history.close()
+    await health_task
+    inference.close()
+    await close_client()
+    registry.stop_watching()
+    AsyncDatabase.shutdown()
+    Database.close_pool()
+
+
+app = FastAPI(title="Soil Monitoring API", lifespan=lifespan)
+
+# Added first so CORS wraps it and cached responses still get CORS headers
+app.add_middleware(ResponseCacheMiddleware)
+# Outside the cache so cache hits are timed too
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Include routers
@@ -29,6 +98,11 @@ app.include_router(sensor.router, prefix="/api", tags=["sensors"])
 app.include_router(weather.router, prefix="/api", tags=["weather"])
 app.include_router(sun.router, prefix="/api", tags=["sun"])
 app.include_router(predict.router, prefix="/api", tags=["predict"])
+app.include_router(export.router, prefix="/api", tags=["export"])
+app.include_router(alerts.router, prefix="/api", tags=["alerts"])
+app.include_router(stream.router, prefix="/api", tags=["stream"])
+app.include_router(system.router, prefix="/api", tags=["system"])
+app.include_router(system.metrics_router, tags=["system"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""A fitted RandomForestClassifier and its StandardScaler flattened into NumPy arrays.
+
+``CompiledForest`` evaluates every tree for a whole batch at once. All
+trees' nodes live in one set of arrays (feature, threshold, left, right and
+the leaf class fractions). Each step of the loop moves every (tree, row)
+pair that hasn't reached a leaf one level down, so the number of steps is
+bounded by the depth of the deepest tree, not by the row count. A single
+row costs well under a millisecond instead of going through sklearn's
+validation and per-tree joblib dispatch. From a few hundred rows on,
+sklearn's compiled traversal is faster again, so the model registry only
+uses this path for small batches.
+
+Predictions match ``model.predict(scaler.transform(X))`` exactly. The
+scaling is done in float64 and the result rounded to float32 before the
+comparisons, as sklearn's trees do. Tree probabilities are summed in
+estimator order and divided by the tree count before the argmax.
+
+Export the arrays of the trained health model (no sklearn needed to load
+them) and check them against the test split, from the backend directory.
+The model registry then loads the export instead of rebuilding it, until
+the pickles are newer than it:
+
+    python -m ml.compiled_forest
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ML_DIR = Path(__file__).resolve().parent
+COMPILED_PATH = ML_DIR / "plant_health_compiled.npz"
+
+_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "mean", "scale", "classes")
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots, mean, scale, classes, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.mean = mean
+        self.scale = scale
+        self.classes = classes
+        self.depth = int(depth)
+        self._children = np.column_stack([left, right]).ravel()
+        self._is_leaf = left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None) -> "CompiledForest":
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_nodes, n_classes = offsets[-1], len(model.classes_)
+
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        left = np.empty(n_nodes, dtype=np.int32)
+        right = np.empty(n_nodes, dtype=np.int32)
+        value = np.empty((n_nodes, n_classes), dtype=np.float64)
+        for tree, start, end in zip(trees, offsets[:-1], offsets[1:]):
+            nodes = np.arange(start, end, dtype=np.int32)
+            is_leaf = tree.children_left < 0
+            # Leaves point at themselves, so rows that reach one early stay put
+            left[start:end] = np.where(is_leaf, nodes, tree.children_left + start)
+            right[start:end] = np.where(is_leaf, nodes, tree.children_right + start)
+            feature[start:end] = np.where(is_leaf, 0, tree.feature)
+            threshold[start:end] = np.where(is_leaf, 0.0, tree.threshold)
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            counts = tree.value[:, 0, :n_classes]
+            normalizer = counts.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            value[start:end] = counts / normalizer[:, None]
+
+        n_features = model.n_features_in_
+        mean = np.zeros(n_features) if scaler is None or not scaler.with_mean else scaler.mean_.astype(np.float64)
+        scale = np.ones(n_features) if scaler is None or not scaler.with_std else scaler.scale_.astype(np.float64)
+        return cls(feature, threshold, left, right, value, offsets[:-1].astype(np.int32), mean, scale,
+                   np.asarray(model.classes_), max(tree.max_depth for tree in trees))
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        # sklearn's trees compare float32 inputs against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        n, n_trees = len(X), len(self.roots)
+        # Feature-major, so the value a (tree, row) pair tests is at feature * n + row
+        flat = X.T.ravel()
+        rows = np.tile(np.arange(n), n_trees)
+        node = np.repeat(self.roots, n)
+        # Step only the pairs that haven't reached a leaf yet
+        active = np.flatnonzero(~self._is_leaf[node])
+        while active.size:
+            current = node[active]
+            goes_right = flat[self.feature[current] * n + rows[active]] > self.threshold[current]
+            node[active] = following = self._children[2 * current + goes_right]
+            active = active[~self._is_leaf[following]]
+        proba = np.zeros((n, self.value.shape[1]))
+        for tree_nodes in node.reshape(n_trees, n):
+            proba += self.value[tree_nodes]
+        proba /= n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def save(self, path=COMPILED_PATH):
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        arrays["classes"] = arrays["classes"].astype(str)
+        np.savez(path, depth=self.depth, **arrays)
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH) -> "CompiledForest":
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in _ARRAYS}
+            return cls(depth=data["depth"], **arrays)
+
+
+def health_test_split():
+    """The (X_test, y_test) split that train_health_model.py evaluates on."""
+    from sklearn.model_selection import train_test_split
+
+    from ml.training_data import load_columns
+
+    features = ["ambient_temperature", "soil_moisture", "humidity", "light_intensity"]
+    data = load_columns(ML_DIR / "plant_health_data.csv", features + ["plant_health_status"])
+    X = np.column_stack([data[name] for name in features]).astype(np.float64)
+    y = data["plant_health_status"]
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_test, y_test
+
+
+def main():
+    import joblib
+
+    model = joblib.load(ML_DIR / "plant_health_score_model.pkl")
+    scaler = joblib.load(ML_DIR / "scaler.pkl")
+    compiled = CompiledForest.from_sklearn(model, scaler)
+
+    X_test, _ = health_test_split()
+    expected = model.predict(scaler.transform(X_test))
+    mismatches = int((compiled.predict(X_test) != expected).sum())
+    if mismatches:
+        print(f"{mismatches} of {len(X_test)} test predictions differ from sklearn; not exporting")
+        sys.exit(1)
+
+    compiled.save(COMPILED_PATH)
+    print(f"{len(compiled.roots)} trees, {len(compiled.feature)} nodes, depth {compiled.depth}, "
+          f"{compiled.nbytes / 1024:.0f} KB -> {COMPILED_PATH.name}; "
+          f"all {len(X_test)} test predictions match sklearn")
+
+
+if __name__ == "__main__":
+    main()
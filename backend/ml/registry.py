@@ -0,0 +1,229 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from ml.compiled_forest import COMPILED_PATH, CompiledForest
+from services.metrics import model_inference_rows, model_inference_seconds, model_load_seconds
+
+ML_DIR = Path(__file__).resolve().parent
+
+# Above this many rows sklearn's own traversal beats the compiled forest
+COMPILED_MAX_ROWS = 512
+
+
+class ModelBundle:
+    """A model and the scaler it was trained with, loaded together."""
+
+    __slots__ = ("name", "model", "scaler", "compiled", "version", "loaded_at", "load_seconds", "_stamp")
+
+    def __init__(self, name, model, scaler, version, loaded_at, load_seconds, stamp, compiled=None):
+        self.name = name
+        self.model = model
+        self.scaler = scaler
+        self.compiled = compiled
+        self.version = version
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        self._stamp = stamp
+
+    def predict(self, X):
+        """Scale and predict a plain ``(n, features)`` array in one call.
+
+        The StandardScaler arithmetic is applied directly so a batch skips
+        sklearn's per-call input validation and feature-name checks. Small
+        batches for a random forest go to its CompiledForest, which gives
+        the same predictions without sklearn's per-tree dispatch.
+        """
+        start = time.perf_counter()
+        if self.compiled is not None and len(X) <= COMPILED_MAX_ROWS:
+            result = self.compiled.predict(X)
+        else:
+            scaler = self.scaler
+            if scaler.with_mean:
+                X = X - scaler.mean_
+            if scaler.with_std:
+                X = X / scaler.scale_
+            result = self.model.predict(X)
+        model_inference_seconds.observe(time.perf_counter() - start, self.name)
+        model_inference_rows.inc(len(X), self.name)
+        return result
+
+    def info(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 4),
+            "model": type(self.model).__name__,
+            "compiled": self.compiled is not None,
+        }
+
+
+def _stamp(paths):
+    return tuple((st.st_mtime_ns, st.st_size) for st in (os.stat(p) for p in paths))
+
+
+def _compile(model, scaler, stamp, path=None):
+    """The CompiledForest for ``model``, read from ``path`` when that export is newer than the pickles."""
+    if path is not None:
+        try:
+            fresh = os.stat(path).st_mtime_ns >= max(mtime for mtime, _ in stamp)
+        except OSError:
+            fresh = False
+        if fresh:
+            try:
+                compiled = CompiledForest.load(path)
+            except (OSError, KeyError, ValueError):
+                compiled = None
+            # The export stores class labels as strings; serve the model's own
+            if (compiled is not None and len(compiled.mean) == model.n_features_in_
+                    and np.array_equal(compiled.classes, np.asarray(model.classes_).astype(str))):
+                compiled.classes = np.asarray(model.classes_)
+                return compiled
+    return CompiledForest.from_sklearn(model, scaler)
+
+
+def _digest(paths):
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Process-wide cache of the trained models.
+
+    Bundles are unpickled once and shared by every request. A background
+    thread watches the pickle files and, when one changes, loads the new
+    bundle completely before swapping it in, so a request never sees a model
+    from one training run paired with the scaler from another.
+
+    A random forest also gets a CompiledForest. It is read from the bundle's
+    entry in ``compiled`` (as written by ``python -m ml.compiled_forest``)
+    when that file is newer than both pickles, and built from the model
+    otherwise.
+    """
+
+    def __init__(self, bundles, check_interval=5.0, compiled=None):
+        self._paths = {name: (Path(model), Path(scaler)) for name, (model, scaler) in bundles.items()}
+        self._compiled_paths = {name: Path(path) for name, path in (compiled or {}).items()}
+        self._bundles = {}
+        self._lock = threading.Lock()
+        self._errors = {}
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def load(self):
+        for name in self._paths:
+            self._reload(name)
+
+    def loaded(self) -> bool:
+        return all(name in self._bundles for name in self._paths)
+
+    def get(self, name) -> ModelBundle:
+        bundle = self._bundles.get(name)
+        if bundle is None:
+            with self._lock:
+                bundle = self._bundles.get(name)
+                if bundle is None:
+                    bundle = self._load(name)
+                    self._bundles[name] = bundle
+        return bundle
+
+    def info(self):
+        result = {}
+        for name in self._paths:
+            bundle = self._bundles.get(name)
+            entry = bundle.info() if bundle else {"name": name, "version": None, "loaded_at": None}
+            if name in self._errors:
+                entry["last_reload_error"] = self._errors[name]
+            result[name] = entry
+        return result
+
+    def start_watching(self):
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.check_interval)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            for name, paths in self._paths.items():
+                bundle = self._bundles.get(name)
+                try:
+                    changed = bundle is None or _stamp(paths) != bundle._stamp
+                except OSError:
+                    # Mid-write or briefly missing; try again on the next tick
+                    continue
+                if changed:
+                    try:
+                        self._reload(name)
+                    except Exception:
+                        pass  # recorded in self._errors, retried on the next tick
+
+    def _reload(self, name):
+        if name not in self._bundles:
+            # A first load goes through get(), so a request arriving meanwhile waits for it
+            try:
+                self.get(name)
+            except Exception as e:
+                self._errors[name] = f"{type(e).__name__}: {e}"
+                raise
+            self._errors.pop(name, None)
+            return
+        try:
+            bundle = self._load(name)
+        except Exception as e:
+            # Keep serving the previous bundle until the files load cleanly
+            self._errors[name] = f"{type(e).__name__}: {e}"
+            if name not in self._bundles:
+                raise
+            return
+        self._errors.pop(name, None)
+        with self._lock:
+            self._bundles[name] = bundle
+
+    def _load(self, name):
+        # Imported here so serving sensor reads never pays for joblib and sklearn
+        import joblib
+
+        model_path, scaler_path = self._paths[name]
+        start = time.perf_counter()
+        stamp = _stamp((model_path, scaler_path))
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        is_forest = hasattr(model, "estimators_") and hasattr(model, "classes_")
+        compiled = _compile(model, scaler, stamp, self._compiled_paths.get(name)) if is_forest else None
+        load_seconds = time.perf_counter() - start
+        model_load_seconds.observe(load_seconds, name)
+        return ModelBundle(
+            name=name,
+            model=model,
+            scaler=scaler,
+            version=_digest((model_path, scaler_path)),
+            loaded_at=datetime.now(),
+            load_seconds=load_seconds,
+            stamp=stamp,
+            compiled=compiled,
+        )
+
+
+registry = ModelRegistry({
+    "health": (ML_DIR / "plant_health_score_model.pkl", ML_DIR / "scaler.pkl"),
+    "moisture": (ML_DIR / "plant_moisture_model.pkl", ML_DIR / "scaler_moisture.pkl"),
+}, compiled={"health": COMPILED_PATH})
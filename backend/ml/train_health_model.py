@@ -1,18 +1,21 @@
-import pandas as pd
+import sys
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 import numpy as np
+from compiled_forest import CompiledForest
+from training_data import load_columns
 
-# Load data
-df = pd.read_csv("plant_health_data.csv")
+# Load data: plant_health_data.csv, or a Parquet/Arrow file given on the command line
+data_path = sys.argv[1] if len(sys.argv) > 1 else "plant_health_data.csv"
 
 # Features and target
 features = ['ambient_temperature', 'soil_moisture', 'humidity', 'light_intensity']
-X = df[features]
-y = df['plant_health_status']
+data = load_columns(data_path, features + ['plant_health_status'])
+X = np.column_stack([data[name] for name in features]).astype(np.float64)
+y = data['plant_health_status']
 
 # Split data
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -39,3 +42,6 @@ print(confusion_matrix(y_test, y_pred))
 # Save the model and scaler
 joblib.dump(model, "plant_health_score_model.pkl")
 joblib.dump(scaler, "scaler.pkl")
+
+# Flattened copy for the fast predictor; loads without sklearn
+CompiledForest.from_sklearn(model, scaler).save("plant_health_compiled.npz")
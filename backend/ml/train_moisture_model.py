@@ -1,16 +1,19 @@
-import pandas as pd
+import sys
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
 import numpy as np
+from training_data import load_columns
 
-df = pd.read_csv("plant_health_data.csv")
+# plant_health_data.csv, or e.g. a joined export: python -m services.export joined -o farm.parquet
+data_path = sys.argv[1] if len(sys.argv) > 1 else "plant_health_data.csv"
 
 features = ['ambient_temperature', 'humidity', 'light_intensity']
-X = df[features]
-y = df['soil_moisture']
+data = load_columns(data_path, features + ['soil_moisture'])
+X = np.column_stack([data[name] for name in features]).astype(np.float64)
+y = data['soil_moisture']
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
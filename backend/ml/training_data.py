@@ -0,0 +1,60 @@
+"""Training data for the scripts in this directory, read with pyarrow.
+
+Accepts the Parquet and Arrow IPC files written by
+``python -m services.export`` (file or stream format) as well as the CSV
+files kept here. Only the requested columns are read, and they come back as
+NumPy arrays without building a DataFrame. Rows with a null in any
+requested column are dropped.
+
+The training scripts use the column names of plant_health_data.csv; an
+export of the ``joined`` dataset names the same measurements after the
+database columns, so those names are accepted in their place.
+"""
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+# Training name -> name in an export of the joined dataset
+ALIASES = {
+    "ambient_temperature": "temperature",
+    "light_intensity": "lux",
+}
+
+
+def _read_table(path: Path, columns: Sequence[str]):
+    import pyarrow as pa
+
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        names = pq.read_schema(path).names
+        return pq.read_table(path, columns=[_resolve(c, names) for c in columns])
+    if suffix == ".csv":
+        import pyarrow.csv
+
+        return pyarrow.csv.read_csv(path)
+    with pa.memory_map(str(path)) as source:
+        try:
+            return pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            source.seek(0)
+            return pa.ipc.open_stream(source).read_all()
+
+
+def _resolve(column: str, names: Sequence[str]) -> str:
+    if column in names:
+        return column
+    alias = ALIASES.get(column)
+    if alias in names:
+        return alias
+    raise KeyError(f"column {column!r} not found (have {', '.join(names)})")
+
+
+def load_columns(path, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """``{column: array}`` for ``columns`` of the file at ``path``, complete rows only."""
+    path = Path(path)
+    table = _read_table(path, columns)
+    table = table.select([_resolve(c, table.column_names) for c in columns]).drop_null()
+    return {column: table.column(i).to_numpy() for i, column in enumerate(columns)}
@@ -1,12 +1,14 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
 class SensorData(BaseModel):
     id: int
     timestamp: datetime
-    lux: float
-    temperature: float
+    # NULL when a batched board couldn't read the light sensor
+    lux: Optional[float]
+    # NULL when the board reported "N/A"
+    temperature: Optional[float]
     soil_moisture: float
 
 class WeatherData(BaseModel):
@@ -18,8 +20,9 @@ class WeatherData(BaseModel):
 
 class SunData(BaseModel):
     timestamp: datetime
-    sunrise: str
-    sunset: str
+    # None where the sun does not rise or set that day
+    sunrise: Optional[str]
+    sunset: Optional[str]
     solar_noon: str
     day_length: str
 
@@ -44,4 +47,40 @@ class WateringRequest(BaseModel):
 class MoisturePredictionInput(BaseModel):
     temperature: float
     humidity: float
-    light_intensity: float
\ No newline at end of file
+    light_intensity: float
+
+class MoistureForecastSlot(BaseModel):
+    timestamp: int
+    datetime_local: datetime
+    temperature: float
+    humidity: float
+    # None until the farm has light readings from the last 24 hours
+    light_intensity: Optional[float]
+    soil_moisture: Optional[float]
+    rain_mm: float
+    weather: Optional[str]
+
+class RainEvent(BaseModel):
+    timestamp: int
+    datetime_local: datetime
+    rain_mm: float
+
+class MoistureForecast(BaseModel):
+    light_source: Optional[str]
+    first_rain: Optional[RainEvent]
+    total_rain_mm: float
+    slots: List[MoistureForecastSlot]
+
+class SensorPayload(BaseModel):
+    """A reading as published by the KidBright board over MQTT."""
+    lux: float
+    soil_moisture: float
+    temperature: Optional[float] = None
+    latitude: float
+    longitude: float
+
+    @field_validator("temperature", mode="before")
+    @classmethod
+    def missing_temperature(cls, value):
+        # The board sends "N/A" when the I2C temperature read fails
+        return None if value == "N/A" else value
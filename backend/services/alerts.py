@@ -0,0 +1,238 @@
+"""Threshold, rate-of-change and hysteresis alerts evaluated as readings are ingested.
+
+Rules come from ALERT_RULES, a list of dicts:
+
+- ``name``: alert name, reported with every event
+- ``metric``: ``moisture``, ``temperature`` or ``lux``
+- ``kind``:
+  - ``above`` / ``below``: the reading crosses ``threshold``
+  - ``rise`` / ``drop``: the metric changes faster than ``threshold`` units
+    per hour
+- ``clear`` (optional): the level at which a firing alert resolves and is
+  re-armed, for hysteresis. It defaults to ``threshold``. For example, a
+  ``below 20`` rule with ``clear`` 25 fires once when moisture falls under
+  20 and not again until it has been back above 25.
+- ``sensor`` (optional): ``[lat, lon]`` of one board. Such a rule replaces
+  the rule of the same name for that board only, so thresholds can differ
+  per sensor.
+
+``on_ingested`` is an ingestion listener and runs on the writer thread
+after each flush. Each (sensor, rule) pair keeps one flag, and each
+(sensor, metric) pair keeps one anchor reading for rates, so a reading
+costs O(rules) time whatever the history. The rate is taken against the
+anchor once it is at least ALERT_RATE_MIN_SECONDS old, so back-to-back
+readings don't produce huge rates. A reading older than its sensor's
+anchor, from a backdated board batch, still goes through the threshold
+rules but not the rate rules.
+
+Fired and resolved events are encoded to JSON once and handed to every
+subscriber: callbacks registered with ``subscribe``, including the
+``alert`` topic of the live event stream (services/stream.py) behind
+``/api/stream`` and ``/api/alerts/stream``. The last ALERT_HISTORY events are
+kept for ``/api/alerts``. Rows written by other writers (the Node-RED
+flow) do not pass through ingestion and are not evaluated.
+
+Throughput: ``python -m benchmarks.alerts``.
+"""
+import itertools
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+from services.stream import hub, json_default
+
+ALERT_RULES: List[dict] = getattr(config, "ALERT_RULES", [
+    {"name": "soil_dry", "metric": "moisture", "kind": "below", "threshold": 20, "clear": 25},
+    {"name": "soil_drying_fast", "metric": "moisture", "kind": "drop", "threshold": 10, "clear": 5},
+    {"name": "too_hot", "metric": "temperature", "kind": "above", "threshold": 40, "clear": 38},
+    {"name": "too_cold", "metric": "temperature", "kind": "below", "threshold": 10, "clear": 12},
+])
+ALERT_HISTORY: int = getattr(config, "ALERT_HISTORY", 500)
+ALERT_RATE_MIN_SECONDS: float = getattr(config, "ALERT_RATE_MIN_SECONDS", 60.0)
+
+# Position of each metric in an ingested (ts, lux, temperature, moisture, lat, lon) row
+METRICS = {"lux": 1, "temperature": 2, "moisture": 3}
+METRIC_NAMES = {index: name for name, index in METRICS.items()}
+KINDS = ("above", "below", "rise", "drop")
+
+Rule = Tuple[str, int, str, float, float]  # name, metric index, kind, threshold, clear
+
+
+def compile_rules(rules: List[dict]) -> Tuple[List[Rule], Dict[Tuple[float, float], List[Rule]]]:
+    """Validate ``rules``: (rules for every sensor, {(lat, lon): rules overriding them by name})."""
+    shared, overrides = [], {}
+    for rule in rules:
+        if rule.get("metric") not in METRICS or rule.get("kind") not in KINDS:
+            raise ValueError(f"Invalid alert rule {rule!r}: metric must be one of {sorted(METRICS)}, "
+                             f"kind one of {list(KINDS)}")
+        threshold = float(rule["threshold"])
+        compiled = (rule["name"], METRICS[rule["metric"]], rule["kind"], threshold,
+                    float(rule.get("clear", threshold)))
+        if "sensor" in rule:
+            lat, lon = rule["sensor"]
+            overrides.setdefault((lat, lon), []).append(compiled)
+        else:
+            shared.append(compiled)
+    return shared, overrides
+
+
+class _SensorState:
+    __slots__ = ("rules", "active", "anchors", "rate_metrics")
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self.active = [False] * len(rules)
+        self.rate_metrics = sorted({metric for _, metric, kind, _, _ in rules if kind in ("rise", "drop")})
+        # metric index -> (ts, value) the rate is measured against
+        self.anchors = {}
+
+
+class AlertEngine:
+    def __init__(self, rules: List[dict] = ALERT_RULES, history: int = ALERT_HISTORY,
+                 rate_min_seconds: float = ALERT_RATE_MIN_SECONDS):
+        self._shared, self._overrides = compile_rules(rules)
+        self.rate_min_seconds = rate_min_seconds
+        self._sensors: Dict[Tuple[float, float], _SensorState] = {}
+        self._subscribers: List[Callable[[List[dict], List[bytes]], None]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.history = deque(maxlen=history)
+
+        self.readings = 0
+        self.evaluations = 0
+        self.fired = 0
+        self.resolved = 0
+
+    def subscribe(self, callback: Callable[[List[dict], List[bytes]], None]):
+        """Call ``callback(events, encoded)`` with each group of new events, on the thread that evaluated them."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _state(self, key) -> _SensorState:
+        state = self._sensors.get(key)
+        if state is None:
+            override = self._overrides.get(key, [])
+            names = {rule[0] for rule in override}
+            rules = [rule for rule in self._shared if rule[0] not in names] + override
+            state = self._sensors[key] = _SensorState(rules)
+        return state
+
+    def evaluate(self, rows) -> List[dict]:
+        """Run ``rows`` through the rules; returns the events they caused."""
+        events = []
+        evaluations = 0
+        with self._lock:
+            for row in rows:
+                ts = row[0]
+                key = (row[4], row[5])
+                state = self._state(key)
+                anchors = state.anchors
+                active = state.active
+                for i, (name, metric, kind, threshold, clear) in enumerate(state.rules):
+                    value = row[metric]
+                    if value is None:
+                        continue
+                    if kind == "rise" or kind == "drop":
+                        anchor = anchors.get(metric)
+                        if anchor is None:
+                            continue
+                        seconds = (ts - anchor[0]).total_seconds()
+                        if seconds < self.rate_min_seconds:
+                            continue
+                        level = (value - anchor[1]) * 3600 / seconds
+                        if kind == "drop":
+                            level = -level
+                        firing, clearing = level > threshold, level <= clear
+                    elif kind == "above":
+                        level = value
+                        firing, clearing = value > threshold, value <= clear
+                    else:
+                        level = value
+                        firing, clearing = value < threshold, value >= clear
+                    evaluations += 1
+                    if active[i]:
+                        if clearing:
+                            active[i] = False
+                            events.append(self._event("resolved", name, kind, metric, threshold, level, ts, key))
+                    elif firing:
+                        active[i] = True
+                        events.append(self._event("firing", name, kind, metric, threshold, level, ts, key))
+                for metric in state.rate_metrics:
+                    value = row[metric]
+                    if value is None:
+                        continue
+                    anchor = anchors.get(metric)
+                    if anchor is None or (ts - anchor[0]).total_seconds() >= self.rate_min_seconds:
+                        anchors[metric] = (ts, value)
+            self.readings += len(rows)
+            self.evaluations += evaluations
+            subscribers = list(self._subscribers)
+        if events:
+            self.history.extend(events)
+            encoded = [json.dumps(event, default=json_default).encode() for event in events]
+            for callback in subscribers:
+                try:
+                    callback(events, encoded)
+                except Exception as e:
+                    print(f"Alert subscriber failed: {e}")
+        return events
+
+    def _event(self, state, name, kind, metric, threshold, level, ts, key) -> dict:
+        if state == "firing":
+            self.fired += 1
+        else:
+            self.resolved += 1
+        return {
+            "id": next(self._ids),
+            "state": state,
+            "rule": name,
+            "kind": kind,
+            "metric": METRIC_NAMES[metric],
+            "threshold": threshold,
+            "value": level,
+            "ts": ts,
+            "lat": key[0],
+            "lon": key[1],
+            "evaluated_at": datetime.now(),
+        }
+
+    def on_ingested(self, rows, ids):
+        """Ingestion listener."""
+        self.evaluate(rows)
+
+    def active(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"rule": rule[0], "lat": key[0], "lon": key[1]}
+                for key, state in self._sensors.items()
+                for rule, on in zip(state.rules, state.active) if on
+            ]
+
+    def recent(self, after: Optional[int] = None) -> List[dict]:
+        events = list(self.history)
+        if after is not None:
+            events = [event for event in events if event["id"] > after]
+        return events
+
+    def stats(self):
+        return {
+            "rules": len(self._shared) + sum(len(rules) for rules in self._overrides.values()),
+            "sensors": len(self._sensors),
+            "readings": self.readings,
+            "evaluations": self.evaluations,
+            "fired": self.fired,
+            "resolved": self.resolved,
+            "subscribers": len(self._subscribers),
+        }
+
+
+alert_engine = AlertEngine()
+alert_engine.subscribe(lambda events, encoded: hub.publish("alert", events, encoded))
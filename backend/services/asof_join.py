@@ -0,0 +1,122 @@
+"""Nearest-timestamp (as-of) alignment of smartfarm and weather_api, plus daylight.
+
+Each table is read once, in ``ts`` order, over a plain ``ts`` range so MySQL
+can answer it from an index on ``ts``. The rows are then aligned in NumPy with
+``searchsorted`` instead of a join condition such as
+``ABS(TIMESTAMPDIFF(MINUTE, s.ts, w.ts)) <= 10`` that forces a scan of every
+sensor/weather pair. Expected indexes::
+
+    CREATE INDEX idx_smartfarm_ts ON smartfarm (ts);
+    CREATE INDEX idx_weather_api_ts ON weather_api (ts);
+
+Day length comes from ``services.solar`` for the days the readings span.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+
+from database import AsyncDatabase
+from services.solar import daylight_minutes
+
+WEATHER_TOLERANCE = timedelta(minutes=10)
+
+COLUMNS = ["soil_moisture", "temperature", "rain_1h", "humidity", "lux", "daylight_minutes"]
+
+
+def range_clause(start: Optional[datetime], end: Optional[datetime], column: str = "ts"):
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} <= %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, tuple(params)
+
+
+def to_datetime64(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[s]")
+
+
+def to_float(values) -> np.ndarray:
+    # None (SQL NULL) becomes NaN
+    return np.array(values, dtype=np.float64)
+
+
+def asof_nearest(left: np.ndarray, right: np.ndarray, tolerance: np.timedelta64) -> np.ndarray:
+    """Index of the nearest ``right`` timestamp for every ``left`` timestamp.
+
+    Both arrays must be sorted. Positions with no match within ``tolerance``
+    are set to -1.
+    """
+    if len(right) == 0:
+        return np.full(len(left), -1, dtype=np.int64)
+    after = np.searchsorted(right, left, side="left")
+    before = np.clip(after - 1, 0, len(right) - 1)
+    after = np.clip(after, 0, len(right) - 1)
+    gap_before = np.abs(left - right[before])
+    gap_after = np.abs(right[after] - left)
+    nearest = np.where(gap_after < gap_before, after, before)
+    gap = np.minimum(gap_before, gap_after)
+    return np.where(gap <= tolerance, nearest, -1)
+
+
+async def fetch_environment(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            after_id: Optional[int] = None, max_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Sensor readings in ``[start, end]`` with their nearest weather row and that day's daylight.
+
+    ``after_id`` and ``max_id`` further limit the readings to ids in
+    ``(after_id, max_id]``. Returns one array per name in COLUMNS plus
+    ``ts``. Readings with no weather row within WEATHER_TOLERANCE or any NULL
+    value are dropped.
+    """
+    where, params = range_clause(start, end)
+    id_conditions = [(condition, value) for condition, value in (("id > %s", after_id), ("id <= %s", max_id))
+                     if value is not None]
+    if id_conditions:
+        where = (f"{where} AND " if where else "WHERE ") + " AND ".join(c for c, _ in id_conditions)
+        params += tuple(v for _, v in id_conditions)
+    sensor = await AsyncDatabase.fetch_rows(
+        f"/* name: asof_sensor */ SELECT ts, moisture, temperature, lux FROM smartfarm {where} ORDER BY ts ASC", params
+    )
+    if not sensor:
+        return {name: np.empty(0) for name in COLUMNS + ["ts"]}
+
+    first, last = sensor[0][0], sensor[-1][0]
+    where, params = range_clause(first - WEATHER_TOLERANCE, last + WEATHER_TOLERANCE)
+    weather = await AsyncDatabase.fetch_rows(
+        f"/* name: asof_weather */ SELECT ts, rain_1h, humidity FROM weather_api {where} ORDER BY ts ASC", params
+    )
+
+    s_ts, moisture, temperature, lux = zip(*sensor)
+    s_ts = to_datetime64(s_ts)
+
+    w_idx = asof_nearest(s_ts, to_datetime64([r[0] for r in weather]), np.timedelta64(WEATHER_TOLERANCE))
+    rain = np.full(len(s_ts), np.nan)
+    humidity = np.full(len(s_ts), np.nan)
+    if weather:
+        w_rain = to_float([r[1] for r in weather])
+        w_humidity = to_float([r[2] for r in weather])
+        hit = w_idx >= 0
+        rain[hit] = w_rain[w_idx[hit]]
+        humidity[hit] = w_humidity[w_idx[hit]]
+
+    # Readings are sorted, so each one's day is an offset from the first day
+    s_day = s_ts.astype("datetime64[D]")
+    days = np.arange(s_day[0], s_day[-1] + 1)
+    daylight = daylight_minutes(days)[(s_day - s_day[0]).astype(np.int64)]
+
+    columns = {
+        "soil_moisture": to_float(moisture),
+        "temperature": to_float(temperature),
+        "rain_1h": rain,
+        "humidity": humidity,
+        "lux": to_float(lux),
+        "daylight_minutes": daylight,
+    }
+    complete = ~np.isnan(np.column_stack([columns[name] for name in COLUMNS])).any(axis=1)
+    result = {name: values[complete] for name, values in columns.items()}
+    result["ts"] = s_ts[complete]
+    return result
@@ -0,0 +1,171 @@
+"""TTL + LRU cache for the JSON bodies of slow-changing GET routes.
+
+Entries are stored as the already serialized response bytes with a strong
+ETag, so a hit is answered without running the route or re-encoding JSON,
+and a matching ``If-None-Match`` gets an empty 304. Every cached route
+carries a tag naming the data it depends on; writers call
+``response_cache.invalidate(tag)`` after inserting rows so the next request
+sees them immediately instead of after the TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+import config
+
+CACHE_MAX_ENTRIES: int = getattr(config, "CACHE_MAX_ENTRIES", 256)
+
+
+def until_midnight(max_ttl: float):
+    """A TTL of at most ``max_ttl`` that never runs past the next local midnight."""
+    def ttl():
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return min(max_ttl, (midnight - now).total_seconds())
+    return ttl
+
+
+# path -> (ttl seconds, or a callable returning them, tag)
+CACHED_ROUTES = {
+    "/api/weather-data/latest": (60, "weather"),
+    # "Today" changes at midnight
+    "/api/sun-data": (until_midnight(3600), "sun"),
+    "/api/sun-data/latest": (until_midnight(3600), "sun"),
+    "/api/health-history": (60, "health"),
+    "/api/sensor-data/recent": (30, "sensor"),
+    # Moves with the upstream forecast; the latest reading it starts from is
+    # at most a TTL old, so ingest flushes don't evict it
+    "/api/moisture-forecast": (60, "forecast"),
+}
+CACHED_ROUTES.update(getattr(config, "CACHED_ROUTES", {}))
+
+
+class _Entry:
+    __slots__ = ("body", "etag", "media_type", "expires", "tag")
+
+    def __init__(self, body, etag, media_type, expires, tag):
+        self.body = body
+        self.etag = etag
+        self.media_type = media_type
+        self.expires = expires
+        self.tag = tag
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def generation(self, tag: str) -> int:
+        return self._generations.get(tag, 0)
+
+    def set(self, key, body: bytes, media_type: str, ttl: float, tag: str, generation: int = None) -> _Entry:
+        entry = _Entry(body, make_etag(body), media_type, time.monotonic() + ttl, tag)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(tag, 0):
+                # Invalidated while the route was running; the body may predate the write
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, tag: str = None):
+        """Drop every entry with ``tag``, or everything when no tag is given."""
+        with self._lock:
+            if tag is None:
+                self._entries.clear()
+                for t in self._generations:
+                    self._generations[t] += 1
+                return
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in [k for k, e in self._entries.items() if e.tag == tag]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+response_cache = ResponseCache()
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, cache: ResponseCache = response_cache, routes=None):
+        super().__init__(app)
+        self.cache = cache
+        self.routes = CACHED_ROUTES if routes is None else routes
+
+    async def dispatch(self, request, call_next):
+        route = self.routes.get(request.url.path)
+        if request.method != "GET" or route is None:
+            return await call_next(request)
+
+        ttl, tag = route
+        if callable(ttl):
+            ttl = ttl()
+        key = request.url.path + "?" + request.url.query
+        if_none_match = request.headers.get("if-none-match")
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.hits += 1
+            return self._respond(entry, ttl, if_none_match)
+
+        self.cache.misses += 1
+        generation = self.cache.generation(tag)
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = self.cache.set(key, body, response.headers.get("content-type"), ttl, tag, generation)
+        return self._respond(entry, ttl, if_none_match)
+
+    def _respond(self, entry, ttl, if_none_match):
+        remaining = max(0, int(entry.expires - time.monotonic()))
+        headers = {"ETag": entry.etag, "Cache-Control": f"max-age={min(ttl, remaining)}"}
+        if etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,167 @@
+"""Running correlation statistics for the /correlation-matrix variables.
+
+The accumulator keeps the count, means and co-moment matrix
+``sum((x - mean)(x - mean)^T)`` of the joined rows it has seen, which is all
+``np.corrcoef`` needs. New rows are folded in as one block with Chan's
+pairwise merge, so a refresh costs O(new rows) and the matrix is served
+without re-reading history. State is persisted to a small JSON file together
+with the watermark of the rows folded in.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import config
+from database import AsyncDatabase
+from services.asof_join import COLUMNS, WEATHER_TOLERANCE, fetch_environment
+
+CORRELATION_STATS_PATH = Path(getattr(
+    config, "CORRELATION_STATS_PATH", Path(__file__).resolve().parent.parent / "correlation_stats.json"
+))
+
+MAX_ID_QUERY = "/* name: correlation_max_id */ SELECT MAX(id) FROM smartfarm"
+
+
+class CorrelationAccumulator:
+    def __init__(self, keys=COLUMNS):
+        self.keys = list(keys)
+        k = len(self.keys)
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.watermark: Optional[datetime] = None
+        # Largest smartfarm id seen by the last refresh; None for state saved before ids were tracked
+        self.last_id: Optional[int] = None
+
+    def update_batch(self, rows):
+        """Fold in an ``(n, len(keys))`` block of observations."""
+        rows = np.asarray(rows, dtype=np.float64)
+        n_b = len(rows)
+        if n_b == 0:
+            return
+        mean_b = rows.mean(axis=0)
+        centered = rows - mean_b
+        comoment_b = centered.T @ centered
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.comoment = self.comoment + comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.count = n
+
+    def correlation(self) -> np.ndarray:
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comoment / np.outer(std, std)
+        # Same clipping np.corrcoef applies against rounding drift
+        return np.clip(corr, -1, 1)
+
+    def to_dict(self):
+        return {
+            "keys": self.keys,
+            "count": self.count,
+            "mean": self.mean.tolist(),
+            "comoment": self.comoment.tolist(),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "last_id": self.last_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        acc = cls(data["keys"])
+        acc.count = data["count"]
+        acc.mean = np.array(data["mean"], dtype=np.float64)
+        acc.comoment = np.array(data["comoment"], dtype=np.float64)
+        acc.watermark = datetime.fromisoformat(data["watermark"]) if data["watermark"] else None
+        acc.last_id = data.get("last_id")
+        return acc
+
+    def save(self, path: Path):
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, keys=COLUMNS):
+        try:
+            with open(path) as f:
+                acc = cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return cls(keys)
+        # A different variable set means the stored state is for another schema
+        return acc if acc.keys == list(keys) else cls(keys)
+
+
+class CorrelationStats:
+    """Persisted accumulator kept up to date with the joined sensor history.
+
+    ``refresh`` folds in only the rows past the stored (ts, id) watermark:
+    rows with ``ts`` after the watermark time, plus rows at or before it
+    whose id is above the watermark id. The latter are board batches written
+    late with their original timestamps. Both sets stop at the largest id
+    seen when the refresh starts, so each row is folded once. Rows younger
+    than WEATHER_TOLERANCE are left for the next refresh, because the weather
+    reading they pair with may not have been written yet.
+    """
+
+    def __init__(self, path: Path = CORRELATION_STATS_PATH):
+        self.path = path
+        self._acc = None
+        self._lock = asyncio.Lock()
+        self.rebuilding = False
+
+    @property
+    def accumulator(self) -> CorrelationAccumulator:
+        if self._acc is None:
+            self._acc = CorrelationAccumulator.load(self.path)
+        return self._acc
+
+    async def refresh(self) -> CorrelationAccumulator:
+        async with self._lock:
+            acc = self.accumulator
+            # Whole seconds, like the DATETIME column, so the next window can start a second later
+            end = (datetime.now() - WEATHER_TOLERANCE).replace(microsecond=0)
+            max_id = (await AsyncDatabase.fetch_rows(MAX_ID_QUERY))[0][0] or 0
+            if acc.watermark is not None and acc.watermark >= end and max_id <= (acc.last_id or 0):
+                return acc
+            blocks = []
+            if acc.watermark is None or acc.watermark < end:
+                start = acc.watermark + timedelta(seconds=1) if acc.watermark else None
+                blocks.append(await fetch_environment(start, end, max_id=max_id))
+            if acc.watermark is not None and acc.last_id is not None and max_id > acc.last_id:
+                blocks.append(await fetch_environment(None, acc.watermark, after_id=acc.last_id, max_id=max_id))
+            folded = 0
+            for data in blocks:
+                if len(data["ts"]):
+                    acc.update_batch(np.column_stack([data[k] for k in acc.keys]))
+                    folded += len(data["ts"])
+            # Until something is folded in, the stored watermark still describes the same state
+            save = folded or acc.last_id is None
+            acc.watermark = max(end, acc.watermark) if acc.watermark else end
+            acc.last_id = max_id
+            if save:
+                await asyncio.to_thread(acc.save, self.path)
+            return acc
+
+    async def rebuild(self) -> CorrelationAccumulator:
+        """Start over from the full history; only one rebuild runs at a time."""
+        if self.rebuilding:
+            raise RuntimeError("A correlation rebuild is already running")
+        self.rebuilding = True
+        try:
+            async with self._lock:
+                self._acc = CorrelationAccumulator()
+                await asyncio.to_thread(self._acc.save, self.path)
+            return await self.refresh()
+        finally:
+            self.rebuilding = False
+
+
+correlation_stats = CorrelationStats()
@@ -0,0 +1,272 @@
+"""Arrow IPC and Parquet exports of the farm's history.
+
+Datasets:
+
+- ``sensor``: ``smartfarm``
+- ``weather``: ``weather_api``
+- ``sun``: sunrise, sunset, solar noon and day length for each day of the
+  range, computed by ``services.solar`` as the sun routes are (the
+  ``sunrise_sunset`` table is no longer read); times are ``time32[s]``.
+  Without ``--from`` the range starts on the day of the first sensor
+  reading, without ``--to`` it ends today
+- ``joined``: each sensor reading with its nearest ``weather_api`` row within
+  WEATHER_TOLERANCE (nulls where there is none) and the day's computed
+  ``daylight_minutes``, the same alignment ``/correlation-matrix`` uses
+
+Rows come from an unbuffered cursor (``Database.stream_rows``) and are
+turned into one record batch per chunk, so only one chunk of Python rows
+exists at a time whatever the range. Both formats are written
+incrementally, Parquet as one row group per batch. Arrow IPC goes out over
+HTTP in the streaming format (``.arrows``) and to files from the CLI in the
+random-access file format (``.arrow``); pyarrow reads both.
+For ``joined`` the weather rows of each chunk's time span are fetched with
+one range query per chunk.
+
+pyarrow is imported on first use, so the API process doesn't load it
+until an export is requested.
+
+From the backend directory:
+
+    python -m services.export joined --from 2025-04-01 -o farm.parquet
+    python -m services.export sensor -o sensor.arrow
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+import numpy as np
+
+import config
+from database import Database
+from services.asof_join import WEATHER_TOLERANCE, asof_nearest, range_clause, to_datetime64, to_float
+from services.solar import daylight_minutes, sun_times
+
+EXPORT_BATCH_ROWS: int = getattr(config, "EXPORT_BATCH_ROWS", 20000)
+
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# dataset -> (query with a {where} slot, or None if computed, [(column, type)])
+DATASETS = {
+    "sensor": (
+        "/* name: export_sensor */ SELECT id, ts, lux, temperature, moisture, lat, lon FROM smartfarm {where} "
+        "ORDER BY ts ASC, id ASC",
+        [("id", "int64"), ("ts", "timestamp"), ("lux", "float64"), ("temperature", "float64"),
+         ("soil_moisture", "float64"), ("lat", "float64"), ("lon", "float64")],
+    ),
+    "weather": (
+        "/* name: export_weather */ SELECT ts, humidity, pressure, rain_1h, clouds FROM weather_api {where} "
+        "ORDER BY ts ASC",
+        [("ts", "timestamp"), ("humidity", "float64"), ("pressure", "float64"), ("rain_1h", "float64"),
+         ("cloudiness", "int64")],
+    ),
+    "sun": (
+        None,
+        [("ts", "timestamp"), ("sunrise", "time"), ("sunset", "time"), ("solar_noon", "time"),
+         ("day_length", "time")],
+    ),
+    "joined": (
+        "/* name: export_joined */ SELECT id, ts, lux, temperature, moisture FROM smartfarm {where} "
+        "ORDER BY ts ASC, id ASC",
+        [("id", "int64"), ("ts", "timestamp"), ("soil_moisture", "float64"), ("temperature", "float64"),
+         ("rain_1h", "float64"), ("humidity", "float64"), ("lux", "float64"), ("daylight_minutes", "float64")],
+    ),
+}
+
+SUN_FIRST_DAY_QUERY = "/* name: export_sun_first_day */ SELECT ts FROM smartfarm ORDER BY ts ASC LIMIT 1"
+
+JOINED_WEATHER_QUERY = (
+    "/* name: export_joined_weather */ SELECT ts, rain_1h, humidity FROM weather_api {where} ORDER BY ts ASC"
+)
+
+
+def _type(name):
+    import pyarrow as pa
+
+    return {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("us"),
+        "time": pa.time32("s"),
+    }[name]
+
+
+def schema(dataset: str):
+    import pyarrow as pa
+
+    return pa.schema([(name, _type(kind)) for name, kind in DATASETS[dataset][1]])
+
+
+def _seconds(value):
+    # The driver returns TIME columns as timedelta
+    return None if value is None else int(value.total_seconds())
+
+
+def _array(values, kind):
+    import pyarrow as pa
+
+    if kind == "time" and isinstance(values, np.ndarray):
+        # Minutes after midnight from services.solar; NaN where the sun doesn't rise or set
+        seconds = np.nan_to_num(np.round(values * 60)).astype(np.int32)
+        return pa.array(seconds, pa.int32(), mask=np.isnan(values)).cast(pa.time32("s"))
+    if kind == "time":
+        return pa.array([_seconds(v) for v in values], pa.int32()).cast(pa.time32("s"))
+    if kind == "float64" and isinstance(values, np.ndarray):
+        # NaN marks a missing weather match
+        return pa.array(values, pa.float64(), mask=np.isnan(values))
+    return pa.array(values, _type(kind))
+
+
+def _join_chunk(rows):
+    row_id, ts, lux, temperature, moisture = zip(*rows)
+    s_ts = to_datetime64(ts)
+    where, params = range_clause(ts[0] - WEATHER_TOLERANCE, ts[-1] + WEATHER_TOLERANCE)
+    weather = Database.fetch_rows(JOINED_WEATHER_QUERY.format(where=where), params)
+
+    rain = np.full(len(rows), np.nan)
+    humidity = np.full(len(rows), np.nan)
+    if weather:
+        w_ts, w_rain, w_humidity = zip(*weather)
+        idx = asof_nearest(s_ts, to_datetime64(w_ts), np.timedelta64(WEATHER_TOLERANCE))
+        hit = idx >= 0
+        rain[hit] = to_float(w_rain)[idx[hit]]
+        humidity[hit] = to_float(w_humidity)[idx[hit]]
+
+    s_day = s_ts.astype("datetime64[D]")
+    daylight = daylight_minutes(np.arange(s_day[0], s_day[-1] + 1))[(s_day - s_day[0]).astype(np.int64)]
+    return [row_id, ts, to_float(moisture), to_float(temperature), rain, humidity, to_float(lux), daylight]
+
+
+def _sun_chunks(start: Optional[datetime], end: Optional[datetime], batch_rows: int):
+    if start is None:
+        first = Database.fetch_rows(SUN_FIRST_DAY_QUERY)
+        start = first[0][0] if first else datetime.now()
+    last = (end or datetime.now()).date()
+    days = np.arange(np.datetime64(start.date(), "D"), np.datetime64(last, "D") + 1)
+    for lo in range(0, len(days), batch_rows):
+        chunk = days[lo:lo + batch_rows]
+        times = sun_times(chunk)
+        yield [chunk.astype("datetime64[us]"), times["sunrise"], times["sunset"], times["solar_noon"],
+               times["day_length"]]
+
+
+def _row_chunks(dataset: str, start: Optional[datetime], end: Optional[datetime], batch_rows: int):
+    query = DATASETS[dataset][0]
+    where, params = range_clause(start, end)
+    for rows in Database.stream_rows(query.format(where=where), params, chunk_size=batch_rows):
+        yield _join_chunk(rows) if dataset == "joined" else list(zip(*rows))
+
+
+def record_batches(dataset: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator:
+    """Record batches of ``dataset`` over ``[start, end]``, oldest first."""
+    import pyarrow as pa
+
+    columns = DATASETS[dataset][1]
+    batch_schema = schema(dataset)
+    if dataset == "sun":
+        chunks = _sun_chunks(start, end, batch_rows)
+    else:
+        chunks = _row_chunks(dataset, start, end, batch_rows)
+    for values in chunks:
+        arrays = [_array(column, kind) for column, (_, kind) in zip(values, columns)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=batch_schema)
+
+
+def _writer(format: str, sink, batch_schema, seekable: bool = False):
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, batch_schema, compression="zstd")
+    import pyarrow as pa
+
+    if seekable:
+        return pa.ipc.new_file(sink, batch_schema)
+    return pa.ipc.new_stream(sink, batch_schema)
+
+
+class _Spool:
+    """Write-only file object whose bytes are taken out as they are produced."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def stream(dataset: str, format: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+           batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """The encoded file in pieces, one per record batch, for a streaming response."""
+    spool = _Spool()
+    writer = _writer(format, spool, schema(dataset))
+    for batch in record_batches(dataset, start, end, batch_rows):
+        writer.write_batch(batch)
+        yield spool.drain()
+    writer.close()
+    yield spool.drain()
+
+
+def export(dataset: str, path: str, format: str, start: Optional[datetime] = None,
+           end: Optional[datetime] = None, batch_rows: int = EXPORT_BATCH_ROWS) -> int:
+    """Write ``dataset`` to ``path``; returns the number of rows."""
+    rows = 0
+    with _writer(format, path, schema(dataset), seekable=True) as writer:
+        for batch in record_batches(dataset, start, end, batch_rows):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export farm history as Arrow IPC or Parquet.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=sorted(FORMATS),
+                        help="default: parquet, or arrow for .arrow/.arrows outputs")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat)
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    format = args.format
+    if format is None:
+        arrow = os.path.splitext(args.output)[1].lower() in (".arrow", ".arrows")
+        format = "arrow" if arrow else "parquet"
+
+    started = time.perf_counter()
+    try:
+        rows = export(args.dataset, args.output, format, args.start, args.end, args.batch_rows)
+    finally:
+        Database.close_pool()
+    print(f"{rows:,} {args.dataset} rows -> {args.output} ({format}, "
+          f"{os.path.getsize(args.output) / 2**20:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cached OpenWeather 5-day/3-hour forecast.
+
+The forecast is refreshed upstream every few hours, so each (lat, lon) is
+fetched at most once per FORECAST_TTL. After that the cached copy is still
+served for up to FORECAST_STALE_TTL more seconds while a single background
+refresh runs (stale-while-revalidate). Concurrent misses for the same
+location share one upstream request.
+"""
+import asyncio
+import time
+from typing import Dict, Tuple
+
+import config
+from config import OPENWEATHER_API_KEY
+from services.cache import response_cache
+from services.http_client import get_client
+
+OPENWEATHER_BASE_URL: str = getattr(config, "OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+FORECAST_TTL: float = getattr(config, "FORECAST_TTL", 600.0)
+FORECAST_STALE_TTL: float = getattr(config, "FORECAST_STALE_TTL", 3600.0)
+
+FARM_LAT: float = getattr(config, "FARM_LAT", 13.8657)
+FARM_LON: float = getattr(config, "FARM_LON", 100.462)
+
+
+class ForecastCache:
+    def __init__(self, ttl: float = FORECAST_TTL, stale_ttl: float = FORECAST_STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[Tuple[float, float], Tuple[dict, float]] = {}
+        self._inflight: Dict[Tuple[float, float], asyncio.Task] = {}
+        self.upstream_requests = 0
+        self.hits = 0
+        self.stale_hits = 0
+
+    async def get(self, lat: float = FARM_LAT, lon: float = FARM_LON) -> dict:
+        key = (round(lat, 4), round(lon, 4))
+        entry = self._entries.get(key)
+        if entry is not None:
+            data, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return data
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key)
+                return data
+        return await asyncio.shield(self._refresh(key))
+
+    def invalidate(self):
+        self._entries.clear()
+        response_cache.invalidate("forecast")
+
+    def stats(self):
+        return {
+            "locations": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "upstream_requests": self.upstream_requests,
+            "in_flight": len(self._inflight),
+        }
+
+    def _refresh(self, key) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Retrieve the exception so a failed background refresh isn't reported as unhandled
+            task.exception()
+
+    async def _fetch(self, key) -> dict:
+        lat, lon = key
+        self.upstream_requests += 1
+        response = await get_client().get(
+            f"{OPENWEATHER_BASE_URL}/data/2.5/forecast",
+            params={"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric"},
+        )
+        response.raise_for_status()
+        data = response.json()
+        self._entries[key] = (data, time.monotonic())
+        # Responses built from the previous copy are out of date
+        response_cache.invalidate("forecast")
+        return data
+
+
+forecast_cache = ForecastCache()
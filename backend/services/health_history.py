@@ -0,0 +1,222 @@
+"""Write-behind persistence of plant_health history and the latest status per sensor.
+
+``/predict-health`` used to look up the sensor's last status in MySQL and,
+after predicting, insert and commit the new row before responding. Now
+``record`` only queues the row and updates an in-memory index of the latest
+status per ``sensor_id``. A background task flushes the queue with one
+multi-row insert every HEALTH_FLUSH_INTERVAL seconds, or sooner once
+HEALTH_FLUSH_ROWS rows are waiting.
+
+The queue is bounded by HEALTH_QUEUE_MAX rows. A request that finds it full
+waits for a flush instead of growing it further. Rows of a failed flush are
+put back and retried on the next tick, dropping the oldest (counted) only if
+they no longer fit. ``close`` stops the periodic task without cancelling a
+flush in progress and then writes what is left, so queued rows survive a
+normal shutdown.
+
+``since`` serves ``/health-history`` without forcing a flush: it reads the
+written rows and merges in the queued ones. A batch being written while
+the read runs could be counted twice or not at all, so the read is
+repeated (after waiting out that batch) until no write overlapped it.
+
+The index is loaded once at startup from the newest row of each sensor and
+then kept current by ``record``. Until it is loaded, ``latest`` reads
+MySQL. It only sees this process's writes, so with several API workers a
+sensor predicted in another worker is predicted again here, which adds a
+history row but is otherwise harmless. The startup query expects::
+
+    CREATE INDEX idx_plant_health_sensor_ts ON plant_health (sensor_id, ts);
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import config
+from database import AsyncDatabase
+from services.cache import response_cache
+from services.stream import hub
+
+HEALTH_FLUSH_INTERVAL: float = getattr(config, "HEALTH_FLUSH_INTERVAL", 1.0)
+HEALTH_FLUSH_ROWS: int = getattr(config, "HEALTH_FLUSH_ROWS", 500)
+HEALTH_QUEUE_MAX: int = getattr(config, "HEALTH_QUEUE_MAX", 10000)
+
+SAVE_HEALTH_QUERY = """
+    /* name: save_health */
+    INSERT INTO plant_health (ts, sensor_id, health_status)
+    VALUES (%s, %s, %s)
+"""
+
+LATEST_HEALTH_QUERY = """
+    /* name: latest_health */
+    SELECT health_status, ts
+    FROM plant_health
+    WHERE sensor_id = %s
+    ORDER BY ts DESC
+    LIMIT 1
+"""
+
+HISTORY_SINCE_QUERY = """
+    /* name: health_history */
+    SELECT ts as timestamp, health_status
+    FROM plant_health
+    WHERE ts > %s
+    ORDER BY ts ASC
+"""
+
+LATEST_PER_SENSOR_QUERY = """
+    /* name: latest_health_all */
+    SELECT p.sensor_id, p.health_status, p.ts
+    FROM plant_health p
+    JOIN (SELECT sensor_id, MAX(ts) AS ts FROM plant_health GROUP BY sensor_id) latest
+      ON p.sensor_id = latest.sensor_id AND p.ts = latest.ts
+"""
+
+
+class HealthHistory:
+    def __init__(self, flush_interval: float = HEALTH_FLUSH_INTERVAL, flush_rows: int = HEALTH_FLUSH_ROWS,
+                 max_queue: int = HEALTH_QUEUE_MAX):
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._latest: Dict[int, Tuple[str, datetime]] = {}
+        self._loaded = False
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        # Odd while a batch is being written
+        self._write_generation = 0
+
+        self.written = 0
+        self.batches = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.waited = 0
+        self.last_flush_seconds = 0.0
+
+    async def load(self):
+        """Fill the latest-status index from MySQL."""
+        rows = await AsyncDatabase.fetch_rows(LATEST_PER_SENSOR_QUERY)
+        for sensor_id, status, ts in rows:
+            current = self._latest.get(sensor_id)
+            # Rows recorded while the query ran are newer than anything it returned
+            if current is None or current[1] < ts:
+                self._latest[sensor_id] = (status, ts)
+        self._loaded = True
+
+    async def latest(self, sensor_id: int) -> Optional[dict]:
+        """The sensor's newest ``{"health_status", "ts"}``, or None if it has no history."""
+        if not self._loaded:
+            return await AsyncDatabase.fetch_one(LATEST_HEALTH_QUERY, (sensor_id,))
+        entry = self._latest.get(sensor_id)
+        if entry is None:
+            return None
+        return {"health_status": entry[0], "ts": entry[1]}
+
+    async def record(self, rows: List[Tuple[datetime, int, str]]):
+        """Queue ``(ts, sensor_id, health_status)`` rows for the next flush."""
+        for ts, sensor_id, status in rows:
+            self._latest[sensor_id] = (status, ts)
+        hub.publish("health", (
+            {"timestamp": ts, "sensor_id": sensor_id, "health_status": str(status)} for ts, sensor_id, status in rows
+        ))
+        while self._queue and len(self._queue) + len(rows) > self.max_queue:
+            self.waited += 1
+            if not await self.flush():
+                break  # the database is down; _trim drops the oldest rows instead
+        self._queue.extend(rows)
+        self._trim()
+        if len(self._queue) >= self.flush_rows:
+            self._wakeup.set()
+
+    def _trim(self):
+        overflow = len(self._queue) - self.max_queue
+        for _ in range(overflow):
+            self._queue.popleft()
+        self.dropped += max(0, overflow)
+
+    async def flush(self) -> bool:
+        """Write everything queued so far; on failure the rows stay queued and False is returned."""
+        async with self._flush_lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.flush_rows, len(self._queue)))]
+                start = time.perf_counter()
+                self._write_generation += 1
+                try:
+                    await AsyncDatabase.execute_many(SAVE_HEALTH_QUERY, batch)
+                except asyncio.CancelledError:
+                    # The insert was killed along with the caller; keep the rows for the next flush
+                    self._queue.extendleft(reversed(batch))
+                    raise
+                except Exception as e:
+                    self.failed_flushes += 1
+                    print(f"Health history write failed ({len(batch)} rows): {e}")
+                    self._queue.extendleft(reversed(batch))
+                    self._trim()
+                    return False
+                finally:
+                    self._write_generation += 1
+                self.written += len(batch)
+                self.batches += 1
+                self.last_flush_seconds = time.perf_counter() - start
+                response_cache.invalidate("health")
+            return True
+
+    async def since(self, since: datetime) -> List[dict]:
+        """``{"timestamp", "health_status"}`` rows newer than ``since``, queued ones included, oldest first."""
+        while True:
+            generation = self._write_generation
+            if generation % 2:
+                # Wait out the batch being written, then read
+                async with self._flush_lock:
+                    pass
+                continue
+            rows = await AsyncDatabase.execute_query(HISTORY_SINCE_QUERY, params=(since,))
+            if self._write_generation == generation:
+                break
+        pending = [{"timestamp": ts, "health_status": status} for ts, _, status in self._queue if ts > since]
+        if pending:
+            rows = sorted(list(rows) + pending, key=lambda row: row["timestamp"])
+        return rows
+
+    async def run_periodically(self):
+        # Bound to the running loop here rather than at import time
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break  # close() writes the rest
+            await self.flush()
+
+    async def close(self):
+        """Stop ``run_periodically`` and write everything still queued."""
+        self._stopping = True
+        self._wakeup.set()
+        # Waits on the flush lock for a periodic flush already in progress
+        await self.flush()
+        if self._queue:
+            print(f"Warning: {len(self._queue)} health history rows could not be written")
+
+    def stats(self):
+        return {
+            "queued": len(self._queue),
+            "written": self.written,
+            "batches": self.batches,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "waited_for_flush": self.waited,
+            "last_flush_seconds": round(self.last_flush_seconds, 6),
+            "sensors_indexed": len(self._latest),
+            "index_loaded": self._loaded,
+        }
+
+
+health_history = HealthHistory()
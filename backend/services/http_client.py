@@ -0,0 +1,60 @@
+"""One pooled ``httpx.AsyncClient`` shared by every outbound call.
+
+The client keeps TLS connections alive between requests instead of paying a
+handshake per call. It is opened in the app lifespan and closed on shutdown;
+``use_client`` swaps it, e.g. for one whose transport points at a local fake
+server.
+"""
+import time
+from typing import Optional
+
+import httpx
+
+import config
+from services.metrics import outbound_http_seconds
+
+HTTP_TIMEOUT: float = getattr(config, "HTTP_TIMEOUT", 10.0)
+HTTP_MAX_CONNECTIONS: int = getattr(config, "HTTP_MAX_CONNECTIONS", 20)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def _start_timer(request: httpx.Request):
+    request.extensions["started"] = time.perf_counter()
+
+
+async def _record_latency(response: httpx.Response):
+    started = response.request.extensions.get("started")
+    if started is not None:
+        outbound_http_seconds.observe(time.perf_counter() - started, response.request.url.host,
+                                      str(response.status_code))
+
+
+def create_client(**kwargs) -> httpx.AsyncClient:
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    kwargs.setdefault("event_hooks", {"request": [_start_timer], "response": [_record_latency]})
+    kwargs.setdefault("limits", httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=60.0,
+    ))
+    return httpx.AsyncClient(**kwargs)
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+def use_client(client: httpx.AsyncClient):
+    global _client
+    _client = client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,213 @@
+"""Model inference in a worker pool, with concurrent requests batched together.
+
+Predictions used to run on the event loop thread, so a burst of them stalled
+every other route. ``predict`` now queues the request's rows per model, and
+a batch is handed to a worker pool when one of these happens:
+
+- INFERENCE_MAX_BATCH rows are waiting, or
+- the first waiting request has waited INFERENCE_MAX_WAIT_MS and a worker is
+  free.
+
+The rows are scored with one ``ModelBundle.predict`` call and the results
+are split back out to the waiting requests. While every worker is busy,
+requests keep joining the next batch instead of queueing one small batch
+each. So under light load a request waits at most INFERENCE_MAX_WAIT_MS,
+and under heavy load the batches grow. A request that already has
+INFERENCE_MAX_BATCH rows (the ``/batch`` routes) is sent on its own right
+away.
+
+INFERENCE_EXECUTOR selects the pool:
+
+- ``thread``: the models shared with the registry. NumPy and sklearn
+  release the GIL for much of the work.
+- ``process``: spawned processes with their own registry, each watching
+  the pickle files as the API process does. Requests pay for pickling
+  their rows, but scoring never competes with the event loop for the GIL.
+  The ``model_inference_*`` metrics are then recorded in the workers and
+  don't reach ``/metrics``; the ``inference_batch_*`` ones still do.
+
+Throughput under concurrent load: ``python -m benchmarks.inference``.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import config
+from ml.registry import registry
+from services.metrics import inference_batch_rows, inference_wait_seconds
+
+INFERENCE_EXECUTOR: str = getattr(config, "INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS: int = getattr(config, "INFERENCE_WORKERS", 2)
+INFERENCE_MAX_BATCH: int = getattr(config, "INFERENCE_MAX_BATCH", 256)
+INFERENCE_MAX_WAIT_MS: float = getattr(config, "INFERENCE_MAX_WAIT_MS", 0.5)
+
+
+def _predict(name: str, X: np.ndarray) -> np.ndarray:
+    return registry.get(name).predict(X)
+
+
+def _start_worker():
+    # Runs once in each spawned process
+    registry.load()
+    registry.start_watching()
+
+
+def _ping():
+    return True
+
+
+class _Pending:
+    __slots__ = ("items", "rows", "first_at", "timer", "due")
+
+    def __init__(self):
+        self.items: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self.rows = 0
+        self.first_at = 0.0
+        self.timer = None
+        self.due = False
+
+
+class InferenceExecutor:
+    def __init__(self, kind: str = INFERENCE_EXECUTOR, workers: int = INFERENCE_WORKERS,
+                 max_batch: int = INFERENCE_MAX_BATCH, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"INFERENCE_EXECUTOR must be 'thread' or 'process', not {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._pool = None
+        self._pending: Dict[str, _Pending] = {}
+        self._running = set()
+
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+
+    def _executor(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_start_worker,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="inference")
+        return self._pool
+
+    async def start(self):
+        """Start the workers (and in process mode load their models) before the first request."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+
+    def close(self):
+        for pending in self._pending.values():
+            if pending.timer is not None:
+                pending.timer.cancel()
+            for _, future in pending.items:
+                if not future.done():
+                    future.cancel()
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def predict(self, name: str, X: np.ndarray) -> np.ndarray:
+        """``registry.get(name).predict(X)``, scored in the pool, possibly together with other requests."""
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        if len(X) >= self.max_batch:
+            inference_wait_seconds.observe(0.0, name)
+            return await self._run(loop, name, X)
+
+        future = loop.create_future()
+        pending = self._pending.get(name)
+        if pending is None:
+            pending = self._pending[name] = _Pending()
+        if not pending.items:
+            pending.first_at = time.perf_counter()
+            pending.timer = loop.call_later(self.max_wait, self._expire, name)
+        pending.items.append((X, future))
+        pending.rows += len(X)
+        if pending.rows >= self.max_batch:
+            self._dispatch(loop, name)
+        return await future
+
+    def _expire(self, name: str):
+        pending = self._pending.get(name)
+        if pending is None or not pending.items:
+            return
+        pending.timer = None
+        pending.due = True
+        if len(self._running) < self.workers:
+            self._dispatch(asyncio.get_running_loop(), name)
+
+    def _dispatch(self, loop, name: str):
+        pending = self._pending.pop(name)
+        if pending.timer is not None:
+            pending.timer.cancel()
+        inference_wait_seconds.observe(time.perf_counter() - pending.first_at, name)
+        task = loop.create_task(self._execute(loop, name, pending.items))
+        self._running.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self._running.discard(task)
+        # A batch that came due while every worker was busy goes next
+        for name, pending in list(self._pending.items()):
+            if len(self._running) >= self.workers:
+                break
+            if pending.due:
+                self._dispatch(asyncio.get_running_loop(), name)
+
+    async def _run(self, loop, name: str, X: np.ndarray) -> np.ndarray:
+        self.rows += len(X)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(X))
+        inference_batch_rows.observe(len(X), name)
+        try:
+            return await loop.run_in_executor(self._executor(), _predict, name, X)
+        except Exception:
+            self.failed_batches += 1
+            raise
+
+    async def _execute(self, loop, name: str, items):
+        X = items[0][0] if len(items) == 1 else np.concatenate([x for x, _ in items])
+        try:
+            result = await self._run(loop, name, X)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for x, future in items:
+            # Skips requests cancelled while waiting, e.g. by a client disconnect
+            if not future.done():
+                future.set_result(result[offset:offset + len(x)])
+            offset += len(x)
+
+    def stats(self):
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "running": len(self._running),
+            "waiting": sum(len(p.items) for p in self._pending.values()),
+        }
+
+
+inference = InferenceExecutor()
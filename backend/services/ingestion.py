@@ -0,0 +1,304 @@
+"""MQTT ingestion of KidBright sensor readings into ``smartfarm``.
+
+Replaces the Node-RED flow that issued one ``INSERT`` per message. Messages
+are either one JSON reading, validated against SensorPayload and stamped
+with its arrival time, or a binary batch of buffered readings from
+``services.sensor_batch``, each dated by its age on arrival. Rows are
+buffered; a writer thread flushes the buffer with a parameterized multi-row
+insert whenever it reaches INGEST_BATCH_SIZE rows or the oldest buffered row
+is INGEST_FLUSH_INTERVAL seconds old.
+
+Backpressure: the buffer is bounded by INGEST_MAX_BUFFER. When the database
+falls behind and the buffer is full, the MQTT network thread blocks for up to
+INGEST_BLOCK_TIMEOUT seconds, which stops it reading from the socket and
+pushes back on the broker. Only after that are the oldest rows dropped (and
+counted). Failed writes keep their rows and are retried with exponential
+backoff.
+
+Run standalone from the backend directory with ``python -m services.ingestion``
+or enable it inside the API process with ``MQTT_INGEST_ENABLED = True``.
+"""
+import json
+import logging
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from pydantic import ValidationError
+
+import config
+from database import Database
+from models import SensorPayload
+from services import sensor_batch
+
+MQTT_INGEST_ENABLED: bool = getattr(config, "MQTT_INGEST_ENABLED", False)
+MQTT_BROKER: str = getattr(config, "MQTT_BROKER", "iot.cpe.ku.ac.th")
+MQTT_PORT: int = getattr(config, "MQTT_PORT", 1883)
+MQTT_USER: Optional[str] = getattr(config, "MQTT_USER", None)
+MQTT_PASS: Optional[str] = getattr(config, "MQTT_PASS", None)
+MQTT_TOPIC: str = getattr(config, "MQTT_TOPIC", "b6610545901/smartfarm")
+
+INGEST_BATCH_SIZE: int = getattr(config, "INGEST_BATCH_SIZE", 500)
+INGEST_FLUSH_INTERVAL: float = getattr(config, "INGEST_FLUSH_INTERVAL", 1.0)
+INGEST_MAX_BUFFER: int = getattr(config, "INGEST_MAX_BUFFER", 50000)
+INGEST_BLOCK_TIMEOUT: float = getattr(config, "INGEST_BLOCK_TIMEOUT", 5.0)
+
+INSERT_SENSOR_QUERY = """
+    INSERT INTO smartfarm (ts, lux, temperature, moisture, lat, lon)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+MAX_RETRY_DELAY = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def payload_row(payload: SensorPayload, ts: datetime):
+    return (ts, payload.lux, payload.temperature, payload.soil_moisture, payload.latitude, payload.longitude)
+
+
+class IngestionWorker:
+    def __init__(self, write_batch: Callable[[List[tuple]], Optional[List[int]]] = None,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 max_buffer: int = INGEST_MAX_BUFFER, block_timeout: float = INGEST_BLOCK_TIMEOUT):
+        self._write_batch = write_batch or (lambda rows: Database.insert_rows(INSERT_SENSOR_QUERY, rows))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.block_timeout = block_timeout
+
+        self._buffer = deque()
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._listeners: List[Callable[[List[tuple], Optional[List[int]]], None]] = []
+
+        self.received = 0
+        self.batch_messages = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_writes = 0
+        self.last_flush_seconds = 0.0
+        self._started_at = None
+
+    def add_listener(self, callback: Callable[[List[tuple], Optional[List[int]]], None]):
+        """Call ``callback(rows, ids)`` on the writer thread after each successful flush.
+
+        ``rows`` are (ts, lux, temperature, moisture, lat, lon) tuples and
+        ``ids`` their smartfarm ids, when the writer reports them.
+        """
+        self._listeners.append(callback)
+
+    def handle_message(self, topic: str, payload: bytes):
+        """Entry point for every MQTT message; safe to call from any thread."""
+        if sensor_batch.is_batch(payload):
+            self.handle_batch(payload)
+            return
+        try:
+            reading = SensorPayload.model_validate_json(payload)
+        except (ValidationError, ValueError):
+            with self._cond:
+                self.invalid += 1
+            return
+        self.submit([payload_row(reading, datetime.now())])
+
+    def handle_batch(self, payload: bytes):
+        try:
+            latitude, longitude, samples = sensor_batch.decode_batch(payload)
+        except (ValueError, struct.error):
+            with self._cond:
+                self.invalid += 1
+            return
+        now = datetime.now()
+        rows = [
+            # A reading the board couldn't take (NaN lux) is stored as NULL
+            (now - timedelta(seconds=age), None if lux != lux else lux, temperature, moisture, latitude, longitude)
+            for age, lux, moisture, temperature in samples
+        ]
+        with self._cond:
+            self.batch_messages += 1
+        self.submit(rows)
+
+    def submit(self, rows: List[tuple]):
+        deadline = time.monotonic() + self.block_timeout
+        with self._cond:
+            self.received += len(rows)
+            while len(self._buffer) + len(rows) > self.max_buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    # Keep the newest rows: the oldest buffered ones go first, then
+                    # the head of a batch that alone is larger than the buffer
+                    trimmed = max(0, len(rows) - self.max_buffer)
+                    if trimmed:
+                        rows = rows[trimmed:]
+                    popped = len(self._buffer) + len(rows) - self.max_buffer
+                    for _ in range(popped):
+                        self._buffer.popleft()
+                    self.dropped += popped + trimmed
+                    break
+                self._cond.wait(remaining)
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the writer after flushing what is buffered."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._cond:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "received": self.received,
+                "batch_messages": self.batch_messages,
+                "invalid": self.invalid,
+                "inserted": self.inserted,
+                "dropped": self.dropped,
+                "buffered": len(self._buffer),
+                "batches": self.batches,
+                "failed_writes": self.failed_writes,
+                "last_flush_seconds": round(self.last_flush_seconds, 6),
+                "rows_per_second": round(self.inserted / elapsed, 1) if elapsed else 0.0,
+            }
+
+    def _take_batch(self):
+        with self._cond:
+            while self._running:
+                if len(self._buffer) >= self.batch_size:
+                    break
+                if self._buffer and time.monotonic() - self._oldest >= self.flush_interval:
+                    break
+                timeout = self.flush_interval
+                if self._buffer:
+                    timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                self._cond.wait(timeout)
+            n = min(self.batch_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(n)]
+            self._oldest = time.monotonic() if self._buffer else None
+            # Room was freed for producers blocked on a full buffer
+            self._cond.notify_all()
+            return batch
+
+    def _requeue(self, batch):
+        with self._cond:
+            self._buffer.extendleft(reversed(batch))
+            overflow = len(self._buffer) - self.max_buffer
+            for _ in range(max(0, overflow)):
+                self._buffer.pop()
+            self.dropped += max(0, overflow)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _run(self):
+        delay = 0.5
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if not self._running:
+                    return
+                continue
+            start = time.perf_counter()
+            try:
+                ids = self._write_batch(batch)
+            except Exception as e:
+                with self._cond:
+                    self.failed_writes += 1
+                logger.warning("Ingestion write failed (%d rows), retrying in %.1fs: %s", len(batch), delay, e)
+                self._requeue(batch)
+                if not self._running:
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                continue
+            delay = 0.5
+            with self._cond:
+                self.inserted += len(batch)
+                self.batches += 1
+                self.last_flush_seconds = time.perf_counter() - start
+            for listener in self._listeners:
+                try:
+                    listener(batch, ids)
+                except Exception:
+                    logger.exception("Ingestion listener failed")
+
+
+class MqttIngestion:
+    """Connects an IngestionWorker to the MQTT broker."""
+
+    def __init__(self, worker: IngestionWorker, broker: str = MQTT_BROKER, port: int = MQTT_PORT,
+                 topic: str = MQTT_TOPIC, username: Optional[str] = MQTT_USER, password: Optional[str] = MQTT_PASS):
+        self.worker = worker
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.username = username
+        self.password = password
+        self._client = None
+
+    def start(self):
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        client.on_connect = self._on_connect
+        client.on_message = lambda client, userdata, msg: self.worker.handle_message(msg.topic, msg.payload)
+        self.worker.start()
+        client.connect_async(self.broker, self.port)
+        client.loop_start()
+        self._client = client
+
+    def stop(self):
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
+        self.worker.stop()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        # (Re)subscribe on every connect so a broker restart doesn't lose the subscription
+        client.subscribe(self.topic, qos=1)
+
+
+ingestion_worker = IngestionWorker()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    service = MqttIngestion(ingestion_worker)
+    service.start()
+    logger.info("Ingesting %s from %s:%s", service.topic, service.broker, service.port)
+    try:
+        while True:
+            time.sleep(30)
+            logger.info(json.dumps(ingestion_worker.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
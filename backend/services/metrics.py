@@ -0,0 +1,327 @@
+"""In-process metrics in the Prometheus text format, plus an opt-in profiler.
+
+Histograms and counters are plain objects keyed by label values and guarded
+by a lock, cheap enough (about a microsecond per observation) to sit on
+every request and every query. ``render`` produces the exposition served
+at ``/metrics``. Nothing here imports the rest of the backend, so any
+module can record into it.
+
+The sampling profiler is off unless ``PROFILING_ENABLED`` is set. A request
+sent with ``X-Profile: 1`` is then sampled every PROFILE_SAMPLE_INTERVAL
+seconds while it runs, and the collapsed stacks (the input format of
+flamegraph.pl and speedscope) are kept for the last PROFILE_KEEP requests
+under ``/api/system/profiles``. Samples cover every thread, so the event
+loop and the DB worker threads both show up; concurrent requests share
+those threads and appear in each other's profiles.
+"""
+import itertools
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterable, Sequence
+
+import config
+
+PROFILING_ENABLED: bool = getattr(config, "PROFILING_ENABLED", False)
+PROFILE_SAMPLE_INTERVAL: float = getattr(config, "PROFILE_SAMPLE_INTERVAL", 0.005)
+PROFILE_KEEP: int = getattr(config, "PROFILE_KEEP", 20)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+_metrics = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge:
+    """A gauge read at scrape time from ``collect() -> {label values: value}``."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], dict]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        _metrics.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        try:
+            values = self.collect()
+        except Exception:
+            return
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+def render() -> str:
+    return "\n".join(line for metric in _metrics for line in metric.render()) + "\n"
+
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, including streaming the body.",
+    ["method", "route", "status"],
+)
+db_query_seconds = Histogram(
+    "db_query_duration_seconds", "Time to execute a query and fetch its rows.", ["query"],
+)
+db_acquire_seconds = Histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a pooled database connection.", buckets=FAST_BUCKETS,
+)
+model_load_seconds = Histogram(
+    "model_load_duration_seconds", "Time to unpickle a model bundle.", ["model"],
+)
+model_inference_seconds = Histogram(
+    "model_inference_duration_seconds", "Time of one scaled predict call.", ["model"], buckets=FAST_BUCKETS,
+)
+model_inference_rows = Counter("model_inference_rows_total", "Rows scored by each model.", ["model"])
+inference_batch_rows = Histogram(
+    "inference_batch_rows", "Rows per batch sent to the inference pool.", ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384),
+)
+inference_wait_seconds = Histogram(
+    "inference_batch_wait_seconds", "Time the first request of a batch waited for it to be sent.", ["model"],
+    buckets=FAST_BUCKETS,
+)
+outbound_http_seconds = Histogram(
+    "outbound_http_duration_seconds", "Latency of outbound HTTP calls until the response headers arrive.",
+    ["host", "status"],
+)
+
+_QUERY_NAME = re.compile(r"/\*\s*name:\s*([\w.-]+)\s*\*/")
+_QUERY_SHAPE = re.compile(r"^\W*(select|insert|update|delete|replace)\b.*?\b(?:from|into)\s+`?(\w+)", re.I | re.S)
+_query_names = {}
+
+
+def query_name(query: str) -> str:
+    """Label for a query: a ``/* name: ... */`` comment, else its verb and first table."""
+    name = _query_names.get(query)
+    if name is None:
+        match = _QUERY_NAME.search(query)
+        if match:
+            name = match.group(1)
+        else:
+            match = _QUERY_SHAPE.search(query)
+            name = f"{match.group(1).lower()}_{match.group(2).lower()}" if match else "other"
+        if len(_query_names) < 1024:
+            _query_names[query] = name
+    return name
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread until stopped; ``collapsed()`` renders them."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    thread = threading._active.get(ident)
+                    names[ident] = thread.name if thread else str(ident)
+                self.samples[names[ident] + ";" + _collapse(frame)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reserve(self) -> int:
+        """Id for a profile that is still running, so it can go out in a response header."""
+        return next(self._ids)
+
+    def add(self, profile_id: int, method: str, path: str, started_at: datetime, seconds: float,
+            profiler: SamplingProfiler):
+        with self._lock:
+            self._profiles[profile_id] = {
+                "id": profile_id,
+                "method": method,
+                "path": path,
+                "started_at": started_at,
+                "seconds": round(seconds, 6),
+                "samples": sum(profiler.samples.values()),
+                "collapsed": profiler.collapsed(),
+            }
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "collapsed"} for p in reversed(self._profiles.values())]
+
+    def get(self, profile_id: int):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+profiles = ProfileStore()
+
+
+def route_label(scope, status: int) -> str:
+    """The path with path parameters put back as ``{name}``, so each route is one series."""
+    if "endpoint" not in scope and status == 404:
+        return "unmatched"  # keeps unknown paths from each creating a series
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    if not params:
+        return scope["path"]
+    return "/".join("{" + params[part] + "}" if part in params else part for part in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """Records ``http_request_duration_seconds`` and runs the opt-in profiler.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so the time of
+    streamed bodies (the exports) is included.
+    """
+
+    def __init__(self, app, profiling: bool = None):
+        self.app = app
+        self.profiling = PROFILING_ENABLED if profiling is None else profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        profiler = None
+        if self.profiling and (b"x-profile", b"1") in scope["headers"]:
+            profile_id = profiles.reserve()
+            started_at = datetime.now()
+            profiler = SamplingProfiler()
+            profiler.start()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profiler is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", str(profile_id).encode())
+                    ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_request_seconds.observe(elapsed, scope["method"], route_label(scope, status), str(status))
+            if profiler is not None:
+                profiler.stop()
+                profiles.add(profile_id, scope["method"], scope["path"], started_at, elapsed, profiler)
@@ -0,0 +1,102 @@
+"""Soil moisture projected over the OpenWeather 5-day/3-hour forecast.
+
+The moisture model takes (temperature, humidity, light_intensity). The
+forecast supplies the first two for each slot. It has no light level, so
+each slot gets the farm's mean lux at the same hour of day over the last
+24 hours. That comes from the recent buffer, or from MySQL until the buffer
+is loaded. Hours without readings use the mean of the whole window.
+
+All slots go to the moisture model as one feature matrix, so the whole
+outlook costs one (cached) forecast fetch and one predict call. Slots that
+have already started are skipped, like ``/when-will-it-rain`` does, since
+the cached forecast can be hours old.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+
+from database import AsyncDatabase
+from services.forecast import FARM_LAT, FARM_LON, forecast_cache
+from services.inference import inference
+from services.recent import RECENT_WINDOW, sensor_buffer
+
+LIGHT_QUERY = "/* name: forecast_light */ SELECT ts, lux FROM smartfarm WHERE ts > %s AND lux IS NOT NULL"
+
+
+async def _recent_light() -> Tuple[np.ndarray, np.ndarray, str]:
+    since = datetime.now() - RECENT_WINDOW
+    window = sensor_buffer.window(since)
+    if window is not None:
+        return window["ts"], window["lux"], "recent"
+    rows = await AsyncDatabase.fetch_rows(LIGHT_QUERY, (since,))
+    if not rows:
+        return np.array([], dtype="datetime64[s]"), np.array([]), "database"
+    ts, lux = zip(*rows)
+    return np.array(ts, dtype="datetime64[s]"), np.array(lux, dtype=np.float64), "database"
+
+
+def hourly_light(ts: np.ndarray, lux: np.ndarray) -> Optional[np.ndarray]:
+    """Mean lux per local hour of day (24 values), or None without readings."""
+    keep = ~np.isnan(lux)
+    ts, lux = ts[keep], lux[keep]
+    if not len(lux):
+        return None
+    hours = (ts.astype("datetime64[h]") - ts.astype("datetime64[D]")).astype(np.int64)
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=lux, minlength=24)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), lux.mean())
+
+
+async def moisture_forecast(lat: float = FARM_LAT, lon: float = FARM_LON) -> dict:
+    data = await forecast_cache.get(lat, lon)
+    now = time.time()
+    slots = [s for s in data["list"] if s["dt"] > now]
+    offset = data["city"]["timezone"]
+
+    dt = np.array([s["dt"] for s in slots], dtype=np.int64)
+    temperature = np.array([s["main"]["temp"] for s in slots], dtype=np.float64)
+    humidity = np.array([s["main"]["humidity"] for s in slots], dtype=np.float64)
+    rain = np.array([s.get("rain", {}).get("3h", 0.0) for s in slots], dtype=np.float64)
+
+    ts, lux, light_source = await _recent_light()
+    profile = hourly_light(ts, lux)
+    if profile is None or not slots:
+        light = np.full(len(slots), np.nan)
+        moisture = np.full(len(slots), np.nan)
+    else:
+        local_hour = (dt + offset) // 3600 % 24
+        light = profile[local_hour]
+        # Column order must match train_moisture_model.py
+        moisture = await inference.predict("moisture", np.column_stack([temperature, humidity, light]))
+
+    epoch = datetime(1970, 1, 1)
+    local = [epoch + timedelta(seconds=t) for t in (dt + offset).tolist()]
+    rainy = np.flatnonzero(rain > 0)
+    first_rain = None
+    if len(rainy):
+        i = rainy[0]
+        first_rain = {"timestamp": int(dt[i]), "datetime_local": local[i], "rain_mm": float(rain[i])}
+
+    columns = {
+        "timestamp": dt.tolist(),
+        "datetime_local": local,
+        "temperature": temperature.tolist(),
+        "humidity": humidity.tolist(),
+        "light_intensity": _nullable(light),
+        "soil_moisture": _nullable(moisture),
+        "rain_mm": rain.tolist(),
+        "weather": [s["weather"][0]["main"] if s.get("weather") else None for s in slots],
+    }
+    keys = list(columns)
+    return {
+        "light_source": light_source if profile is not None else None,
+        "first_rain": first_rain,
+        "total_rain_mm": float(rain.sum()),
+        "slots": [dict(zip(keys, values)) for values in zip(*columns.values())],
+    }
+
+
+def _nullable(values: np.ndarray) -> list:
+    return [None if v != v else v for v in values.tolist()]
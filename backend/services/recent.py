@@ -0,0 +1,253 @@
+"""In-memory window of the most recent sensor and weather readings.
+
+Each buffer is a fixed-capacity ring of typed NumPy arrays, one per field,
+so the last 24 hours are served without touching MySQL and without keeping
+a dict per row. The buffers are primed from the database at startup, fed by
+the ingestion worker as it writes, and topped up by a background poll that
+picks up rows written by other writers (the Node-RED weather flow).
+
+Memory per row is 8 bytes for the timestamp plus 8 per field:
+
+- sensor (id, lux, temperature, soil_moisture): 40 bytes. A KidBright board
+  reading every 5 minutes needs 288 rows/day, about 11.3 KB per sensor for
+  the 24-hour window; reporting every 10 seconds, 8640 rows or ~338 KB.
+- weather (humidity, pressure, rain_1h, cloudiness): 40 bytes per row.
+
+The capacity is fixed at startup (RECENT_BUFFER_CAPACITY rows per buffer,
+4 MB each at the default), so memory does not grow with traffic. If the
+window ever needs more rows than that, the oldest are overwritten and reads
+for the uncovered part fall back to the database.
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from database import AsyncDatabase
+from services.cache import response_cache
+from services.stream import hub
+
+RECENT_BUFFER_CAPACITY: int = getattr(config, "RECENT_BUFFER_CAPACITY", 100000)
+RECENT_POLL_INTERVAL: float = getattr(config, "RECENT_POLL_INTERVAL", 15.0)
+RECENT_WINDOW = timedelta(hours=24)
+
+SENSOR_COLUMNS = "id, ts, lux, temperature, moisture"
+SENSOR_SINCE_QUERY = f"/* name: recent_sensor */ SELECT {SENSOR_COLUMNS} FROM smartfarm WHERE ts > %s ORDER BY id ASC"
+SENSOR_AFTER_ID_QUERY = f"/* name: recent_sensor */ SELECT {SENSOR_COLUMNS} FROM smartfarm WHERE id > %s ORDER BY id ASC"
+WEATHER_SINCE_QUERY = (
+    "/* name: recent_weather */ SELECT ts, humidity, pressure, rain_1h, clouds FROM weather_api "
+    "WHERE ts > %s ORDER BY ts ASC"
+)
+
+
+class RingBuffer:
+    def __init__(self, fields: Dict[str, type], capacity: int = RECENT_BUFFER_CAPACITY):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._ts = np.zeros(capacity, dtype="datetime64[s]")
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in fields.items()}
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        # Rows at or after this time are all present; None until primed
+        self.complete_since: Optional[np.datetime64] = None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._ts.nbytes + sum(column.nbytes for column in self._columns.values())
+
+    def reset(self, since: datetime):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self.complete_since = np.datetime64(since, "s")
+
+    def extend(self, ts, columns: Dict[str, list], key: str = None) -> np.ndarray:
+        """Append rows given as a timestamp sequence and one sequence per field, oldest first.
+
+        With ``key``, rows whose ``key`` value is not above the newest
+        buffered one are skipped, so two writers racing to append the same
+        rows don't duplicate them. Returns a boolean mask of the rows that
+        were appended.
+        """
+        ts = np.asarray(ts, dtype="datetime64[s]")
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        fresh = np.ones(len(ts), dtype=bool)
+        with self._lock:
+            if key is not None and self._count:
+                newest = self._columns[key][(self._head - 1) % self.capacity]
+                fresh = columns[key] > newest
+                ts = ts[fresh]
+                columns = {name: values[fresh] for name, values in columns.items()}
+            n = len(ts)
+            if n == 0:
+                return fresh
+            if n > self.capacity:
+                # Only the newest rows fit; the rest were never appended
+                fresh[np.flatnonzero(fresh)[:n - self.capacity]] = False
+                ts = ts[-self.capacity:]
+                columns = {name: values[-self.capacity:] for name, values in columns.items()}
+                n = self.capacity
+            idx = (self._head + np.arange(n)) % self.capacity
+            self._ts[idx] = ts
+            for name in self.fields:
+                # NULLs become NaN in float columns
+                self._columns[name][idx] = columns[name]
+            self._head = (self._head + n) % self.capacity
+            overwritten = self._count + n > self.capacity
+            self._count = min(self._count + n, self.capacity)
+            if overwritten:
+                # Rows older than the oldest survivor are gone
+                self.complete_since = self._ts[self._head if self._count == self.capacity else 0]
+        return fresh
+
+    def last(self, field: str = None):
+        with self._lock:
+            if self._count == 0:
+                return None
+            i = (self._head - 1) % self.capacity
+            return self._ts[i] if field is None else self._columns[field][i]
+
+    def window(self, since: datetime) -> Optional[Dict[str, np.ndarray]]:
+        """Rows with ``ts > since``, oldest first, or None if the buffer doesn't cover ``since``."""
+        since = np.datetime64(since, "s")
+        with self._lock:
+            if self.complete_since is None or self.complete_since > since:
+                return None
+            start = (self._head - self._count) % self.capacity
+            order = (start + np.arange(self._count)) % self.capacity
+            ts = self._ts[order]
+            keep = order[ts > since]
+            kept = self._ts[keep]
+            if len(kept) > 1 and (kept[1:] < kept[:-1]).any():
+                # Batches buffered on a board arrive backdated, behind newer rows
+                keep = keep[np.argsort(kept, kind="stable")]
+            result = {name: column[keep] for name, column in self._columns.items()}
+            result["ts"] = self._ts[keep]
+            return result
+
+
+def to_records(window: Dict[str, np.ndarray], names: Dict[str, str], descending: bool = False) -> List[dict]:
+    """Turn buffer columns into response dicts; ``names`` maps response key -> buffer field."""
+    columns = {key: window[field].tolist() for key, field in names.items()}
+    columns["timestamp"] = window["ts"].astype(datetime).tolist()
+    keys = list(columns)
+    records = [dict(zip(keys, values)) for values in zip(*columns.values())]
+    if descending:
+        records.reverse()
+    return records
+
+
+sensor_buffer = RingBuffer({
+    "id": np.int64,
+    "lux": np.float64,
+    "temperature": np.float64,
+    "soil_moisture": np.float64,
+})
+
+weather_buffer = RingBuffer({
+    "humidity": np.float64,
+    "pressure": np.float64,
+    "rain_1h": np.float64,
+    "cloudiness": np.float64,
+})
+
+
+def _publish_sensor(rows):
+    hub.publish("sensor", (
+        {"id": row_id, "timestamp": ts, "lux": lux, "temperature": temperature, "soil_moisture": moisture}
+        for row_id, ts, lux, temperature, moisture in rows
+    ))
+
+
+def _publish_weather(rows):
+    hub.publish("weather", (
+        {"timestamp": ts, "humidity": humidity, "pressure": pressure, "rain_1h": rain, "cloudiness": clouds}
+        for ts, humidity, pressure, rain, clouds in rows
+    ))
+
+
+def _extend_sensor(rows) -> list:
+    """Append ``rows`` to the sensor buffer; returns those not already in it."""
+    if not rows:
+        return []
+    ids, ts, lux, temperature, moisture = zip(*rows)
+    fresh = sensor_buffer.extend(
+        ts, {"id": ids, "lux": lux, "temperature": temperature, "soil_moisture": moisture}, key="id"
+    )
+    return [row for row, appended in zip(rows, fresh.tolist()) if appended]
+
+
+def _extend_weather(rows) -> list:
+    if not rows:
+        return []
+    ts, humidity, pressure, rain, clouds = zip(*rows)
+    fresh = weather_buffer.extend(
+        ts, {"humidity": humidity, "pressure": pressure, "rain_1h": rain, "cloudiness": clouds}
+    )
+    return [row for row, appended in zip(rows, fresh.tolist()) if appended]
+
+
+async def prime():
+    since = datetime.now() - RECENT_WINDOW
+    sensor_rows = await AsyncDatabase.fetch_rows(SENSOR_SINCE_QUERY, (since,))
+    weather_rows = await AsyncDatabase.fetch_rows(WEATHER_SINCE_QUERY, (since,))
+    sensor_buffer.reset(since)
+    _extend_sensor(sensor_rows)
+    weather_buffer.reset(since)
+    _extend_weather(weather_rows)
+
+
+async def poll():
+    """Pick up rows that other writers added since the newest buffered row.
+
+    Sensor rows are followed by id, which assumes a single writer hands out
+    ids in ts order (the ingestion worker or the Node-RED flow, not both).
+    """
+    if sensor_buffer.complete_since is None or weather_buffer.complete_since is None:
+        await prime()
+        return
+    last_id = sensor_buffer.last("id")
+    if last_id is None:
+        since = sensor_buffer.complete_since.astype(datetime)
+        sensor_rows = await AsyncDatabase.fetch_rows(SENSOR_SINCE_QUERY, (since,))
+    else:
+        sensor_rows = await AsyncDatabase.fetch_rows(SENSOR_AFTER_ID_QUERY, (int(last_id),))
+    # The ingestion listener may have appended some of them already
+    appended = _extend_sensor(sensor_rows)
+    _publish_sensor(appended)
+    if appended:
+        response_cache.invalidate("sensor")
+
+    last_ts = weather_buffer.last()
+    since = last_ts.astype(datetime) if last_ts is not None else weather_buffer.complete_since.astype(datetime)
+    weather_rows = await AsyncDatabase.fetch_rows(WEATHER_SINCE_QUERY, (since,))
+    appended = _extend_weather(weather_rows)
+    _publish_weather(appended)
+    if appended:
+        # Node-RED writes weather rows, so this poll is the only place that sees them
+        response_cache.invalidate("weather")
+
+
+async def run_periodically(interval: float = RECENT_POLL_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await poll()
+        except Exception as e:
+            print(f"Recent readings poll failed: {e}")
+
+
+def on_ingested(rows, ids):
+    """Ingestion listener: append freshly written smartfarm rows."""
+    if not ids or len(ids) != len(rows):
+        return  # without ids the next poll picks the rows up instead
+    with_ids = [(row_id, ts, lux, temperature, moisture)
+                for row_id, (ts, lux, temperature, moisture, _lat, _lon) in zip(ids, rows)]
+    _publish_sensor(_extend_sensor(with_ids))
@@ -0,0 +1,201 @@
+"""Time-bucketed min/max/avg/count rollups of the sensor and weather readings.
+
+Buckets of 5 minutes, 1 hour and 1 day are kept in ``sensor_rollup`` and are
+aligned to wall-clock time. ``refresh`` folds in rows past the per-table
+watermark with one ``INSERT ... SELECT ... GROUP BY`` per metric and
+resolution, merging into partially filled buckets with ``ON DUPLICATE KEY
+UPDATE``, so rows already rolled up are never read again. It runs
+periodically in the background, and ``request_refresh`` wakes it early after
+the ingestion worker writes; requests made while a pass is pending or
+running collapse into one more pass.
+
+The watermark is a (ts, id) pair taken in one transaction. A pass folds the
+rows with ``ts`` in (watermark ts, now] plus the rows with ``ts`` at or
+before the watermark but an ``id`` above the watermark id: readings a board
+buffered while offline, written later with their original timestamps. Both
+sets stop at the largest id seen at the start of the pass, so a row is
+folded exactly once whichever clock stamped it.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+import config
+from database import AsyncDatabase, Database
+
+ROLLUP_INTERVAL: float = getattr(config, "ROLLUP_INTERVAL", 60.0)
+
+RESOLUTIONS = {"5m": 300, "1h": 3600, "1d": 86400}
+
+# metric name -> (table, column)
+METRICS = {
+    "lux": ("smartfarm", "lux"),
+    "temperature": ("smartfarm", "temperature"),
+    "moisture": ("smartfarm", "moisture"),
+    "humidity": ("weather_api", "humidity"),
+    "rain": ("weather_api", "rain_1h"),
+}
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sensor_rollup (
+        metric VARCHAR(32) NOT NULL,
+        resolution INT NOT NULL,
+        bucket_ts DATETIME NOT NULL,
+        min_value DOUBLE NOT NULL,
+        max_value DOUBLE NOT NULL,
+        sum_value DOUBLE NOT NULL,
+        count INT NOT NULL,
+        PRIMARY KEY (metric, resolution, bucket_ts)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_watermark (
+        source VARCHAR(64) NOT NULL PRIMARY KEY,
+        ts DATETIME NOT NULL,
+        last_id BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+LAST_ID_COLUMN = """
+    SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'rollup_watermark' AND COLUMN_NAME = 'last_id'
+"""
+
+# A row whose id was handed out before the pass read MAX(id) but which
+# commits after it carries a CURRENT_TIMESTAMP this close to "now", so the
+# time window stops short of it and the next pass folds it
+SETTLE_SECONDS = 2
+
+BUCKET_EXPR = "TIMESTAMPADD(SECOND, FLOOR(TIMESTAMPDIFF(SECOND, '2000-01-01', ts) / {res}) * {res}, '2000-01-01')"
+
+UPSERT = """
+    INSERT INTO sensor_rollup (metric, resolution, bucket_ts, min_value, max_value, sum_value, count)
+    SELECT %s, {res}, {bucket}, MIN({column}), MAX({column}), SUM({column}), COUNT({column})
+    FROM (
+        SELECT ts, {column} FROM {table} WHERE ts > %s AND ts <= %s AND id <= %s
+        UNION ALL
+        SELECT ts, {column} FROM {table} WHERE id > %s AND id <= %s AND ts <= %s
+    ) new_rows
+    WHERE {column} IS NOT NULL
+    GROUP BY 3
+    ON DUPLICATE KEY UPDATE
+        min_value = LEAST(min_value, VALUES(min_value)),
+        max_value = GREATEST(max_value, VALUES(max_value)),
+        sum_value = sum_value + VALUES(sum_value),
+        count = count + VALUES(count)
+"""
+
+def ensure_schema():
+    with Database.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.execute(LAST_ID_COLUMN)
+            if cursor.fetchone()[0] == 0:
+                cursor.execute("ALTER TABLE rollup_watermark ADD COLUMN last_id BIGINT NOT NULL DEFAULT 0")
+                # Existing watermarks were kept by timestamp alone; treat every
+                # row already written as seen so none is folded twice
+                for table in sorted({table for table, _ in METRICS.values()}):
+                    cursor.execute(
+                        f"UPDATE rollup_watermark SET last_id = (SELECT COALESCE(MAX(id), 0) FROM {table}) "
+                        "WHERE source = %s",
+                        (table,),
+                    )
+        finally:
+            cursor.close()
+
+
+def _refresh_table(conn, table: str):
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute("SELECT ts, last_id FROM rollup_watermark WHERE source = %s FOR UPDATE", (table,))
+        row = cursor.fetchone()
+        start, last_id = row if row else (datetime(1970, 1, 1), 0)
+        cursor.execute(f"SELECT NOW() - INTERVAL %s SECOND, COALESCE(MAX(id), 0) FROM {table}", (SETTLE_SECONDS,))
+        end, max_id = cursor.fetchone()
+        end = max(end, start)
+        if end == start and max_id <= last_id:
+            conn.rollback()
+            return 0
+
+        folded = 0
+        for metric, (metric_table, column) in METRICS.items():
+            if metric_table != table:
+                continue
+            for res in RESOLUTIONS.values():
+                query = UPSERT.format(res=res, bucket=BUCKET_EXPR.format(res=res), column=column, table=table)
+                cursor.execute(query, (metric, start, end, max_id, last_id, max_id, start))
+                folded += cursor.rowcount
+        cursor.execute(
+            "INSERT INTO rollup_watermark (source, ts, last_id) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE ts = VALUES(ts), last_id = VALUES(last_id)",
+            (table, end, max_id),
+        )
+        conn.commit()
+        return folded
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+async def refresh():
+    """Fold rows written since the last pass into every rollup."""
+    tables = sorted({table for table, _ in METRICS.values()})
+    for table in tables:
+        await AsyncDatabase.run(_refresh_table, table)
+
+
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def request_refresh():
+    """Wake ``run_periodically`` for a pass soon. Safe to call from any thread."""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def run_periodically(interval: float = ROLLUP_INTERVAL):
+    global _wakeup, _loop
+    _wakeup = asyncio.Event()
+    _loop = asyncio.get_running_loop()
+    while True:
+        # Cleared before the pass so a request made during it buys exactly one more
+        _wakeup.clear()
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"Rollup refresh failed: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def pick_resolution(start: datetime, end: datetime, max_buckets: int) -> Optional[str]:
+    """Finest rollup whose bucket count over [start, end] stays within ``max_buckets``."""
+    span = (end - start).total_seconds()
+    for name, seconds in sorted(RESOLUTIONS.items(), key=lambda item: item[1]):
+        if span / seconds <= max_buckets:
+            return name
+    return max(RESOLUTIONS, key=RESOLUTIONS.get)
+
+
+async def fetch_buckets(metric: str, resolution: str, start: datetime, end: datetime):
+    query = """
+        /* name: rollup_buckets */
+        SELECT bucket_ts, min_value, max_value, sum_value / count, count
+        FROM sensor_rollup
+        WHERE metric = %s AND resolution = %s AND bucket_ts >= %s AND bucket_ts <= %s
+        ORDER BY bucket_ts ASC
+    """
+    res = RESOLUTIONS[resolution]
+    # Include the bucket that contains ``start``
+    bucket_start = start - timedelta(seconds=(start - datetime(2000, 1, 1)).total_seconds() % res)
+    return await AsyncDatabase.fetch_rows(query, (metric, res, bucket_start, end))
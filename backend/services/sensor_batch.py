@@ -0,0 +1,87 @@
+"""Compact binary batches of sensor readings, shared by the KidBright board and the backend.
+
+The board buffers readings and publishes many of them as one MQTT message
+instead of one JSON object per reading. This module only imports
+``struct`` and avoids annotations, so the same file runs under MicroPython
+on the board (copied next to ``kidbright/main.py``) and under CPython in
+the ingestion worker, where it can be exercised directly.
+
+Layout, little-endian::
+
+    header   magic b"SF", version u8, flags u8 (reserved, 0), count u16,
+             latitude f32, longitude f32                               14 bytes
+    sample   age u32 (seconds before the batch was encoded), lux f32,
+             soil moisture u16 (hundredths of a percent),
+             temperature i16 (hundredths of a degree C, -32768 if missing)
+                                                                        12 bytes
+
+The location is sent once per batch instead of with every reading. Samples
+carry their age rather than a timestamp because the board's clock is never
+set: ages are differences of two readings of the same clock, and the
+backend dates each sample as arrival time minus age. A missing lux reading
+is encoded as NaN.
+"""
+import struct
+
+MAGIC = b"SF"
+VERSION = 1
+HEADER = "<2sBBHff"
+SAMPLE = "<IfHh"
+HEADER_SIZE = struct.calcsize(HEADER)
+SAMPLE_SIZE = struct.calcsize(SAMPLE)
+MAX_SAMPLES = 0xFFFF
+NO_TEMPERATURE = -0x8000
+
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+def encode_batch(samples, now, latitude, longitude):
+    """Pack ``(time, lux, soil_moisture, temperature)`` samples into one message.
+
+    ``time`` and ``now`` are seconds on the same clock; ``temperature`` may
+    be None.
+    """
+    if len(samples) > MAX_SAMPLES:
+        raise ValueError("too many samples for one batch")
+    buf = bytearray(HEADER_SIZE + SAMPLE_SIZE * len(samples))
+    struct.pack_into(HEADER, buf, 0, MAGIC, VERSION, 0, len(samples), latitude, longitude)
+    offset = HEADER_SIZE
+    for t, lux, moisture, temperature in samples:
+        age = _clamp(int(now - t), 0, 0xFFFFFFFF)
+        moisture = _clamp(int(round(moisture * 100)), 0, 0xFFFF)
+        if temperature is None:
+            temperature = NO_TEMPERATURE
+        else:
+            temperature = _clamp(int(round(temperature * 100)), -0x7FFF, 0x7FFF)
+        struct.pack_into(SAMPLE, buf, offset, age, lux, moisture, temperature)
+        offset += SAMPLE_SIZE
+    return bytes(buf)
+
+
+def is_batch(payload):
+    return payload[:2] == MAGIC
+
+
+def decode_batch(payload):
+    """``(latitude, longitude, samples)`` with ``(age, lux, soil_moisture, temperature)`` samples.
+
+    Raises ValueError for anything that isn't a complete batch of a known
+    version.
+    """
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("truncated batch header")
+    magic, version, _flags, count, latitude, longitude = struct.unpack_from(HEADER, payload, 0)
+    if magic != MAGIC:
+        raise ValueError("not a sensor batch")
+    if version != VERSION:
+        raise ValueError("unsupported batch version %d" % version)
+    if len(payload) != HEADER_SIZE + count * SAMPLE_SIZE:
+        raise ValueError("batch length does not match its sample count")
+    samples = []
+    for i in range(count):
+        age, lux, moisture, temperature = struct.unpack_from(SAMPLE, payload, HEADER_SIZE + i * SAMPLE_SIZE)
+        samples.append((age, lux, moisture / 100, None if temperature == NO_TEMPERATURE else temperature / 100))
+    # float32 carries about 7 digits; 6 decimals is ~0.1 m
+    return round(latitude, 6), round(longitude, 6), samples
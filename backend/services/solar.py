@@ -0,0 +1,125 @@
+"""Sunrise, sunset, solar noon and day length computed locally.
+
+Follows NOAA's solar calculator spreadsheet (Meeus' low-precision solar
+position), evaluated once per day at local noon. Every step is NumPy
+arithmetic on an array of dates, so a year of days costs about as much as
+one. Times agree with api.sunrise-sunset.org, which this replaces, to
+within a minute. Sunrise and sunset use the standard -0.833° altitude
+(refraction plus the solar disc).
+
+Times are in the farm's local time (``FARM_TIMEZONE``), the same
+convention as the rows the Node-RED flow used to write to
+``sunrise_sunset``. Where the sun does not rise or does not set, sunrise
+and sunset are NaN and the day length is 0 or 1440 minutes.
+"""
+from datetime import date, datetime, time
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import config
+from services.forecast import FARM_LAT, FARM_LON
+
+FARM_TIMEZONE: str = getattr(config, "FARM_TIMEZONE", "Asia/Bangkok")
+
+# Refraction and the sun's radius at the horizon, in degrees below it
+SUNRISE_ZENITH = 90.833
+
+_UNIX_EPOCH_JD = 2440587.5
+_J2000_JD = 2451545.0
+
+
+def utc_offsets(days: np.ndarray, tz: str = FARM_TIMEZONE) -> np.ndarray:
+    """UTC offset in hours at noon of each day, looked up once per distinct day."""
+    zone = ZoneInfo(tz)
+    unique, inverse = np.unique(days, return_inverse=True)
+    hours = np.array([
+        datetime.combine(day, time(12), zone).utcoffset().total_seconds() / 3600
+        for day in unique.astype(date).tolist()
+    ])
+    return hours[inverse]
+
+
+def sun_times(days, lat: float = FARM_LAT, lon: float = FARM_LON, utc_offset=None) -> Dict[str, np.ndarray]:
+    """Solar noon, sunrise and sunset (minutes after local midnight) and day length (minutes) per day.
+
+    ``days`` is anything ``np.asarray(..., dtype="datetime64[D]")`` accepts.
+    ``utc_offset`` is in hours, a scalar or one per day; by default it comes
+    from FARM_TIMEZONE.
+    """
+    days = np.atleast_1d(np.asarray(days, dtype="datetime64[D]"))
+    if utc_offset is None:
+        utc_offset = utc_offsets(days) if len(days) else np.empty(0)
+    utc_offset = np.asarray(utc_offset, dtype=np.float64)
+
+    # Julian day at local noon, then centuries since J2000
+    jd = days.astype(np.int64) + _UNIX_EPOCH_JD + 0.5 - utc_offset / 24
+    t = (jd - _J2000_JD) / 36525
+
+    mean_long = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+    mean_anom = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccent = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    center = np.radians(
+        np.sin(mean_anom) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + np.sin(2 * mean_anom) * (0.019993 - 0.000101 * t)
+        + np.sin(3 * mean_anom) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * t)
+    app_long = mean_long + center - np.radians(0.00569 + 0.00478 * np.sin(omega))
+    mean_obliq = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+    obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+    decl = np.arcsin(np.sin(obliq) * np.sin(app_long))
+
+    y = np.tan(obliq / 2) ** 2
+    eq_time = 4 * np.degrees(
+        y * np.sin(2 * mean_long)
+        - 2 * eccent * np.sin(mean_anom)
+        + 4 * eccent * y * np.sin(mean_anom) * np.cos(2 * mean_long)
+        - 0.5 * y * y * np.sin(4 * mean_long)
+        - 1.25 * eccent * eccent * np.sin(2 * mean_anom)
+    )
+
+    phi = np.radians(lat)
+    cos_ha = np.cos(np.radians(SUNRISE_ZENITH)) / (np.cos(phi) * np.cos(decl)) - np.tan(phi) * np.tan(decl)
+    # Beyond ±1 the sun stays up (< -1) or down (> 1) all day
+    ha = np.degrees(np.arccos(np.clip(cos_ha, -1.0, 1.0)))
+    rises = np.abs(cos_ha) <= 1.0
+
+    noon = 720 - 4 * lon - eq_time + utc_offset * 60
+    return {
+        "solar_noon": noon,
+        "sunrise": np.where(rises, noon - 4 * ha, np.nan),
+        "sunset": np.where(rises, noon + 4 * ha, np.nan),
+        "day_length": 8 * ha,
+    }
+
+
+def daylight_minutes(days, lat: float = FARM_LAT, lon: float = FARM_LON) -> np.ndarray:
+    """Minutes between sunrise and sunset for each day."""
+    return sun_times(days, lat, lon)["day_length"]
+
+
+def format_minutes(minutes: float) -> Optional[str]:
+    """``HH:MM:SS`` for a number of minutes, as the TIME columns used to be rendered."""
+    if np.isnan(minutes):
+        return None
+    total = int(round(minutes * 60))
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+def sun_records(start: date, end: date, lat: float = FARM_LAT, lon: float = FARM_LON, timestamp=None):
+    """One SunData-shaped dict per day in ``[start, end]``, newest first."""
+    days = np.arange(np.datetime64(end, "D"), np.datetime64(start, "D") - 1, -1)
+    times = sun_times(days, lat, lon)
+    columns = {name: [format_minutes(m) for m in values.tolist()] for name, values in times.items()}
+    return [
+        {
+            "timestamp": timestamp or datetime.combine(day, time()),
+            "sunrise": columns["sunrise"][i],
+            "sunset": columns["sunset"][i],
+            "solar_noon": columns["solar_noon"][i],
+            "day_length": columns["day_length"][i],
+        }
+        for i, day in enumerate(days.astype(date).tolist())
+    ]
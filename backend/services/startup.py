@@ -0,0 +1,74 @@
+"""Warmup work done after the server starts accepting requests.
+
+Loading the models, opening the pool's connections and priming the recent
+buffers used to run in the lifespan before the first request could be
+served, which put the model unpickling (two seconds and most of sklearn's
+import) in front of every route. ``Warmup.run`` does that work in the
+background instead: each chain of steps runs in order, the chains run
+concurrently, and blocking steps go to a worker thread so the event loop
+keeps serving. Routes that need something still loading wait for it (a
+prediction loads its model in the inference pool) or fall back to MySQL,
+as they do when a step fails.
+
+``/api/system/ready`` answers 503 until every step has finished.
+"""
+import asyncio
+import inspect
+import time
+from datetime import datetime
+from typing import Callable, Optional, Sequence, Tuple
+
+Step = Tuple[str, Callable]
+
+
+class Warmup:
+    def __init__(self):
+        self.steps = {}
+        self.started_at: Optional[datetime] = None
+        self._start = None
+        self._seconds = None
+
+    @property
+    def done(self) -> bool:
+        return self._seconds is not None
+
+    async def run(self, *chains: Sequence[Step]):
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._seconds = None
+        self.steps = {name: {"status": "pending"} for chain in chains for name, _ in chain}
+        await asyncio.gather(*(self._run_chain(chain) for chain in chains))
+        self._seconds = time.perf_counter() - self._start
+
+    async def _run_chain(self, chain: Sequence[Step]):
+        for name, fn in chain:
+            step = self.steps[name]
+            step["status"] = "running"
+            start = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    await fn()
+                else:
+                    await asyncio.to_thread(fn)
+            except Exception as e:
+                # Not fatal: whatever the step prepares is also set up on first use
+                print(f"Warning: warmup step {name} failed: {e}")
+                step.update(status="failed", error=f"{type(e).__name__}: {e}")
+            else:
+                step["status"] = "done"
+            step["seconds"] = round(time.perf_counter() - start, 4)
+
+    def status(self):
+        seconds = self._seconds
+        if seconds is None and self._start is not None:
+            seconds = time.perf_counter() - self._start
+        return {
+            "ready": self.done,
+            "started_at": self.started_at,
+            "seconds": None if seconds is None else round(seconds, 4),
+            "failed": [name for name, step in self.steps.items() if step["status"] == "failed"],
+            "steps": self.steps,
+        }
+
+
+warmup = Warmup()
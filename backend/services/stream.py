@@ -0,0 +1,169 @@
+"""Live events for dashboards over Server-Sent Events.
+
+Topics:
+
+- ``sensor``: smartfarm rows, shaped like ``/sensor-data/recent``
+- ``weather``: weather_api rows, shaped like ``/weather-data/recent``
+- ``health``: plant_health rows as ``/predict-health`` records them
+- ``alert``: fired and resolved alerts (services/alerts.py)
+
+Sensor rows are published by the ingestion worker as it writes them. Rows
+from other writers are published by the recent buffer's poll, every
+RECENT_POLL_INTERVAL seconds. Weather rows, written only by Node-RED,
+always arrive that way.
+
+``publish`` encodes each event to JSON and frames it as an SSE message
+once. The same bytes then go to every subscribed client, with one
+``call_soon_threadsafe`` per event loop per publish, so a publish costs
+one serialization plus a queue put per client.
+
+Every event has an id, increasing across topics. Ids start at the
+server's start time in microseconds, so they keep increasing across
+restarts. The last STREAM_HISTORY events are kept. A client reconnecting
+with ``Last-Event-ID`` (EventSource sends it automatically) or
+``?last_id=`` first gets the events it missed. If some of them are no
+longer kept, it gets a ``reset`` event instead, meaning it should refetch
+the collections. A client that falls STREAM_QUEUE events behind is
+disconnected and catches up the same way when it reconnects.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import config
+
+STREAM_HISTORY: int = getattr(config, "STREAM_HISTORY", 2000)
+STREAM_QUEUE: int = getattr(config, "STREAM_QUEUE", 500)
+STREAM_KEEPALIVE: float = getattr(config, "STREAM_KEEPALIVE", 15.0)
+
+TOPICS = ("sensor", "weather", "health", "alert")
+
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+
+
+def json_default(value):
+    # The same timestamp format as the REST responses
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class Subscriber:
+    __slots__ = ("topics", "queue", "replay", "overflowed", "loop")
+
+    def __init__(self, topics, max_queue, loop):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.replay: List[bytes] = []
+        self.overflowed = False
+        self.loop = loop
+
+
+class EventHub:
+    def __init__(self, history: int = STREAM_HISTORY, max_queue: int = STREAM_QUEUE):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._next_id = time.time_ns() // 1000
+        # (id, topic, frame), oldest first, across all topics
+        self._history = deque(maxlen=history)
+        self._subscribers: Dict[asyncio.AbstractEventLoop, set] = {}
+
+        self.published = {topic: 0 for topic in TOPICS}
+        self.delivered = 0
+        self.disconnected_slow = 0
+
+    def publish(self, topic: str, records: Iterable[dict], encoded: Optional[List[bytes]] = None):
+        """Send ``records`` to the ``topic`` subscribers; safe to call from any thread."""
+        records = list(records)
+        if not records:
+            return
+        if encoded is None:
+            encoded = [json.dumps(record, default=json_default).encode() for record in records]
+        event = topic.encode()
+        with self._lock:
+            frames = []
+            for data in encoded:
+                event_id = self._next_id
+                self._next_id += 1
+                frame = b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event, data)
+                self._history.append((event_id, topic, frame))
+                frames.append(frame)
+            self.published[topic] += len(frames)
+            targets = list(self._subscribers.items())
+        for loop, subscribers in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscribers, topic, frames)
+            except RuntimeError:
+                pass  # that loop has closed
+
+    def _deliver(self, subscribers, topic, frames):
+        for subscriber in list(subscribers):
+            if topic not in subscriber.topics or subscriber.overflowed:
+                continue
+            for frame in frames:
+                try:
+                    subscriber.queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    subscriber.overflowed = True
+                    self.disconnected_slow += 1
+                    break
+                self.delivered += 1
+
+    def subscribe(self, topics, last_id: Optional[int] = None) -> Subscriber:
+        """Register a client on the running loop; ``replay`` holds what it missed after ``last_id``."""
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(frozenset(topics), self.max_queue, loop)
+        with self._lock:
+            if last_id is not None:
+                oldest = self._history[0][0] if self._history else self._next_id
+                if oldest - 1 <= last_id < self._next_id:
+                    subscriber.replay = [frame for event_id, topic, frame in self._history
+                                         if event_id > last_id and topic in subscriber.topics]
+                else:
+                    subscriber.replay = [RESET_FRAME]
+            self._subscribers.setdefault(loop, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.loop)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.loop]
+
+    async def frames(self, subscriber: Subscriber, is_disconnected: Callable[[], Awaitable[bool]],
+                     keepalive: float = STREAM_KEEPALIVE) -> AsyncIterator[bytes]:
+        """The SSE body for ``subscriber``; unsubscribes when the client goes away or falls behind."""
+        try:
+            yield b"retry: 3000\n: connected\n\n"
+            for frame in subscriber.replay:
+                yield frame
+            subscriber.replay = []
+            while not subscriber.overflowed and not await is_disconnected():
+                try:
+                    chunk = [await asyncio.wait_for(subscriber.queue.get(), keepalive)]
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                # Send whatever else is already queued in the same write
+                while not subscriber.queue.empty():
+                    chunk.append(subscriber.queue.get_nowait())
+                yield b"".join(chunk)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "clients": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": dict(self.published),
+            "delivered": self.delivered,
+            "disconnected_slow": self.disconnected_slow,
+            "history": len(self._history),
+            "last_id": self._next_id - 1,
+        }
+
+
+hub = EventHub()
@@ -0,0 +1,221 @@
+"""Watering recommendations for every sensor at once.
+
+The rules are those of ``/watering-recommendation`` (rain within 24 hours,
+soil moisture below 30/50 %, temperature above 35 C or light above
+10000 lux), evaluated with NumPy over arrays of readings. ``rules`` gives a
+code per reading and ``advice`` turns a code into the text the dashboard
+shows. The single-reading route uses the same two functions.
+
+``WateringEngine`` keeps the latest reading of each sensor, a board
+identified by the (lat, lon) it reports, plus the code last computed for
+it. An evaluation:
+
+1. reads the smartfarm rows added since the previous one (by id, so
+   backdated board batches are not missed),
+2. takes the rain time from the shared forecast cache, and
+3. recomputes codes only for sensors whose reading changed, or for all of
+   them when the rain outlook crosses the 24-hour mark.
+
+The first evaluation loads each sensor's newest row with one query that
+expects::
+
+    CREATE INDEX idx_smartfarm_location_ts ON smartfarm (lat, lon, ts);
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from database import AsyncDatabase
+from services.forecast import FARM_LAT, FARM_LON, forecast_cache
+
+RAIN_SOON_HOURS = 24
+DRY_MOISTURE = 30
+MOIST_MOISTURE = 50
+HOT_TEMPERATURE = 35
+BRIGHT_LUX = 10000
+
+NO_READING, RAIN_MOIST, RAIN_HOLD, DRY_RAIN_LATER, DRY_NO_RAIN, WATER_LIGHTLY, OPTIONAL, NOT_NEEDED = range(8)
+
+ADVICE = {
+    NO_READING: "No soil moisture reading yet.",
+    RAIN_MOIST: "No need to water. Rain is coming and soil is moist.",
+    RAIN_HOLD: "Hold off watering. Rain is expected soon.",
+    DRY_RAIN_LATER: ("The soil is very dry, and rain isn't expected for another {hours:.0f} hours. "
+                     "Better to water your plants now to keep them healthy."),
+    DRY_NO_RAIN: "The soil is very dry, and there's no rain forecasted. It's a good time to water your plants.",
+    WATER_LIGHTLY: "Water lightly. Conditions are hot or very sunny.",
+    OPTIONAL: "Optional watering. Soil is moderately moist.",
+    NOT_NEEDED: "No watering needed. Soil is healthy.",
+}
+
+CODE_NAMES = {
+    NO_READING: "no_reading",
+    RAIN_MOIST: "rain_coming_soil_moist",
+    RAIN_HOLD: "rain_coming",
+    DRY_RAIN_LATER: "water_now",
+    DRY_NO_RAIN: "water_now",
+    WATER_LIGHTLY: "water_lightly",
+    OPTIONAL: "optional",
+    NOT_NEEDED: "not_needed",
+}
+
+LATEST_PER_SENSOR_QUERY = """
+    /* name: watering_latest_all */
+    SELECT s.id, s.ts, s.lat, s.lon, s.lux, s.temperature, s.moisture
+    FROM smartfarm s
+    JOIN (SELECT lat, lon, MAX(ts) AS ts FROM smartfarm WHERE id <= %s GROUP BY lat, lon) latest
+      ON s.lat = latest.lat AND s.lon = latest.lon AND s.ts = latest.ts
+    WHERE s.id <= %s
+"""
+MAX_ID_QUERY = "/* name: watering_max_id */ SELECT MAX(id) FROM smartfarm"
+NEW_ROWS_QUERY = """
+    /* name: watering_new_rows */
+    SELECT id, ts, lat, lon, lux, temperature, moisture
+    FROM smartfarm
+    WHERE id > %s
+    ORDER BY id ASC
+"""
+
+
+def rules(moisture: np.ndarray, temperature: np.ndarray, lux: np.ndarray,
+          hours_until_rain: Optional[float]) -> np.ndarray:
+    """The recommendation code of each reading; NaN marks a missing value."""
+    with np.errstate(invalid="ignore"):
+        if hours_until_rain is not None and hours_until_rain <= RAIN_SOON_HOURS:
+            codes = np.where(moisture >= MOIST_MOISTURE, RAIN_MOIST, RAIN_HOLD)
+        else:
+            dry = DRY_RAIN_LATER if hours_until_rain is not None else DRY_NO_RAIN
+            codes = np.select(
+                [moisture < DRY_MOISTURE, (temperature > HOT_TEMPERATURE) | (lux > BRIGHT_LUX),
+                 moisture < MOIST_MOISTURE],
+                [dry, WATER_LIGHTLY, OPTIONAL],
+                NOT_NEEDED,
+            )
+    return np.where(np.isnan(moisture), NO_READING, codes).astype(np.int8)
+
+
+def advice(code: int, hours_until_rain: Optional[float]) -> str:
+    return ADVICE[code].format(hours=hours_until_rain)
+
+
+def hours_until_rain(forecast: dict, now: float) -> Tuple[Optional[float], Optional[datetime]]:
+    """Hours until the first forecast slot with rain, and its local time; (None, None) if dry."""
+    for slot in forecast["list"]:
+        if slot["dt"] > now and slot.get("rain", {}).get("3h", 0) > 0:
+            local = datetime(1970, 1, 1) + timedelta(seconds=slot["dt"] + forecast["city"]["timezone"])
+            return (slot["dt"] - now) / 3600, local
+    return None, None
+
+
+def _float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class WateringEngine:
+    def __init__(self):
+        self._index: Dict[Tuple[float, float], int] = {}
+        self._keys = []
+        self._ts = []
+        self._row_id = np.zeros(0, dtype=np.int64)
+        self._values = np.zeros((0, 3))  # moisture, temperature, lux
+        self._codes = np.zeros(0, dtype=np.int8)
+        self._dirty = np.zeros(0, dtype=bool)
+        self._last_id: Optional[int] = None
+        self._rain_soon: Optional[Tuple[bool, bool]] = None
+        self._lock = asyncio.Lock()
+
+        self.evaluations = 0
+        self.recomputed = 0
+        self.rows_read = 0
+        self.last_seconds = 0.0
+
+    def _apply(self, rows):
+        for row_id, ts, lat, lon, lux, temperature, moisture in rows:
+            key = (lat, lon)
+            i = self._index.get(key)
+            if i is None:
+                i = self._index[key] = len(self._keys)
+                self._keys.append(key)
+                self._ts.append(ts)
+                self._row_id = np.append(self._row_id, row_id)
+                self._values = np.vstack([self._values, np.full((1, 3), np.nan)])
+                self._codes = np.append(self._codes, np.int8(NO_READING))
+                self._dirty = np.append(self._dirty, True)
+            elif ts < self._ts[i] or (ts == self._ts[i] and row_id < self._row_id[i]):
+                continue  # a backdated row older than what we have
+            values = (_float(moisture), _float(temperature), _float(lux))
+            if not np.array_equal(self._values[i], values, equal_nan=True):
+                self._values[i] = values
+                self._dirty[i] = True
+            self._ts[i] = ts
+            self._row_id[i] = row_id
+
+    async def _read_new_rows(self):
+        if self._last_id is None:
+            max_id = (await AsyncDatabase.fetch_rows(MAX_ID_QUERY))[0][0] or 0
+            rows = await AsyncDatabase.fetch_rows(LATEST_PER_SENSOR_QUERY, (max_id, max_id))
+            self._apply(rows)
+            self._last_id = max_id
+        else:
+            rows = await AsyncDatabase.fetch_rows(NEW_ROWS_QUERY, (self._last_id,))
+            self._apply(rows)
+            if rows:
+                self._last_id = rows[-1][0]
+        self.rows_read += len(rows)
+
+    async def evaluate(self, lat: float = FARM_LAT, lon: float = FARM_LON) -> dict:
+        async with self._lock:
+            start = time.perf_counter()
+            await self._read_new_rows()
+            hours, rain_at = hours_until_rain(await forecast_cache.get(lat, lon), time.time())
+
+            rain_soon = (hours is None, hours is not None and hours <= RAIN_SOON_HOURS)
+            if rain_soon != self._rain_soon:
+                self._dirty[:] = True
+                self._rain_soon = rain_soon
+            dirty = np.flatnonzero(self._dirty)
+            if len(dirty):
+                moisture, temperature, lux = self._values[dirty].T
+                self._codes[dirty] = rules(moisture, temperature, lux, hours)
+                self._dirty[dirty] = False
+
+            codes = self._codes.tolist()
+            messages = {code: advice(code, hours) for code in set(codes)}
+            moisture, temperature, lux = (np.where(np.isnan(c), None, c).tolist() for c in self._values.T)
+            sensors = [
+                {
+                    "lat": key[0],
+                    "lon": key[1],
+                    "timestamp": self._ts[i],
+                    "moisture": moisture[i],
+                    "temperature": temperature[i],
+                    "lux": lux[i],
+                    "action": CODE_NAMES[codes[i]],
+                    "recommendation": messages[codes[i]],
+                }
+                for i, key in enumerate(self._keys)
+            ]
+            self.evaluations += 1
+            self.recomputed += len(dirty)
+            self.last_seconds = time.perf_counter() - start
+            return {
+                "hours_until_rain": hours,
+                "rain_datetime_local": rain_at,
+                "recomputed": len(dirty),
+                "sensors": sensors,
+            }
+
+    def stats(self):
+        return {
+            "sensors": len(self._keys),
+            "evaluations": self.evaluations,
+            "recomputed": self.recomputed,
+            "rows_read": self.rows_read,
+            "last_seconds": round(self.last_seconds, 6),
+        }
+
+
+watering_engine = WateringEngine()
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is run from its own directory with flat imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def client(tmp_path):
+    """An API client backed by a freshly seeded SQLite stand-in."""
+    from fastapi.testclient import TestClient
+
+    from benchmarks import standin
+    from database import Database
+    from main import app
+    from services.cache import response_cache
+
+    path = tmp_path / "smartfarm.sqlite"
+    standin.seed(path, rows=10)
+    Database.use_pool(standin.stand_in_pool(path))
+    response_cache.invalidate()
+    # Without the context manager the lifespan (warmup, MQTT) doesn't run
+    yield TestClient(app)
+    Database.close_pool()
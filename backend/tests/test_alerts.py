@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.alerts import AlertEngine
+
+T0 = datetime(2025, 1, 1, 6)
+FARM = (13.8657, 100.462)
+GREENHOUSE = (13.87, 100.47)
+
+
+def reading(minutes, moisture=None, temperature=None, lux=None, sensor=FARM):
+    return (T0 + timedelta(minutes=minutes), lux, temperature, moisture, sensor[0], sensor[1])
+
+
+def states(events):
+    return [(event["rule"], event["state"]) for event in events]
+
+
+def feed(engine, rows):
+    """Evaluate one reading at a time, as separate flushes would."""
+    return [states(engine.evaluate([row])) for row in rows]
+
+
+def test_below_rule_fires_once_and_clears_at_the_clear_level():
+    engine = AlertEngine([{"name": "soil_dry", "metric": "moisture", "kind": "below", "threshold": 20, "clear": 25}])
+    moisture = [30, 19, 18, 22, 19, 25, 19]
+
+    assert feed(engine, [reading(i, moisture=m) for i, m in enumerate(moisture)]) == [
+        [],
+        [("soil_dry", "firing")],
+        [],
+        [],  # back above the threshold but not the clear level
+        [],
+        [("soil_dry", "resolved")],
+        [("soil_dry", "firing")],
+    ]
+    assert engine.stats()["fired"] == 2 and engine.stats()["resolved"] == 1
+
+
+def test_clear_defaults_to_the_threshold():
+    engine = AlertEngine([{"name": "too_hot", "metric": "temperature", "kind": "above", "threshold": 40}])
+
+    assert feed(engine, [reading(i, temperature=t) for i, t in enumerate([41, 40.5, 40, 41])]) == [
+        [("too_hot", "firing")], [], [("too_hot", "resolved")], [("too_hot", "firing")],
+    ]
+
+
+def test_drop_rate_uses_an_anchor_at_least_the_minimum_interval_old():
+    engine = AlertEngine([{"name": "drying", "metric": "moisture", "kind": "drop", "threshold": 10, "clear": 5}],
+                         rate_min_seconds=60)
+    rows = [
+        reading(0, moisture=50),
+        reading(0.5, moisture=10),   # 30 s after the anchor: too close to measure
+        reading(30, moisture=40),    # -20 %/h against the reading at 0
+        reading(60, moisture=38),    # -4 %/h against the reading at 30
+    ]
+
+    events = [engine.evaluate([row]) for row in rows]
+
+    assert [states(e) for e in events] == [[], [], [("drying", "firing")], [("drying", "resolved")]]
+    assert events[2][0]["value"] == pytest.approx(20.0)
+    assert events[3][0]["value"] == pytest.approx(4.0)
+
+
+def test_rise_rule_and_missing_values():
+    engine = AlertEngine([{"name": "lights_on", "metric": "lux", "kind": "rise", "threshold": 500}],
+                         rate_min_seconds=60)
+    rows = [reading(0, lux=100), reading(10, lux=None), reading(20, lux=400), reading(30, lux=300)]
+
+    # 900 lux/h over the 20 minutes, then -600 lux/h (at most the threshold, so it clears)
+    assert feed(engine, rows) == [[], [], [("lights_on", "firing")], [("lights_on", "resolved")]]
+
+
+def test_backdated_reading_checks_thresholds_but_not_rates():
+    engine = AlertEngine([
+        {"name": "soil_dry", "metric": "moisture", "kind": "below", "threshold": 20},
+        {"name": "drying", "metric": "moisture", "kind": "drop", "threshold": 10},
+    ], rate_min_seconds=60)
+    engine.evaluate([reading(60, moisture=50)])
+
+    # From a board's buffered batch, dated before the anchor
+    assert states(engine.evaluate([reading(10, moisture=15)])) == [("soil_dry", "firing")]
+    # The anchor is still the reading at 60: 50 -> 45 over an hour is only -5 %/h
+    assert states(engine.evaluate([reading(120, moisture=45)])) == [("soil_dry", "resolved")]
+
+
+def test_sensor_override_replaces_the_rule_of_the_same_name():
+    engine = AlertEngine([
+        {"name": "soil_dry", "metric": "moisture", "kind": "below", "threshold": 20},
+        {"name": "too_hot", "metric": "temperature", "kind": "above", "threshold": 40},
+        {"name": "soil_dry", "metric": "moisture", "kind": "below", "threshold": 40, "sensor": list(GREENHOUSE)},
+    ])
+
+    events = engine.evaluate([
+        reading(0, moisture=30, temperature=41),
+        reading(0, moisture=30, temperature=41, sensor=GREENHOUSE),
+    ])
+
+    assert [(e["rule"], e["threshold"], (e["lat"], e["lon"])) for e in events] == [
+        ("too_hot", 40.0, FARM),
+        ("too_hot", 40.0, GREENHOUSE),
+        ("soil_dry", 40.0, GREENHOUSE),
+    ]
+    assert sorted((a["rule"], a["lat"]) for a in engine.active()) == [
+        ("soil_dry", GREENHOUSE[0]), ("too_hot", FARM[0]), ("too_hot", GREENHOUSE[0]),
+    ]
+    assert engine.stats()["rules"] == 3
+
+
+def test_subscribers_get_encoded_events_and_history_is_kept():
+    engine = AlertEngine([{"name": "too_hot", "metric": "temperature", "kind": "above", "threshold": 40}], history=2)
+    received = []
+
+    def broken(events, encoded):
+        raise RuntimeError("subscriber gone")
+
+    engine.subscribe(broken)
+    engine.subscribe(lambda events, encoded: received.extend(json.loads(data) for data in encoded))
+    engine.evaluate([reading(i, temperature=t) for i, t in enumerate([41, 39, 42])])
+
+    assert [(e["state"], e["value"]) for e in received] == [("firing", 41), ("resolved", 39), ("firing", 42)]
+    # Only the last two are kept; ids keep counting
+    assert [e["id"] for e in engine.recent()] == [2, 3]
+    assert [e["id"] for e in engine.recent(after=2)] == [3]
+
+
+@pytest.mark.parametrize("rule", [
+    {"name": "x", "metric": "rain", "kind": "above", "threshold": 1},
+    {"name": "x", "metric": "lux", "kind": "between", "threshold": 1},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        AlertEngine([rule])
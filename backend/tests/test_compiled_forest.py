@@ -0,0 +1,77 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from ml.compiled_forest import CompiledForest
+from ml.registry import ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[25, 40, 60, 500], scale=[5, 15, 20, 300], size=(600, 4))
+    y = np.where(X[:, 1] < 30, "High Stress", np.where(X[:, 0] > 28, "Moderate Stress", "Healthy"))
+    # Some label noise so the trees grow deep and disagree
+    y[rng.random(len(y)) < 0.15] = "Healthy"
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(scaler.transform(X), y)
+    return model, scaler
+
+
+def random_inputs(n, seed):
+    rng = np.random.default_rng(seed)
+    # Well outside the training range too
+    return rng.normal(loc=[25, 40, 60, 500], scale=[15, 45, 60, 900], size=(n, 4))
+
+
+@pytest.mark.parametrize("n", [1, 7, 2000])
+def test_matches_sklearn_on_random_inputs(forest, n):
+    model, scaler = forest
+    compiled = CompiledForest.from_sklearn(model, scaler)
+    X = random_inputs(n, seed=n)
+
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(scaler.transform(X)))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(scaler.transform(X)), atol=1e-12)
+
+
+def test_export_round_trips(forest, tmp_path):
+    model, scaler = forest
+    compiled = CompiledForest.from_sklearn(model, scaler)
+    compiled.save(tmp_path / "compiled.npz")
+
+    loaded = CompiledForest.load(tmp_path / "compiled.npz")
+    X = random_inputs(300, seed=1)
+    np.testing.assert_array_equal(loaded.predict_proba(X), compiled.predict_proba(X))
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(scaler.transform(X)))
+
+
+def make_registry(forest, tmp_path):
+    model, scaler = forest
+    joblib.dump(model, tmp_path / "model.pkl")
+    joblib.dump(scaler, tmp_path / "scaler.pkl")
+    CompiledForest.from_sklearn(model, scaler).save(tmp_path / "compiled.npz")
+    return ModelRegistry({"health": (tmp_path / "model.pkl", tmp_path / "scaler.pkl")},
+                         compiled={"health": tmp_path / "compiled.npz"})
+
+
+def test_registry_loads_a_newer_export(forest, tmp_path, monkeypatch):
+    registry = make_registry(forest, tmp_path)
+    monkeypatch.setattr(CompiledForest, "from_sklearn", classmethod(lambda cls, *args: pytest.fail("recompiled")))
+
+    bundle = registry.get("health")
+    X = random_inputs(50, seed=2)
+    assert bundle.compiled.classes.dtype == forest[0].classes_.dtype
+    np.testing.assert_array_equal(bundle.predict(X), forest[0].predict(forest[1].transform(X)))
+
+
+def test_registry_recompiles_when_the_pickles_are_newer(forest, tmp_path, monkeypatch):
+    registry = make_registry(forest, tmp_path)
+    stale = os.stat(tmp_path / "model.pkl").st_mtime - 60
+    os.utime(tmp_path / "compiled.npz", (stale, stale))
+    monkeypatch.setattr(CompiledForest, "load", classmethod(lambda cls, *args: pytest.fail("loaded a stale export")))
+
+    assert registry.get("health").compiled is not None
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from database import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+        self.ping_fails = False
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_fails:
+            raise OSError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    entry = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(entry)
+    # The freed connection is handed out again
+    assert pool.acquire() is entry
+
+
+def test_waiting_checkout_gets_released_connection():
+    pool, opened = make_pool(max_size=1, timeout=2.0)
+    entry = pool.acquire()
+    threading.Timer(0.05, pool.release, (entry,)).start()
+    assert pool.acquire() is entry
+    assert len(opened) == 1
+
+
+def test_idle_connections_are_reused_lifo():
+    pool, opened = make_pool(max_size=3)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second
+    assert len(opened) == 2
+
+
+def test_old_connections_are_recycled():
+    pool, opened = make_pool(max_size=2, recycle=0.05)
+    entry = pool.acquire()
+    pool.release(entry)
+    time.sleep(0.06)
+    fresh = pool.acquire()
+    assert fresh is not entry
+    assert opened[0].closed
+    assert pool.stats()["connections_recycled"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_idle_connection_is_pinged_on_borrow():
+    pool, opened = make_pool(max_size=2, ping_interval=0.0)
+    entry = pool.acquire()
+    pool.release(entry)
+    assert pool.acquire() is entry
+    assert opened[0].pings == 1
+
+
+def test_recently_used_connection_is_not_pinged():
+    pool, opened = make_pool(max_size=2, ping_interval=60.0)
+    pool.release(pool.acquire())
+    pool.acquire()
+    assert opened[0].pings == 0
+
+
+def test_failed_ping_replaces_connection():
+    pool, opened = make_pool(max_size=2, ping_interval=0.0)
+    entry = pool.acquire()
+    pool.release(entry)
+    opened[0].ping_fails = True
+    fresh = pool.acquire()
+    assert fresh is not entry
+    assert opened[0].closed
+    assert pool.stats()["failed_health_checks"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_failed_connect_frees_the_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("refused")
+        return FakeConnection()
+
+    pool = ConnectionPool(connect, max_size=1, timeout=0.05)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.acquire() is not None
+    assert pool.stats()["in_use"] == 1
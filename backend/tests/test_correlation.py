@@ -0,0 +1,126 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from benchmarks import standin
+from database import Database
+from services.asof_join import COLUMNS, WEATHER_TOLERANCE, fetch_environment
+from services.correlation import CorrelationAccumulator, CorrelationStats
+
+
+def corrcoef(rows):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.corrcoef(rows, rowvar=False)
+
+
+def test_update_batch_matches_corrcoef():
+    rng = np.random.default_rng(1)
+    rows = rng.normal(size=(1000, len(COLUMNS))) @ rng.normal(size=(len(COLUMNS), len(COLUMNS)))
+    acc = CorrelationAccumulator()
+    for lo, hi in [(0, 1), (1, 7), (7, 400), (400, 401), (401, 1000)]:
+        acc.update_batch(rows[lo:hi])
+    acc.update_batch(rows[:0])
+
+    assert acc.count == 1000
+    np.testing.assert_allclose(acc.mean, rows.mean(axis=0))
+    np.testing.assert_allclose(acc.correlation(), corrcoef(rows), atol=1e-12)
+
+
+def test_constant_column_gives_nan_like_corrcoef():
+    rng = np.random.default_rng(2)
+    rows = rng.normal(size=(200, len(COLUMNS)))
+    rows[:, 2] = 0.0  # e.g. no rain over the whole history
+    acc = CorrelationAccumulator()
+    acc.update_batch(rows[:50])
+    acc.update_batch(rows[50:])
+
+    corr = acc.correlation()
+    expected = corrcoef(rows)
+    assert np.isnan(corr[2]).all() and np.isnan(corr[:, 2]).all()
+    np.testing.assert_allclose(corr, expected, atol=1e-12, equal_nan=True)
+
+
+def test_state_round_trips_through_json(tmp_path):
+    acc = CorrelationAccumulator()
+    acc.update_batch(np.random.default_rng(3).normal(size=(10, len(COLUMNS))))
+    acc.watermark = datetime(2025, 1, 1, 12)
+    acc.last_id = 42
+    acc.save(tmp_path / "stats.json")
+
+    loaded = CorrelationAccumulator.load(tmp_path / "stats.json")
+    assert (loaded.count, loaded.watermark, loaded.last_id) == (10, acc.watermark, 42)
+    np.testing.assert_array_equal(loaded.comoment, acc.comoment)
+
+
+@pytest.fixture
+def standin_db(tmp_path):
+    path = tmp_path / "smartfarm.sqlite"
+    standin.seed(path, rows=5000)
+    Database.use_pool(standin.stand_in_pool(path))
+    yield path
+    Database.close_pool()
+
+
+def insert_readings(path, timestamps, seed):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO smartfarm (ts, lux, temperature, moisture, lat, lon) VALUES (?, ?, ?, ?, ?, ?)",
+        [(ts.isoformat(sep=" "), float(rng.uniform(0, 900)), float(rng.uniform(20, 35)),
+          float(rng.uniform(10, 60)), 13.8657, 100.462) for ts in timestamps],
+    )
+    conn.commit()
+    conn.close()
+
+
+def weather_times(path, before):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT ts FROM weather_api WHERE ts < ? ORDER BY ts DESC LIMIT 20",
+                        (before.isoformat(sep=" "),)).fetchall()
+    conn.close()
+    return [datetime.fromisoformat(ts) for ts, in rows]
+
+
+def test_resume_folds_new_and_backdated_rows_once(standin_db, tmp_path):
+    stats_path = tmp_path / "stats.json"
+
+    async def run():
+        first = (await CorrelationStats(stats_path).refresh()).count
+
+        # Rows newer than the watermark, and a board batch backdated behind it,
+        # both next to weather readings so they survive the as-of join
+        now = datetime.now()
+        recent = [ts + timedelta(seconds=30) for ts in weather_times(standin_db, now - 2 * WEATHER_TOLERANCE)[:3]]
+        backdated = [ts + timedelta(seconds=5) for ts in weather_times(standin_db, now - timedelta(days=3))]
+        insert_readings(standin_db, recent + backdated, seed=4)
+
+        # A fresh instance resumes from the saved (watermark, last_id)
+        resumed = CorrelationStats(stats_path)
+        await resumed.refresh()
+        await resumed.refresh()
+        everything = await fetch_environment(None, resumed.accumulator.watermark)
+        return first + len(recent) + len(backdated), resumed.accumulator, everything
+
+    expected_count, acc, everything = asyncio.run(run())
+    rows = np.column_stack([everything[k] for k in COLUMNS])
+    assert acc.count == expected_count
+    assert acc.count == len(rows)
+    np.testing.assert_allclose(acc.correlation(), corrcoef(rows), atol=1e-9, equal_nan=True)
+
+
+def test_second_rebuild_is_rejected(standin_db, tmp_path):
+    stats = CorrelationStats(tmp_path / "stats.json")
+
+    async def run():
+        first = asyncio.create_task(stats.rebuild())
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await stats.rebuild()
+        await first
+        # Once finished, another rebuild may start
+        await stats.rebuild()
+
+    asyncio.run(run())
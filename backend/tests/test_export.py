@@ -0,0 +1,33 @@
+import io
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services import export
+from services.solar import sun_records
+
+
+def test_sun_export_matches_the_sun_routes(client):
+    start, end = datetime(2025, 3, 1, 6), datetime(2025, 3, 10, 18)
+    batches = list(export.record_batches("sun", start, end, batch_rows=4))
+
+    assert [batch.num_rows for batch in batches] == [4, 4, 2]
+    table = pa.Table.from_batches(batches).to_pylist()
+    expected = sorted(sun_records(start.date(), end.date()), key=lambda r: r["timestamp"])
+    assert [row["ts"] for row in table] == [r["timestamp"] for r in expected]
+    for row, record in zip(table, expected):
+        for name in ("sunrise", "sunset", "solar_noon", "day_length"):
+            assert row[name].strftime("%H:%M:%S") == record[name]
+
+
+def test_sun_export_defaults_to_the_sensor_history(client):
+    response = client.get("/api/export/sun", params={"format": "parquet"})
+    assert response.status_code == 200
+
+    table = pq.read_table(io.BytesIO(response.content))
+    days = [ts.date() for ts in table.column("ts").to_pylist()]
+    # The stand-in's readings span the last year
+    assert days[-1] == date.today()
+    assert days[0] <= date.today() - timedelta(days=364)
+    assert days == sorted(set(days))
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.cache import response_cache
+from services.health_history import health_history
+
+
+@pytest.fixture
+def queued(client):
+    now = datetime.now().replace(microsecond=0)
+    rows = [(now - timedelta(minutes=2), 1, "Healthy"), (now - timedelta(minutes=1), 2, "High Stress")]
+    asyncio.run(health_history.record(rows))
+    yield rows
+    health_history._queue.clear()
+
+
+def fetch(client):
+    response = client.get("/api/health-history")
+    assert response.status_code == 200
+    return [(datetime.fromisoformat(r["timestamp"]), r["health_status"]) for r in response.json()]
+
+
+def test_queued_rows_are_served_without_a_flush(client, queued):
+    history = fetch(client)
+
+    assert history[-2:] == [(ts, status) for ts, _, status in queued]
+    assert health_history.stats()["queued"] == len(queued)
+
+
+def test_flushed_rows_are_not_served_twice(client, queued):
+    before = fetch(client)
+    asyncio.run(health_history.flush())
+    response_cache.invalidate("health")
+
+    assert health_history.stats()["queued"] == 0
+    assert fetch(client) == before
+
+
+def test_read_overlapping_a_write_is_repeated(client, queued, monkeypatch):
+    from database import AsyncDatabase
+
+    reads = []
+    execute_query = AsyncDatabase.execute_query
+
+    async def racing_read(*args, **kwargs):
+        reads.append(1)
+        if len(reads) == 1:
+            # A flush writes the queue while the first read is running
+            await health_history.flush()
+        return await execute_query(*args, **kwargs)
+
+    monkeypatch.setattr(AsyncDatabase, "execute_query", staticmethod(racing_read))
+
+    async def run():
+        return await health_history.since(datetime.now() - timedelta(hours=24))
+
+    rows = asyncio.run(run())
+    assert len(reads) == 2
+    assert [(r["timestamp"], r["health_status"]) for r in rows][-2:] == [(ts, s) for ts, _, s in queued]
+    assert len(rows) == len(set((r["timestamp"], r["health_status"]) for r in rows))
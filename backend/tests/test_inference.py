@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from services import inference as inference_module
+from services.inference import InferenceExecutor
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replace the model call; records each batch and scores a row as 10x its first column."""
+    seen = []
+
+    def predict(name, X):
+        seen.append((name, len(X)))
+        return X[:, 0] * 10
+
+    monkeypatch.setattr(inference_module, "_predict", predict)
+    return seen
+
+
+def rows(*ids):
+    return np.array([[i, 0.0] for i in ids], dtype=np.float64)
+
+
+def run(executor, coro):
+    async def main():
+        try:
+            return await coro()
+        finally:
+            executor.close()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_rows(batches):
+    executor = InferenceExecutor("thread", workers=2, max_batch=100, max_wait_ms=20)
+    requests = [rows(1), rows(2, 3, 4), rows(5, 6)]
+
+    results = run(executor, lambda: asyncio.gather(*(executor.predict("health", X) for X in requests)))
+
+    assert batches == [("health", 6)]
+    for X, result in zip(requests, results):
+        np.testing.assert_array_equal(result, X[:, 0] * 10)
+
+
+def test_full_batch_is_dispatched_without_waiting(batches):
+    executor = InferenceExecutor("thread", workers=2, max_batch=4, max_wait_ms=10_000)
+    requests = [rows(1, 2), rows(3, 4)]
+
+    results = run(executor, lambda: asyncio.wait_for(
+        asyncio.gather(*(executor.predict("health", X) for X in requests)), 5))
+
+    assert batches == [("health", 4)]
+    np.testing.assert_array_equal(np.concatenate(results), [10, 20, 30, 40])
+
+
+def test_models_are_batched_separately(batches):
+    executor = InferenceExecutor("thread", workers=2, max_batch=100, max_wait_ms=20)
+
+    health, moisture = run(executor, lambda: asyncio.gather(
+        executor.predict("health", rows(1, 2)), executor.predict("moisture", rows(3))))
+
+    assert sorted(batches) == [("health", 2), ("moisture", 1)]
+    np.testing.assert_array_equal(health, [10, 20])
+    np.testing.assert_array_equal(moisture, [30])
+
+
+def test_oversized_request_runs_alone_outside_the_worker_count(batches):
+    executor = InferenceExecutor("thread", workers=1, max_batch=4, max_wait_ms=20)
+
+    async def scenario():
+        big = asyncio.create_task(executor.predict("health", rows(*range(10))))
+        small = [asyncio.create_task(executor.predict("health", rows(i))) for i in (100, 101)]
+        await asyncio.sleep(0)
+        # The /batch request doesn't occupy a batching slot
+        assert executor.stats()["running"] == 0
+        return await big, await asyncio.gather(*small)
+
+    big, small = run(executor, scenario)
+
+    assert sorted(batches) == [("health", 2), ("health", 10)]
+    np.testing.assert_array_equal(big, np.arange(10) * 10)
+    np.testing.assert_array_equal(np.concatenate(small), [1000, 1010])
+    assert executor.stats()["largest_batch"] == 10
+
+
+def test_requests_join_the_next_batch_while_workers_are_busy(monkeypatch):
+    release = threading.Event()
+    seen = []
+
+    def predict(name, X):
+        seen.append(len(X))
+        if len(seen) == 1:
+            release.wait(5)
+        return X[:, 0] * 10
+
+    monkeypatch.setattr(inference_module, "_predict", predict)
+    executor = InferenceExecutor("thread", workers=1, max_batch=100, max_wait_ms=1)
+
+    async def scenario():
+        first = asyncio.create_task(executor.predict("health", rows(1)))
+        while not seen:
+            await asyncio.sleep(0.001)
+        # The only worker is busy, so these wait past max_wait and pile up
+        later = [asyncio.create_task(executor.predict("health", rows(i))) for i in (2, 3, 4)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await first, await asyncio.gather(*later)
+
+    first, later = run(executor, scenario)
+
+    assert seen == [1, 3]
+    np.testing.assert_array_equal(first, [10])
+    np.testing.assert_array_equal(np.concatenate(later), [20, 30, 40])
+
+
+def test_failed_batch_fails_every_request(monkeypatch):
+    def predict(name, X):
+        raise RuntimeError("model exploded")
+
+    monkeypatch.setattr(inference_module, "_predict", predict)
+    executor = InferenceExecutor("thread", workers=1, max_batch=100, max_wait_ms=5)
+
+    results = run(executor, lambda: asyncio.gather(
+        executor.predict("health", rows(1)), executor.predict("health", rows(2)), return_exceptions=True))
+
+    assert [str(r) for r in results] == ["model exploded", "model exploded"]
+    assert executor.stats()["failed_batches"] == 1
+
+
+def test_cancelled_request_does_not_shift_the_others(batches):
+    executor = InferenceExecutor("thread", workers=1, max_batch=100, max_wait_ms=20)
+
+    async def scenario():
+        tasks = [asyncio.create_task(executor.predict("health", X)) for X in (rows(1), rows(2, 3), rows(4))]
+        await asyncio.sleep(0)
+        tasks[1].cancel()  # e.g. the client disconnected
+        return await tasks[0], await tasks[2]
+
+    first, last = run(executor, scenario)
+
+    assert batches == [("health", 4)]
+    np.testing.assert_array_equal(first, [10])
+    np.testing.assert_array_equal(last, [40])
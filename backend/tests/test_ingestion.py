@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from services.ingestion import IngestionWorker
+
+
+def readings(start, n):
+    base = datetime(2025, 1, 1)
+    return [(base + timedelta(seconds=i), float(i), 25.0, 40.0, 13.8657, 100.462) for i in range(start, start + n)]
+
+
+def make_worker(max_buffer):
+    # Not started, so a full buffer drops at once instead of blocking
+    return IngestionWorker(write_batch=lambda rows: None, max_buffer=max_buffer, block_timeout=0.0)
+
+
+def test_overflow_drops_the_oldest_buffered_rows():
+    worker = make_worker(max_buffer=5)
+    worker.submit(readings(0, 4))
+    worker.submit(readings(4, 3))
+
+    assert list(worker._buffer) == readings(2, 5)
+    assert worker.stats()["dropped"] == 2
+    assert worker.stats()["received"] == 7
+
+
+def test_batch_larger_than_buffer_keeps_its_newest_rows():
+    worker = make_worker(max_buffer=5)
+    worker.submit(readings(0, 3))
+    worker.submit(readings(3, 8))
+
+    assert list(worker._buffer) == readings(6, 5)
+    stats = worker.stats()
+    assert stats["buffered"] == 5
+    # 3 buffered rows popped and 3 rows trimmed off the head of the batch
+    assert stats["dropped"] == 6
+    assert stats["received"] == stats["buffered"] + stats["dropped"]
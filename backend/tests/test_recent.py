@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.recent import RingBuffer
+
+T0 = datetime(2025, 1, 1, 12)
+
+
+def make_buffer(capacity):
+    buffer = RingBuffer({"id": np.int64, "value": np.float64}, capacity=capacity)
+    buffer.reset(T0)
+    return buffer
+
+
+def append(buffer, ids, minutes=None):
+    minutes = ids if minutes is None else minutes
+    ts = [T0 + timedelta(minutes=m) for m in minutes]
+    return buffer.extend(ts, {"id": ids, "value": [i / 10 for i in ids]}, key="id")
+
+
+def test_window_returns_rows_after_since_in_order():
+    buffer = make_buffer(10)
+    append(buffer, [1, 2, 3, 4])
+
+    window = buffer.window(T0 + timedelta(minutes=2))
+    assert window["id"].tolist() == [3, 4]
+    np.testing.assert_array_equal(window["value"], [0.3, 0.4])
+    assert window["ts"].tolist() == [T0 + timedelta(minutes=3), T0 + timedelta(minutes=4)]
+
+
+def test_window_is_none_when_not_covered():
+    buffer = RingBuffer({"id": np.int64, "value": np.float64}, capacity=10)
+    # Not primed yet
+    assert buffer.window(T0) is None
+    buffer.reset(T0)
+    assert buffer.window(T0 - timedelta(seconds=1)) is None
+    assert len(buffer.window(T0)["id"]) == 0
+
+
+def test_backdated_rows_come_back_sorted():
+    buffer = make_buffer(10)
+    append(buffer, [1, 2, 3], minutes=[10, 20, 30])
+    # A board's buffered batch, written later with older timestamps
+    append(buffer, [4, 5], minutes=[5, 15])
+
+    assert buffer.window(T0)["id"].tolist() == [4, 1, 5, 2, 3]
+
+
+def test_wraparound_keeps_newest_and_moves_complete_since():
+    buffer = make_buffer(4)
+    append(buffer, [1, 2, 3])
+    append(buffer, [4, 5, 6])
+
+    assert len(buffer) == 4
+    assert buffer.last("id") == 6
+    # Rows 1 and 2 were overwritten, so only from row 3 on is complete
+    assert buffer.complete_since == np.datetime64(T0 + timedelta(minutes=3), "s")
+    assert buffer.window(T0) is None
+    assert buffer.window(T0 + timedelta(minutes=3))["id"].tolist() == [4, 5, 6]
+
+
+def test_rows_already_buffered_are_skipped():
+    buffer = make_buffer(10)
+    append(buffer, [1, 2, 3])
+
+    fresh = append(buffer, [2, 3, 4, 5])
+    assert fresh.tolist() == [False, False, True, True]
+    assert buffer.window(T0)["id"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_batch_larger_than_capacity_reports_only_kept_rows():
+    buffer = make_buffer(3)
+    append(buffer, [1])
+
+    fresh = append(buffer, [1, 2, 3, 4, 5, 6])
+    # Row 1 was already there, rows 2-3 didn't fit
+    assert fresh.tolist() == [False, False, False, True, True, True]
+    assert buffer.window(T0 + timedelta(minutes=4))["id"].tolist() == [5, 6]
+    assert buffer.complete_since == np.datetime64(T0 + timedelta(minutes=4), "s")
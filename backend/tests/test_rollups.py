@@ -0,0 +1,194 @@
+import asyncio
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import database
+from benchmarks import standin
+from database import ConnectionPool, Database
+from services import rollups
+
+# Name a scratch MySQL database on the configured server to run these against
+# MySQL as well; its smartfarm, weather_api and rollup tables are dropped
+MYSQL_DB = os.environ.get("SMARTFARM_TEST_MYSQL_DB")
+
+MYSQL_SCHEMA = [
+    """
+    CREATE TABLE smartfarm (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        ts DATETIME NOT NULL,
+        lux DOUBLE, temperature DOUBLE, moisture DOUBLE, lat DOUBLE, lon DOUBLE
+    )
+    """,
+    """
+    CREATE TABLE weather_api (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        ts DATETIME NOT NULL,
+        humidity DOUBLE, pressure DOUBLE, rain_1h DOUBLE, clouds INT
+    )
+    """,
+]
+
+
+def mysql_pool():
+    import mysql.connector
+
+    return ConnectionPool(
+        lambda: mysql.connector.connect(host=database.DB_HOST, user=database.DB_USER, password=database.DB_PASSWORD,
+                                        database=MYSQL_DB, autocommit=True),
+        max_size=4,
+    )
+
+
+def execute(statements):
+    with Database.connection() as conn:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def db(request, tmp_path):
+    if request.param == "sqlite":
+        conn = sqlite3.connect(tmp_path / "smartfarm.sqlite")
+        for statement in standin.SCHEMA:
+            if "sensor_rollup" not in statement:
+                conn.execute(statement)
+        conn.close()
+        Database.use_pool(standin.stand_in_pool(tmp_path / "smartfarm.sqlite"))
+    else:
+        if not MYSQL_DB:
+            pytest.skip("SMARTFARM_TEST_MYSQL_DB is not set")
+        Database.use_pool(mysql_pool())
+        drop = [f"DROP TABLE IF EXISTS {t}" for t in ("smartfarm", "weather_api", "sensor_rollup", "rollup_watermark")]
+        execute(drop + MYSQL_SCHEMA)
+    yield request.param
+    Database.close_pool()
+
+
+def insert_readings(timestamps, seed):
+    rng = np.random.default_rng(seed)
+
+    def value(low, high):
+        # Some readings come without a value, as lux does from older boards
+        return None if rng.random() < 0.1 else round(float(rng.uniform(low, high)), 3)
+
+    with Database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO smartfarm (ts, lux, temperature, moisture) VALUES (%s, %s, %s, %s)",
+            [(ts, value(0, 900), value(20, 35), value(10, 60)) for ts in timestamps],
+        )
+        cursor.executemany(
+            "INSERT INTO weather_api (ts, humidity, rain_1h) VALUES (%s, %s, %s)",
+            [(ts, value(40, 95), value(0, 5)) for ts in timestamps[::3]],
+        )
+        cursor.close()
+
+
+def fetch(query, params=()):
+    with Database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def expected_buckets(metric, res):
+    table, column = rollups.METRICS[metric]
+    buckets = {}
+    for ts, value in fetch(f"SELECT ts, {column} FROM {table} WHERE {column} IS NOT NULL"):
+        offset = (ts - datetime(2000, 1, 1)).total_seconds()
+        bucket = datetime(2000, 1, 1) + timedelta(seconds=offset // res * res)
+        buckets.setdefault(bucket, []).append(value)
+    return {b: (min(v), max(v), sum(v), len(v)) for b, v in buckets.items()}
+
+
+def assert_rollups_match():
+    for metric in rollups.METRICS:
+        for res in rollups.RESOLUTIONS.values():
+            actual = {
+                bucket: (lo, hi, total, count)
+                for bucket, lo, hi, total, count in fetch(
+                    "SELECT bucket_ts, min_value, max_value, sum_value, count FROM sensor_rollup "
+                    "WHERE metric = %s AND resolution = %s", (metric, res))
+            }
+            expected = expected_buckets(metric, res)
+            assert actual.keys() == expected.keys(), (metric, res)
+            for bucket, (lo, hi, total, count) in expected.items():
+                assert actual[bucket][3] == count, (metric, res, bucket)
+                assert actual[bucket][:3] == pytest.approx((lo, hi, total)), (metric, res, bucket)
+
+
+def whole_seconds(ts):
+    return ts.replace(microsecond=0)
+
+
+def test_refresh_folds_new_and_backdated_rows_once(db):
+    rollups.ensure_schema()
+    now = whole_seconds(datetime.now())
+    insert_readings([now - timedelta(days=3) + timedelta(minutes=7 * i) for i in range(600)], seed=1)
+    asyncio.run(rollups.refresh())
+    assert_rollups_match()
+
+    # New readings past the watermark, and a board's buffered batch written
+    # now with timestamps behind it, some in buckets that already hold rows
+    insert_readings([now - timedelta(minutes=10) + timedelta(seconds=20 * i) for i in range(20)], seed=2)
+    insert_readings([now - timedelta(days=2) + timedelta(seconds=50 * i) for i in range(40)], seed=3)
+    asyncio.run(rollups.refresh())
+    asyncio.run(rollups.refresh())
+    assert_rollups_match()
+
+    (ts, last_id), = fetch("SELECT ts, last_id FROM rollup_watermark WHERE source = %s", ("smartfarm",))
+    assert last_id == fetch("SELECT MAX(id) FROM smartfarm")[0][0]
+    assert ts <= datetime.now()
+
+
+def test_ensure_schema_adds_last_id_to_old_watermarks(db):
+    execute([
+        "CREATE TABLE rollup_watermark (source VARCHAR(64) NOT NULL PRIMARY KEY, ts DATETIME NOT NULL)",
+    ])
+    insert_readings([whole_seconds(datetime.now()) - timedelta(hours=1)] * 6, seed=4)
+    with Database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO rollup_watermark (source, ts) VALUES (%s, %s)",
+                       ("smartfarm", whole_seconds(datetime.now())))
+        cursor.close()
+
+    rollups.ensure_schema()
+    rollups.ensure_schema()
+
+    # Rows written under the old timestamp-only watermark count as seen
+    assert fetch("SELECT last_id FROM rollup_watermark WHERE source = %s", ("smartfarm",)) == [(6,)]
+
+
+def test_refresh_requests_are_coalesced(monkeypatch):
+    passes = []
+    release = None
+
+    async def fake_refresh():
+        passes.append(datetime.now())
+        await release.wait()
+
+    monkeypatch.setattr(rollups, "refresh", fake_refresh)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        task = asyncio.create_task(rollups.run_periodically(interval=60))
+        while not passes:
+            await asyncio.sleep(0.01)
+
+        # Many flushes land while the first pass runs, from the ingestion thread
+        await asyncio.to_thread(lambda: [rollups.request_refresh() for _ in range(10)])
+        release.set()
+        await asyncio.sleep(0.1)
+        task.cancel()
+        return len(passes)
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,81 @@
+import math
+import struct
+
+import pytest
+
+from services import sensor_batch
+from services.ingestion import IngestionWorker
+from services.sensor_batch import HEADER_SIZE, MAX_SAMPLES, SAMPLE_SIZE, decode_batch, encode_batch
+
+
+def test_round_trip_with_missing_readings():
+    now = 10_000
+    samples = [
+        (now - 600, 512.5, 41.37, 27.25),
+        (now - 300, float("nan"), 40.0, None),  # lux sensor read failed, no temperature
+        (now, 0.0, 39.99, -3.5),
+    ]
+    latitude, longitude, decoded = decode_batch(encode_batch(samples, now, 13.8657, 100.462))
+
+    assert (latitude, longitude) == pytest.approx((13.8657, 100.462))
+    assert [age for age, *_ in decoded] == [600, 300, 0]
+    assert decoded[0][1:] == pytest.approx((512.5, 41.37, 27.25))
+    assert math.isnan(decoded[1][1]) and decoded[1][3] is None
+    assert decoded[2][1:] == pytest.approx((0.0, 39.99, -3.5))
+
+
+def test_missing_lux_is_ingested_as_null():
+    worker = IngestionWorker(write_batch=lambda rows: None)
+    payload = encode_batch([(0, float("nan"), 40.0, 25.0), (0, 100.0, 40.0, 25.0)], 0, 13.8657, 100.462)
+    worker.handle_message("topic", payload)
+
+    rows = list(worker._buffer)
+    assert [row[1] for row in rows] == [None, 100.0]
+    assert worker.stats()["batch_messages"] == 1
+
+
+def test_sample_count_at_the_header_limit():
+    samples = [(i, float(i), 50.0, 25.0) for i in range(MAX_SAMPLES)]
+    payload = encode_batch(samples, MAX_SAMPLES, 0.0, 0.0)
+
+    assert len(payload) == HEADER_SIZE + MAX_SAMPLES * SAMPLE_SIZE
+    _, _, decoded = decode_batch(payload)
+    assert len(decoded) == MAX_SAMPLES
+    assert decoded[-1][:2] == (1, float(MAX_SAMPLES - 1))
+    with pytest.raises(ValueError):
+        encode_batch(samples + [(0, 0.0, 0.0, 0.0)], MAX_SAMPLES, 0.0, 0.0)
+
+
+def test_out_of_range_values_are_clamped():
+    _, _, decoded = decode_batch(encode_batch([(100, 1.0, 700.0, 400.0), (5, 1.0, -2.0, -400.0)], 0, 0.0, 0.0))
+    # A timestamp ahead of ``now`` has age 0, not a wrapped u32
+    assert [age for age, *_ in decoded] == [0, 0]
+    assert decoded[0][2:] == (655.35, 327.67)
+    assert decoded[1][2:] == (0.0, -327.67)
+
+
+@pytest.mark.parametrize("cut", [1, SAMPLE_SIZE, SAMPLE_SIZE + 1])
+def test_truncated_payload_is_rejected(cut):
+    payload = encode_batch([(0, 1.0, 2.0, 3.0)] * 3, 0, 0.0, 0.0)
+    with pytest.raises(ValueError):
+        decode_batch(payload[:-cut])
+
+
+@pytest.mark.parametrize("payload", [
+    b"SF",
+    b"SF\x01\x00",
+    encode_batch([], 0, 0.0, 0.0)[:-1],
+    encode_batch([(0, 1.0, 2.0, 3.0)], 0, 0.0, 0.0) + b"\x00",
+    struct.pack(sensor_batch.HEADER, b"SF", sensor_batch.VERSION + 1, 0, 0, 0.0, 0.0),
+])
+def test_malformed_payload_is_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_batch(payload)
+
+
+def test_ingestion_counts_malformed_batches_as_invalid():
+    worker = IngestionWorker(write_batch=lambda rows: None)
+    worker.handle_message("topic", encode_batch([(0, 1.0, 2.0, 3.0)] * 2, 0, 0.0, 0.0)[:-4])
+
+    assert worker.stats()["invalid"] == 1
+    assert worker.stats()["buffered"] == 0
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from database import Database
+
+
+def insert_reading(ts, lux, temperature, moisture):
+    return Database.execute_insert(
+        "INSERT INTO smartfarm (ts, lux, temperature, moisture, lat, lon) VALUES (%s, %s, %s, %s, %s, %s)",
+        (ts, lux, temperature, moisture, 13.8657, 100.462),
+    )
+
+
+def test_null_temperature_round_trips(client):
+    # What ingestion stores when the board reports temperature "N/A"
+    row_id = insert_reading(datetime.now(), 512.0, None, 41.5)
+
+    # Full, paged, and /recent read from MySQL while its buffer isn't loaded
+    for url, params in (("/api/sensor-data", {}), ("/api/sensor-data", {"limit": 100}),
+                        ("/api/sensor-data/recent", {})):
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        row = next(r for r in response.json() if r["id"] == row_id)
+        assert row["temperature"] is None
+        assert row["lux"] == 512.0
+        assert row["soil_moisture"] == 41.5
+
+
+def test_null_lux_round_trips(client):
+    # What ingestion stores for a batched reading with NaN lux
+    row_id = insert_reading(datetime.now(), None, 28.5, 41.5)
+
+    response = client.get("/api/sensor-data", params={"limit": 100})
+    assert response.status_code == 200
+    row = next(r for r in response.json() if r["id"] == row_id)
+    assert row["lux"] is None
+    assert row["temperature"] == 28.5
@@ -122,4 +122,24 @@ export async function fetchWaterRecommendation(sensorData: SensorData | null, ra
     });
 
     return await response.json();
-}
\ No newline at end of file
+}
+export interface StreamHandlers {
+    sensor?: (reading: SensorData) => void;
+    weather?: (reading: WeatherData) => void;
+    health?: (record: HealthScore) => void;
+    alert?: (event: Record<string, unknown>) => void;
+    // The missed events are no longer kept; refetch the collections
+    reset?: () => void;
+}
+
+export function subscribeToStream(handlers: StreamHandlers): () => void {
+    const topics = (["sensor", "weather", "health", "alert"] as const).filter((topic) => handlers[topic]);
+    // EventSource reconnects by itself and resumes from the last event id it received
+    const source = new EventSource(`${API_BASE_URL}/stream?topics=${topics.join(",")}`);
+    for (const topic of topics) {
+        const handler = handlers[topic] as (data: never) => void;
+        source.addEventListener(topic, (event) => handler(JSON.parse((event as MessageEvent).data)));
+    }
+    source.addEventListener("reset", () => handlers.reset?.());
+    return () => source.close();
+}
@@ -10,7 +10,8 @@ import {
     calculatePlantHealthIndex,
     fetchHealthHistory,
     fetchForecast,
-    fetchWaterRecommendation
+    fetchWaterRecommendation,
+    subscribeToStream
 } from '@/lib/api-client';
 import {DashboardData, SensorData, WeatherData} from '@/models/dashboard';
 import {Geist, Geist_Mono} from "next/font/google";
@@ -78,6 +79,25 @@ export async function generateAlertsWithRecommendation(data: DashboardData) {
     return alerts;
 }
 
+const HISTORY_WINDOW_MS = 24 * 60 * 60 * 1000;
+
+// Add a streamed record to a history kept oldest first, dropping what fell out of the 24h window.
+// Readings from a board's buffered batch arrive backdated, so they may belong before the newest entry.
+function appendByTime<T extends { timestamp: string }>(history: T[], record: T): T[] {
+    const cutoff = Date.now() - HISTORY_WINDOW_MS;
+    const time = new Date(record.timestamp).getTime();
+    const kept = history.filter(item => new Date(item.timestamp).getTime() > cutoff);
+    if (time <= cutoff) return kept;
+    let i = kept.length;
+    while (i > 0 && new Date(kept[i - 1].timestamp).getTime() > time) i--;
+    return [...kept.slice(0, i), record, ...kept.slice(i)];
+}
+
+function newer<T extends { timestamp: string }>(current: T | null, record: T): T {
+    if (current && new Date(current.timestamp).getTime() > new Date(record.timestamp).getTime()) return current;
+    return record;
+}
+
 // Format time for chart display
 function formatTimeForChart(dateString: string): string {
     const date = new Date(dateString);
@@ -172,6 +192,28 @@ export default function Dashboard() {
         return () => clearInterval(intervalId);
     }, [refreshInterval]);
 
+    // New rows are pushed as they are written; the periodic refresh only catches up on the rest
+    useEffect(() => {
+        return subscribeToStream({
+            sensor: (reading) => setDashboardData(prev => ({
+                ...prev,
+                latestSensor: newer(prev.latestSensor, reading),
+                sensorHistory: appendByTime(prev.sensorHistory, reading),
+            })),
+            weather: (reading) => setDashboardData(prev => ({
+                ...prev,
+                weather: newer(prev.weather, reading),
+                weatherHistory: appendByTime(prev.weatherHistory, reading),
+            })),
+            health: (record) => setDashboardData(prev => ({
+                ...prev,
+                healthHistory: appendByTime(prev.healthHistory, record),
+            })),
+            // Events were missed while disconnected
+            reset: fetchDashboardData,
+        });
+    }, []);
+
     // Filter data based on selected time range
     const filterDataByTimeRange = (data: any[]) => {
         if (!data || data.length === 0) return [];
@@ -5,11 +5,19 @@ import math
 import uasyncio as asyncio
 import ubinascii
 from umqtt.simple import MQTTClient
-import json
+from sensor_batch import encode_batch
 from config import WIFI_SSID, WIFI_PASS, MQTT_USER, MQTT_PASS, MQTT_BROKER
 
 
 TOPIC = "b6610545901/smartfarm"
+LATITUDE = 13.8657
+LONGITUDE = 100.462
+
+SAMPLE_INTERVAL = 300       # seconds between readings
+BATCH_SAMPLES = 6           # readings per message (one message every 30 minutes)
+MAX_BUFFERED = 2016         # readings kept while offline (7 days); the oldest are dropped first
+MAX_MESSAGE_SAMPLES = 288   # upper bound per message when catching up (~3.5 KB)
+WIFI_TIMEOUT = 20           # seconds to wait for Wi-Fi before trying again next batch
 
 PHOTORESISTOR_PIN = 34
 SOIL_MOISTURE_PIN = 33
@@ -33,16 +41,25 @@ LUX_VALUES = [0.1, 1.0, 10, 100, 1000, 10000]
 LOG_RESISTANCE = [math.log10(r) for r in RESISTANCE_KOHMS]
 LOG_LUX = [math.log10(lux) for lux in LUX_VALUES]
 
+wlan = network.WLAN(network.STA_IF)
+mqtt_client = None
+
+# (time.time(), lux, soil moisture, temperature) readings not yet published
+buffered = []
+
 async def connect_wifi():
-    wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     wlan.connect(WIFI_SSID, WIFI_PASS)
     
     print("Connecting to Wi-Fi...", end="")
-    while not wlan.isconnected():
+    for _ in range(WIFI_TIMEOUT):
+        if wlan.isconnected():
+            print("\nConnected! IP:", wlan.ifconfig()[0])
+            return True
         await asyncio.sleep(1)
         print(".", end="")
-    print("\nConnected! IP:", wlan.ifconfig()[0])
+    print("\nWi-Fi not available")
+    return False
 
 async def connect_mqtt():
     global mqtt_client
@@ -93,34 +110,54 @@ async def read_temperature():
         print("Error reading temperature:", e)
         return None
 
-async def publish_data():
+async def publish_buffered():
+    """Publish buffered readings, oldest first; whatever fails stays buffered for the next try."""
+    global mqtt_client
+    while buffered:
+        try:
+            if not wlan.isconnected():
+                mqtt_client = None
+                if not await connect_wifi():
+                    return
+            if mqtt_client is None:
+                await connect_mqtt()
+            chunk = buffered[:MAX_MESSAGE_SAMPLES]
+            payload = encode_batch(chunk, time.time(), LATITUDE, LONGITUDE)
+            # QoS 1 waits for the broker's ack, so a reading is only dropped once delivered
+            mqtt_client.publish(TOPIC, payload, qos=1)
+            del buffered[:len(chunk)]
+            print("Published", len(chunk), "readings,", len(payload), "bytes")
+        except Exception as e:
+            print("Publish failed, keeping", len(buffered), "readings:", e)
+            mqtt_client = None
+            return
+
+async def sample_data():
     while True:
         try:
             lux_value = await read_light_sensor()
             soil_moisture = await read_soil_moisture()
             temperature = await read_temperature()
 
-            payload = {
-                "lux": lux_value,
-                "soil_moisture": round(soil_moisture, 2),
-                "temperature": round(temperature, 2) if temperature is not None else "N/A",
-                "latitude": 13.8657,
-                "longitude": 100.462,
-            }
+            buffered.append((
+                time.time(),
+                lux_value if lux_value is not None else float("nan"),
+                soil_moisture,
+                temperature,
+            ))
+            if len(buffered) > MAX_BUFFERED:
+                del buffered[:len(buffered) - MAX_BUFFERED]
 
-            payload_json = json.dumps(payload)
-            mqtt_client.publish(TOPIC, payload_json)
-            print("Published:", payload_json)
+            if len(buffered) >= BATCH_SAMPLES:
+                await publish_buffered()
 
         except Exception as e:
             print("Error:", e)
 
-        await asyncio.sleep(1800)
+        await asyncio.sleep(SAMPLE_INTERVAL)
 
 async def main():
-    await connect_wifi()
-    await connect_mqtt()
-    await publish_data()  
+    # Readings are taken even while Wi-Fi or the broker is down and sent once they are back
+    await sample_data()
 
 asyncio.run(main())
-